@@ -0,0 +1,168 @@
+"""
+AI 穿搭建議快取模組 - 相同需求 + 相同衣櫥不重複呼叫 Gemini
+功能：
+1. 快取鍵 = SHA-256(正規化後的需求, 模型名稱, 衣櫥內容摘要)
+   需求正規化：NFKC、大小寫、標點與連續空白合併為一個空白，中日韓文字之間的空白去除
+   「明天面試！」與「明天 面試」視為相同，英文則保留字詞邊界（"a cat" 與 "ac at" 不同）
+2. SQLite 持久化（重啟後仍有效），TTL 到期自動失效，超過筆數上限時淘汰最久未使用的項目
+3. 命中 / 未命中統計
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 建議快取檔案位置與限制（可用環境變數覆寫）
+ADVICE_CACHE_PATH = Path(os.getenv("ADVICE_CACHE_PATH", PROJECT_ROOT / "cache" / "advice_cache.db"))
+ADVICE_CACHE_TTL = float(os.getenv("ADVICE_CACHE_TTL", str(7 * 24 * 3600)))   # 秒
+ADVICE_CACHE_MAX_ENTRIES = int(os.getenv("ADVICE_CACHE_MAX_ENTRIES", "500"))
+
+# 影響建議內容的衣櫥欄位（圖片網址、到貨日等變更不會讓快取失效）
+WARDROBE_DIGEST_COLUMNS = ["id", "title", "color_name", "category", "subcategory", "size", "quantity"]
+
+_SEPARATOR_CHARS = re.compile(r"[\s\W_]+", re.UNICODE)
+# 中日韓文字（漢字、平假名、片假名、韓文）：不以空白分詞，字與字之間的空白不影響語意
+_CJK = r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]"
+_CJK_GAP = re.compile(rf"(?<={_CJK}) (?={_CJK})")
+
+
+def normalize_prompt(prompt_text: str) -> str:
+    """
+    正規化使用者需求：全形半形統一（NFKC）、不分大小寫、標點與連續空白合併為一個空白，
+    中日韓文字之間的空白去除（英文等以空白分詞的文字保留字詞邊界）
+
+    範例:
+        >>> normalize_prompt("明天要去 面試！ ")
+        '明天要去面試'
+        >>> normalize_prompt("Date  night,  casual!")
+        'date night casual'
+        >>> normalize_prompt("a cat") == normalize_prompt("ac at")
+        False
+    """
+    text = unicodedata.normalize("NFKC", prompt_text or "").casefold()
+    text = _SEPARATOR_CHARS.sub(" ", text).strip()
+    return _CJK_GAP.sub("", text)
+
+
+def wardrobe_digest(wardrobe_df: pd.DataFrame) -> str:
+    """衣櫥內容摘要（向量化雜湊每一列，與列的順序無關）"""
+    columns = [c for c in WARDROBE_DIGEST_COLUMNS if c in wardrobe_df.columns]
+    if wardrobe_df.empty or not columns:
+        return "empty"
+    row_hashes = pd.util.hash_pandas_object(wardrobe_df[columns].astype(str), index=False).sort_values()
+    return hashlib.sha256(row_hashes.to_numpy().tobytes()).hexdigest()
+
+
+def make_advice_key(prompt_text: str, model: str, digest: str) -> str:
+    raw = f"{model}\x1f{digest}\x1f{normalize_prompt(prompt_text)}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class AdviceCache:
+    """AI 建議的持久快取（SQLite）"""
+
+    def __init__(self, db_path: Path = ADVICE_CACHE_PATH, ttl: float = ADVICE_CACHE_TTL,
+                 max_entries: int = ADVICE_CACHE_MAX_ENTRIES):
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS advice (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                advice TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """查詢快取，過期的項目視為不存在並刪除"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT advice, created_at FROM advice WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM advice WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE advice SET accessed_at = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, prompt_text: str, advice: str) -> None:
+        """寫入快取，並清除過期項目與超過上限的最久未使用項目"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO advice (cache_key, model, prompt, advice, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, prompt_text, advice, now, now)
+            )
+            self._conn.execute("DELETE FROM advice WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM advice WHERE cache_key IN ("
+                "  SELECT cache_key FROM advice ORDER BY accessed_at DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM advice")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """命中統計 {'hits', 'misses', 'hit_rate', 'entries'}"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM advice").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries,
+            }
+
+
+_default_cache: Optional[AdviceCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_advice_cache() -> Optional[AdviceCache]:
+    """取得全域建議快取（無法開啟檔案時返回 None，每次都會直接呼叫 API）"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                try:
+                    _default_cache = AdviceCache()
+                except (sqlite3.Error, OSError) as e:
+                    print(f"⚠️ 無法開啟建議快取檔案，不使用快取: {e}")
+                    return None
+    return _default_cache
@@ -0,0 +1,170 @@
+"""
+AI 穿搭建議的衣櫥清單（prompt context）產生模組
+功能：
+1. 以 pandas 向量化運算產生精簡清單（不逐列 iterrows）
+2. 精簡編碼：短 ID（I<id>）、分類標題只出現一次、商品名稱去掉日文原名與貨號
+3. 依 token 預算截斷：各分類輪流取件，預算不足時每個分類仍有代表性單品
+4. 回報 prompt 大小（估計 token 數、包含件數）
+5. 從 AI 回覆中找出提到的單品（短 ID 優先，其次是精簡後的商品名稱）
+"""
+
+import os
+import re
+from typing import Dict, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# 衣櫥清單的 token 預算（可用環境變數覆寫）
+ADVICE_CONTEXT_TOKEN_BUDGET = int(os.getenv("ADVICE_CONTEXT_TOKEN_BUDGET", "3000"))
+
+# 中日韓文字約 1 字 1 token，其他字元約 4 字 1 token（Gemini / GPT 系分詞器的粗略平均）
+_CJK_PATTERN = r"[぀-ヿ㐀-鿿豈-﫿＀-￯]"
+
+
+def estimate_tokens(text: str) -> int:
+    """估計字串的 token 數"""
+    return int(estimate_tokens_series(pd.Series([text])).iloc[0])
+
+
+def estimate_tokens_series(texts: pd.Series) -> pd.Series:
+    """向量化估計每個字串的 token 數"""
+    texts = texts.fillna("").astype(str)
+    cjk = texts.str.count(_CJK_PATTERN)
+    other = texts.str.len() - cjk
+    return cjk + (other + 3) // 4
+
+
+def short_item_id(item_id) -> str:
+    """衣櫥商品的短 ID（prompt 與 AI 回覆中引用用）"""
+    return f"I{int(item_id)}"
+
+
+def compact_titles(titles: pd.Series) -> pd.Series:
+    """
+    精簡商品名稱：去掉（日文原名）與 [貨號]
+
+    範例:
+        "墊肩襯衫洋裝[AL94]（パワーショルダーシャツワンピース[al94]）" -> "墊肩襯衫洋裝"
+    """
+    compact = (
+        titles.fillna("").astype(str)
+        .str.replace(r"（.*?）|\(.*?\)", "", regex=True)
+        .str.replace(r"\[[^\]]*\]", "", regex=True)
+        .str.strip()
+    )
+    # 全部被去掉時（例如名稱只有日文）保留原名
+    return compact.where(compact != "", titles.fillna("").astype(str))
+
+
+def compact_colors(colors: pd.Series) -> pd.Series:
+    """顏色只保留中文名稱（去掉（日文））"""
+    compact = colors.fillna("").astype(str).str.replace(r"（.*?）", "", regex=True).str.strip()
+    return compact.where(compact != "", colors.fillna("").astype(str))
+
+
+def build_inventory_context(
+    wardrobe_df: pd.DataFrame,
+    token_budget: int = ADVICE_CONTEXT_TOKEN_BUDGET,
+    category_order: Optional[Sequence[str]] = None
+) -> Tuple[str, Dict]:
+    """
+    產生精簡的衣櫥清單
+
+    格式:
+        [トップス]
+        I12 墊肩襯衫洋裝/炭灰/シャツ
+        I15 ...
+        [ボトムス]
+        ...
+
+    參數:
+        wardrobe_df: load_wardrobe_data() 的結果（需有 id, title, color_name, category, subcategory）
+        token_budget: 清單部分的 token 上限
+        category_order: 分類顯示順序（未列出的分類排在後面）
+
+    返回:
+        (清單文字, 統計 {'items_total', 'items_included', 'tokens', 'truncated', 'ids'})
+        ids 為清單中出現的短 ID -> DataFrame index
+    """
+    stats = {"items_total": len(wardrobe_df), "items_included": 0, "tokens": 0, "truncated": False, "ids": {}}
+    if wardrobe_df.empty:
+        return "", stats
+
+    ids = wardrobe_df["id"] if "id" in wardrobe_df else pd.Series(wardrobe_df.index, index=wardrobe_df.index)
+    subcategory = wardrobe_df["subcategory"].fillna("").astype(str)
+    items = pd.DataFrame({
+        "short_id": "I" + ids.astype(int).astype(str),
+        "category": wardrobe_df["category"].fillna("その他").astype(str),
+        "line": (
+            "I" + ids.astype(int).astype(str) + " "
+            + compact_titles(wardrobe_df["title"]) + "/"
+            + compact_colors(wardrobe_df["color_name"])
+            + subcategory.where(subcategory == "", "/" + subcategory)
+        ),
+    }, index=wardrobe_df.index)
+
+    # 分類順序 + 每個分類內的序號：依 (序號, 分類) 排序即為各分類輪流取件
+    order = {cat: i for i, cat in enumerate(category_order or [])}
+    items["cat_rank"] = items["category"].map(order).fillna(len(order)).astype(int)
+    items["turn"] = items.groupby("category", sort=False).cumcount()
+    items["tokens"] = estimate_tokens_series(items["line"]) + 1  # +1 換行
+
+    picked = items.sort_values(["turn", "cat_rank", "category"], kind="stable")
+    # 分類標題的成本計在該分類第一件商品上
+    header_tokens = estimate_tokens_series("[" + picked["category"] + "]") + 1
+    picked_cost = picked["tokens"] + header_tokens.where(picked["turn"] == 0, 0)
+    picked = picked[picked_cost.cumsum() <= token_budget]
+
+    stats["truncated"] = len(picked) < len(items)
+    if picked.empty:
+        return "", stats
+
+    # 依分類輸出（分類標題只出現一次）
+    picked = picked.sort_values(["cat_rank", "category", "turn"], kind="stable")
+    lines = []
+    for category, group in picked.groupby(["cat_rank", "category"], sort=False):
+        lines.append(f"[{category[1]}]")
+        lines.extend(group["line"].tolist())
+    context = "\n".join(lines)
+
+    stats["items_included"] = len(picked)
+    stats["tokens"] = estimate_tokens(context)
+    stats["ids"] = dict(zip(picked["short_id"], picked.index))
+    return context, stats
+
+
+# 短 ID 前後不能緊接英數字（避免比對到 "iPhone12" 之類的字）
+_SHORT_ID_PATTERN = re.compile(r"(?<![A-Za-z0-9])I(\d+)(?!\d)")
+
+
+def match_related_items(advice: str, wardrobe_df: pd.DataFrame, limit: int = 4) -> pd.DataFrame:
+    """
+    找出 AI 回覆中提到的衣櫥單品，依第一次出現的位置排序
+
+    比對方式：
+        1. 短 ID（I12）
+        2. 精簡後的商品名稱完整出現在回覆中（至少 4 個字，避免「上衣」這類泛稱誤判）
+
+    返回:
+        wardrobe_df 的子集（最多 limit 件）
+    """
+    if not advice or wardrobe_df.empty:
+        return wardrobe_df.head(0)
+
+    positions = pd.Series(len(advice) + 1, index=wardrobe_df.index, dtype="int64")
+    if "id" in wardrobe_df:
+        mentioned = {}
+        for match in _SHORT_ID_PATTERN.finditer(advice):
+            mentioned.setdefault(int(match.group(1)), match.start())
+        by_id = wardrobe_df["id"].map(mentioned)
+        positions = positions.where(by_id.isna(), by_id)
+
+    titles = compact_titles(wardrobe_df["title"])
+    unmatched = positions > len(advice)
+    for index, title in titles[unmatched & (titles.str.len() >= 4)].items():
+        found = advice.find(title)
+        if found >= 0:
+            positions[index] = found
+
+    matched = positions[positions <= len(advice)].sort_values(kind="stable")
+    return wardrobe_df.loc[matched.index[:limit]]
@@ -32,28 +32,34 @@ COLOR_CODE_MAPPING = {
     "12件套件（12点セット）": "983",
 }
 
+def _learned_store():
+    # 延遲匯入：本檔只是對照表，需要時才開啟學習表
+    from backend.utils.learned_colors import get_learned_color_store
+    return get_learned_color_store()
+
+def _learned_code(color_name, index=0):
+    store = _learned_store()
+    return store.code(color_name, index) if store is not None else None
+
 def get_color_code(color_name, index=0):
     """
     根據顏色名稱取得顏色編號
     
     Args:
-        color_name: 顏色名稱（例如：黑色的（ブラック））
+        color_name: 顏色名稱（例如：黑色的（ブラック）），也可以只給日文或中文，
+            全形 / 半形、×/X 寫法不同也能查到（見 backend.utils.color_registry）
         index: 當顏色有多個編號時，指定要取得第幾個（預設為 0）
     
+    靜態對照表查不到時，使用爬蟲從商品頁學到的編號（見 backend.utils.learned_colors）
+    
     Returns:
         str: 顏色編號（例如："11"），若找不到則返回 None
         若該顏色有多個編號，會根據 index 返回對應的編號
     """
-    code = COLOR_CODE_MAPPING.get(color_name)
+    from backend.utils.color_registry import get_color_registry
+    code = get_color_registry().code(color_name, index)
     if code is None:
-        return None
-    
-    # 如果是列表，返回指定索引的編號
-    if isinstance(code, list):
-        if 0 <= index < len(code):
-            return code[index]
-        return code[0]  # 索引超出範圍則返回第一個
-    
+        code = _learned_code(color_name, index)
     return code
 
 def get_all_color_codes(color_name):
@@ -64,16 +70,14 @@ def get_all_color_codes(color_name):
         color_name: 顏色名稱
     
     Returns:
-        list: 編號列表，若只有一個編號則返回單元素列表
+        list: 編號列表（靜態對照表在前，其後是從商品頁學到的編號）
     """
-    code = COLOR_CODE_MAPPING.get(color_name)
-    if code is None:
-        return []
-    
-    if isinstance(code, list):
-        return code
-    
-    return [code]
+    from backend.utils.color_registry import get_color_registry
+    codes = list(get_color_registry().codes(color_name))
+    store = _learned_store()
+    if store is not None:
+        codes += [code for code in store.codes(color_name) if code not in codes]
+    return codes
 
 def get_color_image_url(product_code, color_name, quality="d", index=0):
     """
@@ -86,7 +90,7 @@ def get_color_image_url(product_code, color_name, quality="d", index=0):
         index: 當顏色有多個編號時，指定使用第幾個（預設為 0）
     
     Returns:
-        str: 圖片 URL，若顏色不存在則返回 None
+        str: 圖片 URL，若靜態對照表與學習表都查不到則返回 None
     """
     color_code = get_color_code(color_name, index)
     if color_code:
@@ -135,7 +139,8 @@ def get_all_model_photo_urls(product_code, v_min=1, v_max=11, quality="d"):
     生成產品所有可能的模特試穿照片 URL
     
     根據資料庫分析，GRL 商品的模特照片編號範圍為 v1 ~ v11
-    系統會生成所有可能的 URL，前端可以自動檢測哪些圖片實際存在
+    系統會生成所有可能的 URL（不檢查是否存在）；
+    只需要實際存在的照片時請用 get_available_model_photos
     
     分析結果：
     - 範圍：v1 ~ v11（涵蓋 100% 的照片）
@@ -196,3 +201,24 @@ def get_model_photo_urls_batch(product_code, v_numbers, quality="d"):
         for v_num in v_numbers
     ]
 
+
+def get_available_model_photos(product_code, v_min=1, v_max=11, quality="d", refresh=False):
+    """
+    只返回實際存在的模特試穿照片（併發 HEAD 檢測，結果存在可用性索引中）
+    
+    Args:
+        product_code: 產品代碼（例如："dk909"）
+        v_min / v_max: v 編號範圍（預設 v1 ~ v11）
+        quality: 圖片品質 "d" (高畫質) 或 "t" (低畫質)
+        refresh: 忽略索引重新檢測
+    
+    Returns:
+        list: 與 get_all_model_photo_urls 相同格式，只包含存在的照片
+        
+    Example:
+        >>> get_available_model_photos("dk909")
+        [{'v_number': 1, 'url': '...dk909_v1.jpg'}, {'v_number': 6, 'url': '...dk909_v6.jpg'}]
+    """
+    # 延遲匯入：本檔只是對照表，不需要時不載入 requests
+    from backend.utils.photo_probe import probe_model_photos
+    return probe_model_photos(product_code, v_min, v_max, quality, refresh)
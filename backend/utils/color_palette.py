@@ -0,0 +1,403 @@
+"""
+衣櫥商品主色分析（離線批次）- 從本地圖片快取計算每件商品的色票
+功能：
+1. 讀取 IMAGE_CACHE_DIR 中的商品顏色圖，解碼時直接縮小（JPEG draft）後再取樣
+2. 轉換到 CIE Lab 色彩空間（距離接近人眼感受），以 NumPy 向量化 k-means 取出主色
+   去除接近白色的背景像素；結果依佔比排序
+3. ProcessPoolExecutor 平行處理（影像解碼與 k-means 是 CPU 密集工作）
+4. 色票存在 wardrobe_palettes 資料表（遷移 v5），以圖片 SHA-256 判斷是否需要重算
+5. 色彩相容性以向量運算判斷（無彩色 / 同色系 / 互補色），不必交給 AI 從顏色名稱推理
+6. AI 造型師檢索後以排名第一的單品為基準，先移除顏色不相容的候選（filter_candidates_by_palette）
+
+用法:
+    python -m backend.utils.color_palette                 # 為所有有本地圖片的商品補算色票
+    python -m backend.utils.color_palette --workers 4 --colors 5
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.utils.embeddings import RAG_PER_CATEGORY
+from backend.utils.schema import PALETTE_TABLE
+
+PALETTE_COLORS = 5            # 每件商品的主色數量
+PALETTE_SAMPLE_SIZE = 64      # 取樣前縮小到的最長邊像素
+PALETTE_KMEANS_ITERATIONS = 12
+PALETTE_SEED = 0              # 固定亂數種子，同一張圖每次結果相同
+
+# 背景判定：非常亮且幾乎無彩度的像素（商品圖多為白底）
+BACKGROUND_MIN_L = 93.0
+BACKGROUND_MAX_CHROMA = 6.0
+# 無彩色（黑 / 白 / 灰）判定：彩度低於此值，與任何顏色都相容
+NEUTRAL_MAX_CHROMA = 12.0
+# 色相和諧模板：(色相差中心°, 半寬°, 最高分)，分數由中心線性降到半寬處為 0
+HUE_HARMONIES = (
+    (0.0, 60.0, 1.0),      # 同色系
+    (120.0, 30.0, 0.8),    # 三等分（triadic）
+    (150.0, 30.0, 0.8),    # 分裂互補（split-complementary）
+    (180.0, 30.0, 1.0),    # 互補色
+)
+# AI 造型師候選的最低相容分數（可用環境變數覆寫）
+PALETTE_MIN_COMPATIBILITY = float(os.getenv("PALETTE_MIN_COMPATIBILITY", "0.5"))
+
+_ITEM_QUERY = "SELECT id, product_code, color_name FROM wardrobe"
+
+# sRGB (D65) -> XYZ
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+], dtype=np.float32)
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """
+    sRGB（0~255，形狀 (..., 3)）轉 CIE Lab（D65）
+
+    範例:
+        >>> rgb_to_lab(np.array([[255, 255, 255]])).round(1)
+        array([[100.,   0.,   0.]], dtype=float32)
+    """
+    c = np.asarray(rgb, dtype=np.float32) / 255.0
+    linear = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = (linear @ _RGB_TO_XYZ.T) / _D65_WHITE
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def lab_to_rgb(lab: np.ndarray) -> np.ndarray:
+    """CIE Lab 轉 sRGB（0~255 uint8），用於顯示色票"""
+    lab = np.asarray(lab, dtype=np.float32)
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    xyz = np.where(f ** 3 > 216 / 24389, f ** 3, (116 * f - 16) / (24389 / 27)) * _D65_WHITE
+    linear = xyz @ np.linalg.inv(_RGB_TO_XYZ).T
+    linear = np.clip(linear, 0, 1)
+    c = np.where(linear > 0.0031308, 1.055 * linear ** (1 / 2.4) - 0.055, 12.92 * linear)
+    return np.round(c * 255).astype(np.uint8)
+
+
+def kmeans(points: np.ndarray, k: int, iterations: int = PALETTE_KMEANS_ITERATIONS,
+           seed: int = PALETTE_SEED) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    向量化 k-means（k-means++ 初始化）
+
+    參數:
+        points: (n, d) float32
+        k: 群數（點數不足時自動減少）
+
+    返回:
+        (centers (k, d), counts (k,))，依 counts 由大到小排序
+    """
+    n = len(points)
+    k = min(k, n)
+    rng = np.random.default_rng(seed)
+    sq_norms = np.einsum("ij,ij->i", points, points)
+
+    # k-means++：下一個中心依「與最近中心距離平方」的比例抽樣
+    centers = [points[rng.integers(n)]]
+    nearest = np.full(n, np.inf, dtype=np.float32)
+    for _ in range(1, k):
+        nearest = np.minimum(nearest, ((points - centers[-1]) ** 2).sum(axis=1))
+        total = nearest.sum()
+        if total <= 0:
+            break
+        centers.append(points[rng.choice(n, p=nearest / total)])
+    centers = np.array(centers, dtype=np.float32)
+
+    labels = np.zeros(n, dtype=np.int64)
+    for iteration in range(iterations):
+        # ||p - c||² = ||p||² - 2 p·c + ||c||²，一次矩陣乘法算出所有距離
+        distances = sq_norms[:, None] - 2 * points @ centers.T + np.einsum("ij,ij->i", centers, centers)[None, :]
+        new_labels = distances.argmin(axis=1)
+        if iteration and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+
+    counts = np.bincount(labels, minlength=len(centers))
+    order = np.argsort(-counts, kind="stable")
+    keep = order[counts[order] > 0]
+    return centers[keep], counts[keep]
+
+
+def extract_palette(image_path: str, colors: int = PALETTE_COLORS,
+                    sample_size: int = PALETTE_SAMPLE_SIZE) -> np.ndarray:
+    """
+    計算單張圖片的主色（模組層級函數，可在子程序中執行）
+
+    返回:
+        (colors, 4) float32，每列為 (L, a, b, 佔比)，依佔比由大到小排序
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        img.draft("RGB", (sample_size * 2, sample_size * 2))
+        img = img.convert("RGB")
+        img.thumbnail((sample_size, sample_size), Image.BILINEAR)
+        pixels = np.asarray(img, dtype=np.uint8).reshape(-1, 3)
+
+    lab = rgb_to_lab(pixels)
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    foreground = ~((lab[:, 0] >= BACKGROUND_MIN_L) & (chroma <= BACKGROUND_MAX_CHROMA))
+    # 幾乎全是白色時（白色商品）保留原本的像素
+    if foreground.sum() >= max(colors * 4, pixels.shape[0] // 20):
+        lab = lab[foreground]
+
+    centers, counts = kmeans(lab, colors)
+    palette = np.zeros((colors, 4), dtype=np.float32)
+    palette[:len(centers), :3] = centers
+    palette[:len(centers), 3] = counts / counts.sum()
+    return palette
+
+
+def palette_hex(palette: np.ndarray) -> List[str]:
+    """色票轉 #rrggbb 列表（略過佔比為 0 的空位）"""
+    palette = np.asarray(palette)
+    used = palette[palette[:, 3] > 0]
+    return ["#{:02x}{:02x}{:02x}".format(*rgb) for rgb in lab_to_rgb(used[:, :3])]
+
+
+def _palette_job(args):
+    item_id, path, colors = args
+    try:
+        return item_id, extract_palette(path, colors), None
+    except Exception as e:
+        return item_id, None, str(e)
+
+
+def _item_images(db) -> List[Tuple[int, Path]]:
+    """
+    每件衣櫥商品對應的本地圖片（沒有下載過圖片的商品略過）
+
+    只查詢 manifest、不記錄存取，離線批次掃描不會讓所有圖片看起來都剛被使用過
+    """
+    from backend.utils.image_handler import lookup_local_image
+
+    images = []
+    for item_id, product_code, color_name in db.fetchall(_ITEM_QUERY):
+        entry = lookup_local_image(product_code, color_name) if product_code and color_name else None
+        if entry is not None and Path(entry["path"]).exists():
+            images.append((int(item_id), Path(entry["path"])))
+    return images
+
+
+def sync_palettes(db, colors: int = PALETTE_COLORS, max_workers: Optional[int] = None) -> Dict[str, float]:
+    """
+    增量計算衣櫥商品的色票：只處理新增商品或圖片已改變的商品，刪除已不存在商品的色票
+
+    參數:
+        db: WardrobeDB 連線池（資料表由遷移 v5 建立）
+        colors: 每件商品的主色數量
+        max_workers: 程序數量（預設為 CPU 核心數）
+
+    返回:
+        統計 {'computed', 'deleted', 'failed', 'skipped', 'elapsed'}
+    """
+    start = time.perf_counter()
+    images = _item_images(db)
+    # blob 檔名即圖片內容的 SHA-256
+    stored = dict(db.fetchall(f"SELECT item_id, image_digest FROM {PALETTE_TABLE}"))
+    jobs = [(item_id, str(path), colors) for item_id, path in images if stored.get(item_id) != path.stem]
+    digests = {item_id: path.stem for item_id, path in images}
+    removed = set(stored) - {item_id for item_id, _ in images}
+
+    # 數量很少時不值得啟動子程序
+    if len(jobs) <= 2 or max_workers == 1:
+        results = [_palette_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_palette_job, jobs, chunksize=8))
+
+    rows = []
+    failed = 0
+    for item_id, palette, error in results:
+        if error:
+            failed += 1
+            print(f"❌ 色票計算失敗 (id={item_id}): {error}")
+        else:
+            rows.append((item_id, digests[item_id], palette.tobytes()))
+
+    if rows or removed:
+        with db.transaction() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {PALETTE_TABLE} (item_id, image_digest, palette) VALUES (?, ?, ?)", rows
+            )
+            conn.executemany(f"DELETE FROM {PALETTE_TABLE} WHERE item_id = ?", [(i,) for i in removed])
+
+    return {
+        "computed": len(rows),
+        "deleted": len(removed),
+        "failed": failed,
+        "skipped": len(images) - len(jobs),
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def load_palettes(db, colors: int = PALETTE_COLORS):
+    """
+    讀取所有商品色票
+
+    返回:
+        (item_ids: np.ndarray[int64], palettes: np.ndarray[float32, (n, colors, 4)])
+    """
+    rows = db.fetchall(f"SELECT item_id, palette FROM {PALETTE_TABLE} ORDER BY item_id")
+    rows = [r for r in rows if len(r[1]) == colors * 4 * 4]
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, colors, 4), dtype=np.float32)
+    item_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    palettes = np.frombuffer(b"".join(r[1] for r in rows), dtype=np.float32).reshape(len(rows), colors, 4)
+    return item_ids, palettes
+
+
+def dominant_colors(palettes: np.ndarray) -> np.ndarray:
+    """每個色票佔比最高的顏色 (n, 3) Lab（色票已依佔比排序，取第一個）"""
+    return np.asarray(palettes)[..., 0, :3]
+
+
+def compatibility_scores(palette: np.ndarray, palettes: np.ndarray) -> np.ndarray:
+    """
+    一件商品與多件商品的色彩相容分數（0~1，向量化）
+
+    規則（以主色的 LCh 判斷）：
+        - 任一方為無彩色（黑 / 白 / 灰 / 低彩度）：1
+        - 其他依色相差套用 HUE_HARMONIES 取最高分：同色系（0°）、三等分（120°）、
+          分裂互補（150°）、互補色（180°），越接近中心分數越高
+
+    參數:
+        palette: (colors, 4) 單件商品的色票
+        palettes: (n, colors, 4) 其他商品的色票
+
+    返回:
+        (n,) 分數
+    """
+    query = dominant_colors(palette[None])[0]
+    others = dominant_colors(palettes)
+    query_chroma = float(np.hypot(query[1], query[2]))
+    chroma = np.hypot(others[:, 1], others[:, 2])
+    if query_chroma < NEUTRAL_MAX_CHROMA:
+        return np.ones(len(others), dtype=np.float32)
+
+    hue_diff = np.abs(np.degrees(np.arctan2(others[:, 2], others[:, 1]) - np.arctan2(query[2], query[1])))
+    hue_diff = np.minimum(hue_diff, 360 - hue_diff)
+    centers, widths, peaks = (np.array(column, dtype=np.float32) for column in zip(*HUE_HARMONIES))
+    harmony = peaks * np.clip(1 - np.abs(hue_diff[:, None] - centers) / widths, 0, 1)
+    scores = harmony.max(axis=1)
+    return np.where(chroma < NEUTRAL_MAX_CHROMA, 1.0, scores).astype(np.float32)
+
+
+def filter_compatible(item_id: int, item_ids: np.ndarray, palettes: np.ndarray,
+                      min_score: float = 0.5, candidate_ids: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+    """
+    找出與指定商品顏色相容的商品
+
+    參數:
+        item_id: 基準商品 id
+        item_ids / palettes: load_palettes() 的結果
+        min_score: 最低相容分數
+        candidate_ids: 只在這些商品中篩選（例如同一次檢索的結果），None 表示全部
+
+    返回:
+        [(item_id, score), ...]，依分數由高到低（不含基準商品本身；基準商品沒有色票時返回空列表）
+    """
+    position = np.flatnonzero(item_ids == item_id)
+    if len(position) == 0:
+        return []
+    mask = item_ids != item_id
+    if candidate_ids is not None:
+        mask &= np.isin(item_ids, np.asarray(list(candidate_ids), dtype=np.int64))
+    scores = compatibility_scores(palettes[position[0]], palettes[mask])
+    ids = item_ids[mask]
+    keep = scores >= min_score
+    order = np.argsort(-scores[keep], kind="stable")
+    return [(int(i), float(s)) for i, s in zip(ids[keep][order], scores[keep][order])]
+
+
+def filter_candidates_by_palette(candidates, item_ids: np.ndarray, palettes: np.ndarray,
+                                 min_score: float = PALETTE_MIN_COMPATIBILITY,
+                                 per_category: int = RAG_PER_CATEGORY):
+    """
+    以檢索排名第一的商品為基準，移除其他分類中與它顏色不相容的候選
+
+    - 與基準同分類的商品互為替代品，不比較顏色
+    - 沒有色票的商品無法判斷，一律保留；基準商品沒有色票時不篩選
+    - 每個分類至少保留 per_category 件（與 retrieve_items 的保證一致），
+      不足時依相容分數由高到低補回
+
+    參數:
+        candidates: retrieve_items() 的結果（依相關度排序，需有 id、category 欄位）
+        item_ids / palettes: load_palettes() 的結果
+        min_score: 最低相容分數
+        per_category: 每個分類至少保留的件數
+
+    返回:
+        candidates 的子集（保持原本順序）
+
+    範例（紅色上衣為基準：深藍褲子是三等分和諧色保留，綠色、卡其褲子移除；
+    鞋子不相容，但該分類只有一件，仍保留）:
+        >>> import pandas as pd
+        >>> lab = lambda L, a, b: np.tile(np.array([L, a, b, 0.2], dtype=np.float32), (PALETTE_COLORS, 1))
+        >>> palettes = np.stack([lab(50, 60, 40), lab(50, 60, 40), lab(25, 10, -40),
+        ...                      lab(50, -50, 40), lab(60, 5, 40), lab(50, -40, 45)])
+        >>> candidates = pd.DataFrame({"id": [1, 2, 3, 4, 5, 6],
+        ...                            "category": ["トップス", "トップス", "ボトムス", "ボトムス", "ボトムス", "シューズ"]})
+        >>> filter_candidates_by_palette(candidates, np.arange(1, 7), palettes, per_category=1)["id"].tolist()
+        [1, 2, 3, 6]
+    """
+    if len(candidates) < 2 or len(item_ids) == 0:
+        return candidates
+    positions = {int(item_id): position for position, item_id in enumerate(item_ids.tolist())}
+    ids = candidates["id"].to_numpy(dtype=np.int64)
+    categories = candidates["category"].to_numpy()
+    anchor = int(ids[0])
+    if anchor not in positions:
+        return candidates
+
+    scores = np.ones(len(ids), dtype=np.float32)
+    scored = np.array([int(i) in positions for i in ids]) & (categories != categories[0])
+    if scored.any():
+        others = palettes[[positions[int(i)] for i in ids[scored]]]
+        scores[scored] = compatibility_scores(palettes[positions[anchor]], others)
+    keep = scores >= min_score
+
+    # 被移除後少於 per_category 件的分類，依相容分數補回（同分時保持原本的相關度順序）
+    for category in dict.fromkeys(categories[~keep].tolist()):
+        in_category = np.flatnonzero(categories == category)
+        missing = per_category - int(keep[in_category].sum())
+        if missing > 0:
+            dropped = in_category[~keep[in_category]]
+            keep[dropped[np.argsort(-scores[dropped], kind="stable")][:missing]] = True
+    return candidates[keep]
+
+
+if __name__ == "__main__":
+    from backend.utils.db import WARDROBE_DB_PATH, WardrobeDB
+    from backend.utils.migrations import migrate
+
+    parser = argparse.ArgumentParser(description="為衣櫥商品計算主色色票")
+    parser.add_argument("--db", default=str(WARDROBE_DB_PATH))
+    parser.add_argument("--colors", type=int, default=PALETTE_COLORS)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    db = WardrobeDB(args.db)
+    migrate(db)
+    stats = sync_palettes(db, args.colors, args.workers)
+    print(f"🎨 色票完成: 計算 {stats['computed']} 件, 跳過 {stats['skipped']} 件, 刪除 {stats['deleted']} 件, "
+          f"失敗 {stats['failed']} 件, {stats['elapsed']:.1f} 秒")
+    db.close()
@@ -0,0 +1,227 @@
+"""
+顏色對照表（registry）- 日文 ↔ 中文 ↔ CDN 顏色編號的單一查詢入口
+功能：
+1. 合併 color_codes.COLOR_CODE_MAPPING 與 color_mapping.json（鍵都是「中文（日文）」格式）
+2. 查詢前正規化：NFKC（全形 / 半形統一）、不分大小寫、去除空白、×/X/x/✕ 統一為 ×
+   「黑色的(ブラック)」「ﾌﾞﾗｯｸ」「オフホワイトxブラック」都能查到
+3. 「中文（日文）」整串查不到時，依序改用日文、中文部分查詢（中文翻譯用字不同也能找到編號）
+4. 編譯後的查詢表存成 pickle，來源檔案沒變時直接載入，不必重新解析
+5. resolve_many 一次解析多個顏色（爬蟲批次處理用）
+"""
+
+import json
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+COLOR_MAPPING_JSON = PROJECT_ROOT / "color_mapping.json"
+COLOR_CODES_MODULE = Path(__file__).resolve().parent / "color_codes.py"
+
+# 編譯後查詢表的位置（可用環境變數覆寫）
+COLOR_REGISTRY_PATH = Path(os.getenv("COLOR_REGISTRY_PATH", PROJECT_ROOT / "cache" / "color_registry.pkl"))
+# 正規化規則或表格結構修改時要改，舊的 pickle 會自動重建
+COLOR_REGISTRY_VERSION = 1
+
+_MULTIPLY_PATTERN = re.compile(r"[×xX✕✖＊*]")
+_SPACE_PATTERN = re.compile(r"\s+")
+_COMBINED_PATTERN = re.compile(r"^(.*?)[（(](.*)[）)]$")
+
+
+def normalize_color_name(name: str) -> str:
+    """
+    正規化顏色名稱（查詢鍵）
+
+    範例:
+        >>> normalize_color_name("白色X黑色（オフホワイト×ブラック）")
+        '白色×黑色(オフホワイト×ブラック)'
+        >>> normalize_color_name("ﾌﾞﾗｯｸ ")
+        'ブラック'
+    """
+    text = unicodedata.normalize("NFKC", name or "").casefold()
+    text = _SPACE_PATTERN.sub("", text)
+    return _MULTIPLY_PATTERN.sub("×", text)
+
+
+def split_color_name(name: str) -> Tuple[str, str]:
+    """
+    拆開「中文（日文）」格式的顏色名稱（全形 / 半形括號皆可）
+
+    返回:
+        (中文, 日文)；沒有括號時返回 (name, "")
+    """
+    text = (name or "").strip()
+    match = _COMBINED_PATTERN.match(text)
+    if not match:
+        return text, ""
+    return match.group(1).strip(), match.group(2).strip()
+
+
+def _load_sources() -> List[Tuple[str, List[str]]]:
+    """讀取兩份來源，返回 [(「中文（日文）」, [編號, ...]), ...]（color_codes 優先）"""
+    from backend.utils.color_codes import COLOR_CODE_MAPPING
+
+    entries = [
+        (name, list(code) if isinstance(code, list) else [code])
+        for name, code in COLOR_CODE_MAPPING.items()
+    ]
+    if COLOR_MAPPING_JSON.exists():
+        with open(COLOR_MAPPING_JSON, "r", encoding="utf-8") as f:
+            for name, code in json.load(f).items():
+                entries.append((name, list(code) if isinstance(code, list) else [code]))
+    return entries
+
+
+def _source_fingerprint() -> Tuple:
+    """來源檔案的 (路徑, 修改時間, 大小)，用來判斷 pickle 是否過期"""
+    parts: List = [COLOR_REGISTRY_VERSION]
+    for path in (COLOR_CODES_MODULE, COLOR_MAPPING_JSON):
+        try:
+            stat = path.stat()
+            parts.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            parts.append((str(path), None, None))
+    return tuple(parts)
+
+
+class ColorRegistry:
+    """編譯後的顏色查詢表（所有查詢都是 dict O(1)）"""
+
+    def __init__(self, ja_to_zh: Dict[str, str], zh_to_ja: Dict[str, str],
+                 codes: Dict[str, Tuple[str, ...]], by_code: Dict[str, Tuple[str, str]]):
+        self._ja_to_zh = ja_to_zh    # 正規化日文 -> 中文
+        self._zh_to_ja = zh_to_ja    # 正規化中文 -> 日文
+        self._codes = codes          # 正規化「中文（日文）」/ 日文 / 中文 -> 編號
+        self._by_code = by_code      # 編號 -> (中文, 日文)
+
+    @classmethod
+    def compile(cls, entries: Iterable[Tuple[str, List[str]]]) -> "ColorRegistry":
+        ja_to_zh: Dict[str, str] = {}
+        zh_to_ja: Dict[str, str] = {}
+        codes: Dict[str, List[str]] = {}
+        by_code: Dict[str, Tuple[str, str]] = {}
+
+        def add_codes(key: str, values: List[str]):
+            if not key:
+                return
+            merged = codes.setdefault(key, [])
+            merged.extend(v for v in values if v not in merged)
+
+        for name, values in entries:
+            zh, ja = split_color_name(name)
+            values = [str(v) for v in values]
+            if ja:
+                ja_to_zh.setdefault(normalize_color_name(ja), zh)
+                zh_to_ja.setdefault(normalize_color_name(zh), ja)
+            add_codes(normalize_color_name(name), values)
+            add_codes(normalize_color_name(ja), values)
+            add_codes(normalize_color_name(zh), values)
+            for value in values:
+                by_code.setdefault(value, (zh, ja))
+
+        return cls(ja_to_zh, zh_to_ja, {k: tuple(v) for k, v in codes.items()}, by_code)
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def lookup_zh(self, color_ja: str) -> Optional[str]:
+        """日文顏色 -> 中文（找不到返回 None）"""
+        return self._ja_to_zh.get(normalize_color_name(color_ja))
+
+    def lookup_ja(self, color_zh: str) -> Optional[str]:
+        """中文顏色 -> 日文（找不到返回 None）"""
+        return self._zh_to_ja.get(normalize_color_name(color_zh))
+
+    def codes(self, color_name: str) -> Tuple[str, ...]:
+        """
+        顏色名稱（「中文（日文）」、日文或中文皆可）-> 所有編號
+
+        整串查不到時依序以日文、中文部分查詢
+        """
+        found = self._codes.get(normalize_color_name(color_name))
+        if found:
+            return found
+        zh, ja = split_color_name(color_name)
+        if ja:
+            return self._codes.get(normalize_color_name(ja)) or self._codes.get(normalize_color_name(zh)) or ()
+        return ()
+
+    def code(self, color_name: str, index: int = 0) -> Optional[str]:
+        """顏色名稱 -> 編號（有多個編號時取第 index 個，超出範圍取第一個）"""
+        found = self.codes(color_name)
+        if not found:
+            return None
+        return found[index] if 0 <= index < len(found) else found[0]
+
+    def names(self, code: str) -> Optional[Tuple[str, str]]:
+        """編號 -> (中文, 日文)"""
+        return self._by_code.get(str(code))
+
+    def resolve_many(self, color_names: Iterable[str]) -> Dict[str, Dict]:
+        """
+        一次解析多個顏色（重複的名稱只解析一次）
+
+        返回:
+            {原始名稱: {"zh": 中文或 None, "ja": 日文或 None, "codes": (編號, ...)}}
+        """
+        results = {}
+        for name in color_names:
+            if name in results:
+                continue
+            zh, ja = split_color_name(name)
+            if not ja:
+                # 沒有括號：可能是純日文（爬蟲）或純中文
+                ja_zh = self.lookup_zh(zh)
+                ja, zh = (zh, ja_zh) if ja_zh else (self.lookup_ja(zh), zh)
+            else:
+                zh = self.lookup_zh(ja) or zh
+            results[name] = {"zh": zh or None, "ja": ja or None, "codes": self.codes(name)}
+        return results
+
+    def _tables(self):
+        return self._ja_to_zh, self._zh_to_ja, self._codes, self._by_code
+
+
+def build_color_registry(path: Path = COLOR_REGISTRY_PATH) -> ColorRegistry:
+    """重新編譯顏色查詢表並寫入 pickle（寫入失敗時只使用記憶體中的結果）"""
+    registry = ColorRegistry.compile(_load_sources())
+    payload = {"fingerprint": _source_fingerprint(), "tables": registry._tables()}
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ 無法寫入顏色查詢表快取: {e}")
+    return registry
+
+
+def load_color_registry(path: Path = COLOR_REGISTRY_PATH) -> ColorRegistry:
+    """載入 pickle；不存在、損壞或來源檔案已修改時重新編譯"""
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("fingerprint") == _source_fingerprint():
+            return ColorRegistry(*payload["tables"])
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError, ValueError):
+        pass
+    return build_color_registry(path)
+
+
+_default_registry: Optional[ColorRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_color_registry() -> ColorRegistry:
+    """取得全域顏色查詢表（第一次使用時載入）"""
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = load_color_registry()
+    return _default_registry
@@ -1,160 +1,390 @@
 import requests
-from bs4 import BeautifulSoup
-from backend.utils.nlp import translate_text, translate_color, convert_currency, map_subcategory_to_category  # ✅ 新增 translate_color
+from backend.utils.nlp import translate_many, translate_color, lookup_color, convert_currency, map_subcategory_to_category  # ✅ 新增 translate_many 批次翻譯
+from backend.utils.http_client import get_crawler_session
+from backend.utils.page_cache import get_page_cache
+from backend.utils.product_parser import extract_product_fields
 from backend.utils.image_handler import (
     upgrade_image_url_to_high_quality,
+    extract_color_code_from_url,
     download_product_images
 )
+from backend.utils.learned_colors import get_learned_color_store
 import re
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 
-def scrape_product_page(url):
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# 解析器版本：修改解析 / 翻譯 / 分類邏輯時要改，
+# 快取中舊版本的解析結果在伺服器回 304 時會以快取的 HTML 重新解析
+PARSE_VERSION = "2"
+
+def normalize_product_url(url):
+    """將商品代碼轉為完整商品頁 URL（已是 URL 則原樣返回）"""
+    if "https" not in url:
+        url = url.lower()
+        url = "https://www.grail.bz/disp/item/"+ url +"/"
+    return url
+
+def fetch_product_page(url, extra_headers=None):
+    """下載商品頁（透過爬蟲專用連線池，含預設逾時；狀態碼不自動重試），返回 requests.Response"""
+    headers = dict(HEADERS, **extra_headers) if extra_headers else HEADERS
+    return get_crawler_session().get(url, headers=headers)
+
+def _harvest_color_codes(parsed):
+    """
+    記錄商品頁上的顏色名稱 → col_ 編號，之後組顏色圖 URL 不必再爬一次
+    （學習表寫入失敗只記錄警告，不影響爬取結果）
+    """
+    learned_colors = get_learned_color_store()
+    if learned_colors is None or "error" in parsed or not parsed.get("colors"):
+        return
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        if "https" not in url:
-            url = url.lower()
-            url = "https://www.grail.bz/disp/item/"+ url +"/"
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            return {"error": f"Failed to fetch the webpage. Status code: {response.status_code}"}
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # 提取商品名稱和貨號
-        title_section = soup.find("h1", class_="ttl-name")
-        if not title_section:
-            return {"error": "Product details not found on the page."}
-        
-        title = title_section.text.strip()
-        title_translated = translate_text(title) if title else title  # 翻譯商品名稱
-        product_code = title_section.find("span", class_="txt-code").text.strip("[]").lower()  # ✅ 統一轉換為小寫
-
-        # 提取推薦圖片並篩選顏色圖片
-        recommendation_images = []
-        color_images = []
-        color_urls = set()  # 用來過濾顏色圖片
-
-        recommendation_section = soup.select("div.modal-detaillist img")  # 定位推薦圖片區塊
-
-        for img_tag in recommendation_section:
-            img_url = img_tag.get("src", "").strip()
-            alt_text = img_tag.get("alt", "").strip()  # 提取顏色名稱
-            if img_url:
-                # 🔥 升級為高畫質 URL
-                img_url = upgrade_image_url_to_high_quality(img_url)
-                
-                # 判斷是否為顏色圖片（`col_xx`）
-                if "col" in img_url and alt_text:
-                    # ✅ 使用新的 translate_color 函數（優先查找映射表）
-                    color_name_translated = translate_color(alt_text)
-                    color_data = {"color": color_name_translated, "image_url": img_url}
-                    if img_url not in color_urls:
-                        color_images.append(color_data)
-                        color_urls.add(img_url)
-                else:
-                    # 如果不是顏色圖片，加入推薦列表
-                    recommendation_images.append(img_url)
-
-        # 從推薦圖片中移除已經加入顏色的圖片
-        recommendation_images = [img for img in recommendation_images if img not in color_urls]
-
-        # 提取商品詳細
-        product_detail = ""
-        material = ""
-
-        detail_sections = soup.find_all("div", class_="tab-content")
-        for section in detail_sections:
-            header = section.find("h2", class_="contents-ttl only-pc")
-            if header:
-                header_text = header.get_text(strip=True)
-                if "商品詳細" in header_text:
-                    product_detail = section.get_text(strip=True)
-                    product_detail = translate_text(product_detail) if product_detail else product_detail
-                elif "サイズ・素材" in header_text:
-                    material = section.get_text(strip=False)
-                    material_match = re.search(r'☆素材は【.*?】', material)
-                    if material_match:
-                        material = material_match.group(0)
-                        material = material.replace('\r', '').replace('\n', '').strip()
-                        material = translate_text(material) if material else material
-                    else:
-                        material = None
-
-        # 提取所有可選尺寸
-        sizes = set()  # 使用 set 避免重複
-        size_options = soup.select("select.size-select option")
-        for option in size_options:
-            size_text = option.text.strip().split("/")[0]  # 只取 S/M/L，不取庫存資訊
-            if size_text:
-                sizes.add(size_text)
-
-        # 如果任一元素包含 "cm"，則認為是鞋子尺寸
-        if any("cm" in s for s in sizes):
-            size_order = ["22.0cm", "22.5cm", "23.0cm", "23.5cm", "24.0cm", "24.5cm", "25.0cm"]
-            sizes = sorted(list(sizes), key=lambda x: size_order.index(x) if x in size_order else len(size_order))
-        else:
-            size_order = ["F", "XS", "S", "M", "L", "XL"]
-            sizes = sorted(list(sizes), key=lambda x: size_order.index(x) if x in size_order else len(size_order))
-       
-        # 提取價格
-        price_section = soup.find("p", class_="txt-price")
-        if price_section:
-            price_text = price_section.text.strip()
-            match = re.search(r"¥\s?([\d,]+)", price_text)  # 更新正則，支持包含逗號的價格
-            if match:
-                price_jpy_str = match.group(1).replace(",", "")  # 移除千分位逗號
-                price_jpy = int(price_jpy_str)  # 將清理後的價格轉為整數
-                price_twd = convert_currency(price_jpy)  # ✅ 使用 utils/nlp.py 的函數轉換台幣
+        learned_colors.record(parsed.get("product_code"), [
+            (color["color"], extract_color_code_from_url(color["image_url"]))
+            for color in parsed["colors"]
+        ])
+    except sqlite3.Error as e:
+        print(f"⚠️ 顏色編號學習表寫入失敗（略過）: {e}")
+
+def _fetch_and_parse(url, use_cache=True, engine=None):
+    """
+    條件請求 + 解析：有快取時帶 ETag / Last-Modified，
+    伺服器回 304 就沿用快取的解析結果（解析器版本不同時以快取的 HTML 重新解析）
+    
+    Returns:
+        tuple: (HTTP 狀態碼, 結果字典)
+    """
+    cache = get_page_cache() if use_cache else None
+    entry = cache.get(url) if cache is not None else None
+    extra_headers = cache.conditional_headers(entry) if cache is not None else None
+
+    response = fetch_product_page(url, extra_headers)
+    if response.status_code == 304 and entry is not None:
+        cache.mark_validated(url)
+        parsed = entry["parsed"]
+        if parsed is None or entry["parse_version"] != PARSE_VERSION:
+            parsed = parse_product_page(entry["html"], url, engine)
+            if "error" not in parsed:
+                cache.update_parsed(url, parsed, PARSE_VERSION)
+        _harvest_color_codes(parsed)
+        return response.status_code, parsed
+    if response.status_code != 200:
+        return response.status_code, {"error": f"Failed to fetch the webpage. Status code: {response.status_code}"}
+
+    parsed = parse_product_page(response.text, url, engine)
+    if cache is not None and "error" not in parsed:
+        cache.put(
+            url,
+            response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            parsed=parsed,
+            parse_version=PARSE_VERSION
+        )
+    _harvest_color_codes(parsed)
+    return response.status_code, parsed
+
+def scrape_product_page(url, use_cache=True, engine=None):
+    try:
+        url = normalize_product_url(url)
+        _, result = _fetch_and_parse(url, use_cache, engine)
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+
+def parse_product_page(html, url, engine=None):
+    """
+    解析商品頁 HTML 並翻譯，返回商品資料字典（找不到商品資訊時返回 {"error": ...}）
+    
+    engine 可選 "html.parser"（預設）/ "lxml" / "selectolax"，詳見 product_parser 模組
+    """
+    fields, _ = extract_product_fields(html, engine)
+
+    # 提取商品名稱和貨號
+    if fields["title"] is None:
+        return {"error": "Product details not found on the page."}
+    
+    title = fields["title"]
+    product_code = fields["code_text"].strip("[]").lower()  # ✅ 統一轉換為小寫
+
+    # 提取推薦圖片並篩選顏色圖片
+    recommendation_images = []
+    color_entries = []  # (日文顏色名稱, 圖片 URL)，翻譯延後到批次處理
+    color_urls = set()  # 用來過濾顏色圖片
+
+    for img_url, alt_text in fields["images"]:  # 推薦圖片區塊（alt 為顏色名稱）
+        if img_url:
+            # 🔥 升級為高畫質 URL
+            img_url = upgrade_image_url_to_high_quality(img_url)
+            
+            # 判斷是否為顏色圖片（`col_xx`）
+            if "col" in img_url and alt_text:
+                if img_url not in color_urls:
+                    color_entries.append((alt_text, img_url))
+                    color_urls.add(img_url)
             else:
-                print(f"Price text did not match regex: {price_text}")  # ✅ 調試用
-                price_jpy = None
-                price_twd = None
+                # 如果不是顏色圖片，加入推薦列表
+                recommendation_images.append(img_url)
+
+    # 從推薦圖片中移除已經加入顏色的圖片
+    recommendation_images = [img for img in recommendation_images if img not in color_urls]
+
+    # 提取商品詳細
+    product_detail = fields["product_detail"]
+    material = ""
+
+    if fields["material_text"] is not None:
+        material_match = re.search(r'☆素材は【.*?】', fields["material_text"])
+        if material_match:
+            material = material_match.group(0)
+            material = material.replace('\r', '').replace('\n', '').strip()
         else:
-            print("Price section not found in the page")  # ✅ 調試用
+            material = None
+
+    # 提取所有可選尺寸
+    sizes = set()  # 使用 set 避免重複
+    for option_text in fields["size_options"]:
+        size_text = option_text.strip().split("/")[0]  # 只取 S/M/L，不取庫存資訊
+        if size_text:
+            sizes.add(size_text)
+
+    # 如果任一元素包含 "cm"，則認為是鞋子尺寸
+    if any("cm" in s for s in sizes):
+        size_order = ["22.0cm", "22.5cm", "23.0cm", "23.5cm", "24.0cm", "24.5cm", "25.0cm"]
+        sizes = sorted(list(sizes), key=lambda x: size_order.index(x) if x in size_order else len(size_order))
+    else:
+        size_order = ["F", "XS", "S", "M", "L", "XL"]
+        sizes = sorted(list(sizes), key=lambda x: size_order.index(x) if x in size_order else len(size_order))
+   
+    # 提取價格
+    price_text = fields["price_text"]
+    if price_text is not None:
+        match = re.search(r"¥\s?([\d,]+)", price_text)  # 更新正則，支持包含逗號的價格
+        if match:
+            price_jpy_str = match.group(1).replace(",", "")  # 移除千分位逗號
+            price_jpy = int(price_jpy_str)  # 將清理後的價格轉為整數
+            price_twd = convert_currency(price_jpy)  # ✅ 使用 utils/nlp.py 的函數轉換台幣
+        else:
+            print(f"Price text did not match regex: {price_text}")  # ✅ 調試用
             price_jpy = None
             price_twd = None
+    else:
+        print("Price section not found in the page")  # ✅ 調試用
+        price_jpy = None
+        price_twd = None
 
-        # 提取分類
-        breadcrumb_items = soup.select(".list-breadcrumb li a")
-        if len(breadcrumb_items) >= 3:
-            category = breadcrumb_items[1].text.strip()  # 主分類（第二個項目）
-            subcategory = breadcrumb_items[2].text.strip()  # 次分類（第三個項目）
-            subcategory = map_subcategory_to_category(category, subcategory, title)    # 使用 map_subcategory_to_category 修正子類別
-            print(f"📌 爬取分類: {category} -> {subcategory}")
-        elif len(breadcrumb_items) >= 2:
-            category = breadcrumb_items[1].text.strip()  # 只有主分類
-            subcategory = None
-            print(f"📌 爬取分類: {category} -> None")
-        if category == "浴衣":
-            category = "ワンピース"
-            subcategory = "浴衣"
-            print(f"📌 調整分類: {category} -> {subcategory}")
-        
-        # 🔥 可選：下載商品圖片到本地（高畫質版本）
-        # 取消下面的註解以啟用自動下載
-        # download_result = download_product_images(product_code, color_images, save_to_backup=True)
-        # print(f"📥 圖片下載結果: {download_result['downloaded']}/{download_result['total_colors']} 成功")
-        
-        # 組合返回結果
-        return {
-            "title": (title_translated+"（"+title+"）"),
-            "product_code": product_code,
-            "product_url": url,
-            "colors": color_images,
-            "colors_opt": [c["color"] for c in color_images],
-            "recommendations": recommendation_images,
-            "product_detail": product_detail,
-            "material": material,
-            "sizes": sizes, 
-            "price_jpy": price_jpy,  # ✅ 日幣價格
-            "price_twd": price_twd,  # ✅ 台幣價格
-            # "url": url,
-            "category": category,
-            "subcategory": subcategory
-        }
-    except Exception as e:
-        return {"error": str(e)}
+    # 提取分類
+    breadcrumb_items = fields["breadcrumbs"]
+    if len(breadcrumb_items) >= 3:
+        category = breadcrumb_items[1]  # 主分類（第二個項目）
+        subcategory = breadcrumb_items[2]  # 次分類（第三個項目）
+        subcategory = map_subcategory_to_category(category, subcategory, title)    # 使用 map_subcategory_to_category 修正子類別
+        print(f"📌 爬取分類: {category} -> {subcategory}")
+    elif len(breadcrumb_items) >= 2:
+        category = breadcrumb_items[1]  # 只有主分類
+        subcategory = None
+        print(f"📌 爬取分類: {category} -> None")
+    if category == "浴衣":
+        category = "ワンピース"
+        subcategory = "浴衣"
+        print(f"📌 調整分類: {category} -> {subcategory}")
+    
+    # 🔥 一次批次翻譯所有需要的文字（商品名稱、詳細、材質、映射表找不到的顏色）
+    pending_texts = [title, product_detail, material]
+    pending_texts += [alt for alt, _ in color_entries if not lookup_color(alt)]
+    translations = translate_many(pending_texts)
+    title_translated = translations.get(title, title)
+    product_detail = translations.get(product_detail, product_detail)
+    if material:
+        material = translations.get(material, material)
+
+    # ✅ 使用 translate_color 函數（優先查找映射表，其次使用批次翻譯結果）
+    color_images = [
+        {"color": translate_color(alt, translations), "image_url": img_url}
+        for alt, img_url in color_entries
+    ]
+
+    # 🔥 可選：下載商品圖片到本地（高畫質版本）
+    # 取消下面的註解以啟用自動下載
+    # download_result = download_product_images(product_code, color_images, save_to_backup=True)
+    # print(f"📥 圖片下載結果: {download_result['downloaded']}/{download_result['total_colors']} 成功")
+    
+    # 組合返回結果
+    return {
+        "title": (title_translated+"（"+title+"）"),
+        "product_code": product_code,
+        "product_url": url,
+        "colors": color_images,
+        "colors_opt": [c["color"] for c in color_images],
+        "recommendations": recommendation_images,
+        "product_detail": product_detail,
+        "material": material,
+        "sizes": sizes, 
+        "price_jpy": price_jpy,  # ✅ 日幣價格
+        "price_twd": price_twd,  # ✅ 台幣價格
+        # "url": url,
+        "category": category,
+        "subcategory": subcategory
+    }
+
+
+
+# ========================================
+# 批次爬蟲（多執行緒 + 每個主機限速 + 重試）
+# ========================================
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HostRateLimiter:
+    """每個主機的請求速率限制（每秒最多 rate 次，跨執行緒共用）"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class CrawlStats:
+    """批次爬蟲統計：成功/失敗數、吞吐量、延遲百分位數"""
+
+    def __init__(self):
+        self.latencies = []
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def record(self, latency, success, retries=0):
+        with self._lock:
+            self.latencies.append(latency)
+            self.retries += retries
+            if success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @staticmethod
+    def _percentile(sorted_values, pct):
+        if not sorted_values:
+            return 0.0
+        index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+        return sorted_values[index]
+
+    def summary(self):
+        """返回統計字典 {'pages', 'succeeded', 'failed', 'retries', 'elapsed', 'pages_per_sec', 'p50', 'p95'}"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            end = self.finished_at or time.perf_counter()
+            elapsed = end - self.started_at
+            pages = self.succeeded + self.failed
+            return {
+                "pages": pages,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retries": self.retries,
+                "elapsed": elapsed,
+                "pages_per_sec": pages / elapsed if elapsed > 0 else 0.0,
+                "p50": self._percentile(latencies, 50),
+                "p95": self._percentile(latencies, 95),
+            }
+
+
+def _scrape_with_retry(target, limiter, max_retries, backoff, use_cache=True, engine=None):
+    """爬取單一商品（含限速與指數退避重試），返回 (結果, 重試次數)"""
+    url = normalize_product_url(target)
+    attempt = 0
+    while True:
+        limiter.wait(url)
+        try:
+            status_code, result = _fetch_and_parse(url, use_cache, engine)
+            if status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                raise requests.exceptions.HTTPError(f"Status code: {status_code}")
+            return result, attempt
+        except requests.exceptions.RequestException as e:
+            if attempt >= max_retries:
+                return {"error": str(e)}, attempt
+            # 指數退避 + 隨機抖動，避免所有執行緒同時重試
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.5))
+            attempt += 1
+        except Exception as e:
+            return {"error": str(e)}, attempt
+
+
+def scrape_many(codes_or_urls, max_workers=8, per_host_rate=2.0, max_retries=3, backoff=1.0, stats=None,
+                use_cache=True, engine=None):
+    """
+    並行爬取多個商品（訂單紀錄、願望清單匯入用）
+    
+    Args:
+        codes_or_urls (list[str]): 商品代碼或商品頁 URL
+        max_workers (int): 執行緒數量上限
+        per_host_rate (float): 每個主機每秒最多請求數（0 表示不限速）
+        max_retries (int): 連線錯誤或 429/5xx 時的最大重試次數
+        backoff (float): 第一次重試前等待秒數（之後每次加倍）
+        stats (CrawlStats, optional): 傳入以在迭代結束後取得統計資料
+        use_cache (bool): 是否使用商品頁快取與條件請求（304 時沿用上次解析結果）
+        engine (str, optional): HTML 解析引擎 "html.parser" / "lxml" / "selectolax"
+    
+    Yields:
+        tuple: (商品代碼或 URL, 結果字典)，依完成順序回傳；失敗時結果為 {"error": ...}
+    
+    Example:
+        >>> stats = CrawlStats()
+        >>> for code, product in scrape_many(["tw1122", "dk988"], stats=stats):
+        ...     print(code, product.get("title"))
+        >>> stats.summary()["pages_per_sec"]
+    """
+    targets = list(dict.fromkeys(codes_or_urls))
+    stats = stats if stats is not None else CrawlStats()
+    limiter = HostRateLimiter(per_host_rate)
+
+    def task(target):
+        start = time.perf_counter()
+        result, retries = _scrape_with_retry(target, limiter, max_retries, backoff, use_cache, engine)
+        stats.record(time.perf_counter() - start, "error" not in result, retries)
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(task, target): target for target in targets}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # 呼叫端提前停止迭代（break / 例外）時取消尚未開始的工作，不必等整批爬完
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    stats.finish()
+    summary = stats.summary()
+    print(
+        f"📊 批次爬取完成: {summary['succeeded']}/{summary['pages']} 成功, "
+        f"{summary['pages_per_sec']:.2f} 頁/秒, "
+        f"p50 {summary['p50'] * 1000:.0f} ms, p95 {summary['p95'] * 1000:.0f} ms"
+    )
 
 # # # 測試程式
 # url = "https://www.grail.bz/item/dk9881112/?s=2"  # 替換為實際商品網址
@@ -0,0 +1,238 @@
+"""
+衣櫥資料庫存取模組 - 長期保留的 SQLite 連線池
+功能：
+1. 整個程序共用少量連線（Streamlit 以 st.cache_resource 保存），不再每次查詢都重新連線
+2. 連線建立時設定 WAL、synchronous=NORMAL、mmap_size、cache_size
+3. 每條連線保有 sqlite3 的 prepared statement 快取（相同 SQL 字串會重用已編譯的語句）
+4. 多個 session 同時使用：讀取可並行（WAL），寫入以鎖序列化並使用 BEGIN IMMEDIATE
+5. 查詢結果快取：每次寫入交易提交後資料版本 +1，快取以（查詢鍵, 版本）判斷是否仍有效
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Sequence, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+WARDROBE_DB_PATH = PROJECT_ROOT / "database" / "wardrobe.db"
+
+# 連線池大小與 PRAGMA 設定（可用環境變數覆寫）
+DB_POOL_SIZE = int(os.getenv("WARDROBE_DB_POOL_SIZE", "4"))
+DB_MMAP_SIZE = int(os.getenv("WARDROBE_DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("WARDROBE_DB_CACHE_KB", "16384"))
+DB_STATEMENT_CACHE = 128      # 每條連線保留的 prepared statement 數
+DB_BUSY_TIMEOUT = 5.0         # 秒
+QUERY_CACHE_MAX_ENTRIES = 64  # 查詢結果快取保留的組合數（搜尋字 × 分類）
+
+
+class WardrobeDB:
+    """
+    衣櫥資料庫連線池
+
+    範例:
+        >>> db = WardrobeDB("database/wardrobe.db")
+        >>> df = db.read_df("SELECT * FROM wardrobe WHERE category = ?", ("トップス",))
+        >>> with db.transaction() as conn:
+        ...     conn.execute("UPDATE wardrobe SET quantity = ? WHERE key = ?", (2, key))
+    """
+
+    def __init__(self, db_path=WARDROBE_DB_PATH, pool_size: int = DB_POOL_SIZE):
+        self.db_path = Path(db_path)
+        self.pool_size = max(1, pool_size)
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._version_lock = threading.Lock()
+        self._data_version = 0
+        self.query_cache = QueryCache(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None：交易由 transaction() 明確控制
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=DB_BUSY_TIMEOUT,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=DB_STATEMENT_CACHE,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("資料庫連線池已關閉")
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._create_lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # 已達上限，等待其他 session 歸還連線
+        return self._pool.get(timeout=DB_BUSY_TIMEOUT * 2)
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """借用一條連線（讀取用，結束後自動歸還）"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        寫入交易：同一時間只有一個寫入者，成功時 COMMIT，發生例外時 ROLLBACK 並重新拋出
+        """
+        with self._write_lock, self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            self.bump_version()
+
+    @property
+    def data_version(self) -> Tuple[int, Tuple[int, ...]]:
+        """
+        目前的資料版本：（本程序的寫入次數, 資料庫與 WAL 檔的修改時間/大小）
+        後者讓爬蟲等其他程序寫入資料庫時也能使快取失效
+        """
+        signature = []
+        for path in (self.db_path, self.db_path.with_name(self.db_path.name + "-wal")):
+            try:
+                st = path.stat()
+                signature.extend((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.extend((0, 0))
+        return self._data_version, tuple(signature)
+
+    def bump_version(self):
+        """資料已變更（transaction() 提交後自動呼叫）"""
+        with self._version_lock:
+            self._data_version += 1
+
+    def read_df(self, sql: str, params: Optional[Sequence] = None):
+        """執行查詢並返回 pandas DataFrame"""
+        import pandas as pd
+
+        with self.connection() as conn:
+            return pd.read_sql(sql, conn, params=list(params or ()))
+
+    def fetchall(self, sql: str, params: Sequence = ()) -> list:
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def fetchone(self, sql: str, params: Sequence = ()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def close(self):
+        """關閉所有閒置連線（借出中的連線會在歸還時關閉）"""
+        self._closed = True
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class QueryCache:
+    """
+    查詢結果快取（LRU）：以查詢鍵記住結果與當時的資料版本，版本改變後自動重新查詢
+
+    範例:
+        >>> df = db.query_cache.get_or_load(("", None), lambda: db.read_df(sql))
+        >>> db.query_cache.stats()
+        {'hits': 5, 'misses': 1, 'invalidations': 0, 'hit_rate': 0.83, 'entries': 1}
+    """
+
+    def __init__(self, db: WardrobeDB, max_entries: int = QUERY_CACHE_MAX_ENTRIES):
+        self._db = db
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        取得快取結果，不存在或資料版本已變更時呼叫 loader() 重新查詢
+
+        注意：返回的物件由所有 session 共用，呼叫端不可原地修改
+        """
+        version = self._db.data_version
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.invalidations += 1
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """命中統計 {'hits', 'misses', 'invalidations', 'hit_rate', 'entries'}"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+_default_db: Optional[WardrobeDB] = None
+_default_db_lock = threading.Lock()
+
+
+def get_wardrobe_db(db_path=WARDROBE_DB_PATH) -> WardrobeDB:
+    """取得全域衣櫥資料庫連線池（非 Streamlit 程式使用；Streamlit 請用 st.cache_resource 包裝）"""
+    global _default_db
+    if _default_db is None or _default_db.db_path != Path(db_path):
+        with _default_db_lock:
+            if _default_db is None or _default_db.db_path != Path(db_path):
+                _default_db = WardrobeDB(db_path)
+    return _default_db
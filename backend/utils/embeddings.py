@@ -0,0 +1,218 @@
+"""
+衣櫥商品向量檢索（RAG 的檢索階段）
+功能：
+1. 純 CPU、無需下載模型的文字向量：字元 n-gram（1~3）雜湊到固定維度（signed feature hashing）
+   中文 / 日文沒有空白分詞，字元 n-gram 對「針織」「洋裝」這類詞組仍能比對
+2. 每件商品的向量（名稱 / 顏色 / 分類 / 子分類 / 材質）存在 wardrobe_embeddings 資料表，
+   以內容摘要判斷是否需要重算，只處理新增或修改過的商品
+3. NumPy 矩陣乘法一次計算所有商品與需求的餘弦相似度，取 top-k 交給 Gemini
+"""
+
+import hashlib
+import math
+import os
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.utils.category_translations import CATEGORY_TRANSLATIONS, SUBCATEGORY_TRANSLATIONS
+from backend.utils.schema import EMBEDDING_TABLE
+
+EMBEDDING_DIM = 512
+EMBEDDING_NGRAMS = (1, 2, 3)
+# 向量演算法版本：修改維度或特徵時要改，舊向量會自動重算
+EMBEDDING_VERSION = f"char-ngram-hash-v1-{EMBEDDING_DIM}"
+
+# 檢索數量（可用環境變數覆寫）
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "40"))
+RAG_PER_CATEGORY = int(os.getenv("RAG_PER_CATEGORY", "3"))
+
+_ITEM_QUERY = """
+    SELECT w.id, COALESCE(p.title, w.key) AS title, w.color_name, w.category, w.subcategory,
+           COALESCE(p.material, '') AS material
+    FROM wardrobe w
+    LEFT JOIN products p ON w.product_code = p.product_code
+"""
+
+
+def _features(text: str) -> Counter:
+    text = " ".join(text.lower().split())
+    features = Counter()
+    for n in EMBEDDING_NGRAMS:
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            if not gram.isspace():
+                features[gram] += 1
+    return features
+
+
+def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """
+    把多個字串轉成 L2 正規化的向量 (len(texts), EMBEDDING_DIM)，float32
+
+    雜湊使用 crc32（跨程序固定，不受 PYTHONHASHSEED 影響），最高位決定正負號以降低碰撞偏差
+    """
+    matrix = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for gram, count in _features(text or "").items():
+            h = zlib.crc32(gram.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            # 次線性詞頻：重複很多次的 n-gram 不會主導向量
+            matrix[row, h % EMBEDDING_DIM] += sign * (1.0 + math.log(count))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def item_texts(items: pd.DataFrame) -> pd.Series:
+    """商品的索引文字：名稱、顏色、分類與子分類（日文 + 中文 + 英文）、材質"""
+    def translated(values: pd.Series, table: Dict) -> pd.Series:
+        return values.map(lambda v: " ".join([v, *table[v].values()]) if v in table else v)
+
+    category = items["category"].fillna("").astype(str)
+    subcategory = items["subcategory"].fillna("").astype(str)
+    return (
+        items["title"].fillna("").astype(str) + " "
+        + items["color_name"].fillna("").astype(str) + " "
+        + translated(category, CATEGORY_TRANSLATIONS) + " "
+        + translated(subcategory, SUBCATEGORY_TRANSLATIONS) + " "
+        + items["material"].fillna("").astype(str)
+    )
+
+
+def _digests(texts: Iterable[str]) -> List[str]:
+    return [
+        hashlib.sha1(f"{EMBEDDING_VERSION}\n{text}".encode("utf-8")).hexdigest()
+        for text in texts
+    ]
+
+
+def sync_embeddings(db) -> Dict[str, int]:
+    """
+    增量更新商品向量：只重算新增 / 內容改變的商品，刪除已不存在商品的向量
+
+    參數:
+        db: WardrobeDB 連線池（資料表由遷移 v4 建立）
+
+    返回:
+        {'embedded', 'deleted', 'total'}
+    """
+    items = db.read_df(_ITEM_QUERY)
+    stored = dict(db.fetchall(f"SELECT item_id, digest FROM {EMBEDDING_TABLE}"))
+    texts = item_texts(items)
+    digests = _digests(texts)
+
+    changed = [i for i, (item_id, digest) in enumerate(zip(items["id"], digests)) if stored.get(item_id) != digest]
+    removed = set(stored) - set(items["id"].tolist())
+    if changed or removed:
+        vectors = embed_texts(texts.iloc[changed].tolist()) if changed else None
+        with db.transaction() as conn:
+            if changed:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {EMBEDDING_TABLE} (item_id, digest, vector) VALUES (?, ?, ?)",
+                    [
+                        (int(items["id"].iat[i]), digests[i], vectors[n].tobytes())
+                        for n, i in enumerate(changed)
+                    ]
+                )
+            if removed:
+                conn.executemany(f"DELETE FROM {EMBEDDING_TABLE} WHERE item_id = ?", [(i,) for i in removed])
+    return {"embedded": len(changed), "deleted": len(removed), "total": len(items)}
+
+
+def embed_item(conn, item_id: int) -> None:
+    """
+    計算單一商品的向量並寫入（新增商品時在同一個交易中呼叫，不必重新掃描整個衣櫥）
+
+    索引文字與摘要與 sync_embeddings 相同，之後的 sync 不會重算這件商品
+
+    參數:
+        conn: 交易中的連線（db.transaction()）
+        item_id: wardrobe.id
+    """
+    cursor = conn.execute(_ITEM_QUERY + " WHERE w.id = ?", (int(item_id),))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    item = pd.DataFrame([tuple(row)], columns=[d[0] for d in cursor.description])
+    text = item_texts(item).iat[0]
+    conn.execute(
+        f"INSERT OR REPLACE INTO {EMBEDDING_TABLE} (item_id, digest, vector) VALUES (?, ?, ?)",
+        (int(item_id), _digests([text])[0], embed_texts([text])[0].tobytes())
+    )
+
+
+def load_embedding_matrix(db):
+    """
+    讀取所有商品向量
+
+    返回:
+        (item_ids: np.ndarray[int64], matrix: np.ndarray[float32, (n, EMBEDDING_DIM)])
+    """
+    rows = db.fetchall(f"SELECT item_id, vector FROM {EMBEDDING_TABLE} ORDER BY item_id")
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    item_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    matrix = np.frombuffer(b"".join(r[1] for r in rows), dtype=np.float32).reshape(len(rows), EMBEDDING_DIM)
+    return item_ids, matrix
+
+
+def top_k(query: str, item_ids: np.ndarray, matrix: np.ndarray, k: int = RAG_TOP_K):
+    """
+    餘弦相似度 top-k（向量已正規化，內積即餘弦）
+
+    返回:
+        [(item_id, score), ...]，依分數由高到低
+    """
+    if len(item_ids) == 0 or k <= 0:
+        return []
+    scores = matrix @ embed_texts([query])[0]
+    k = min(k, len(scores))
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return [(int(item_ids[i]), float(scores[i])) for i in best]
+
+
+def retrieve_items(
+    db,
+    query: str,
+    wardrobe_df: pd.DataFrame,
+    k: int = RAG_TOP_K,
+    per_category: int = RAG_PER_CATEGORY,
+    index: Optional[tuple] = None
+) -> pd.DataFrame:
+    """
+    檢索與需求最相關的衣櫥商品（RAG 檢索階段）
+
+    除了整體 top-k，每個分類至少保留 per_category 件最相關的單品，
+    避免結果全是同一類而無法搭出完整穿搭
+
+    參數:
+        db: WardrobeDB 連線池
+        query: 使用者需求
+        wardrobe_df: load_wardrobe_data() 的結果（需有 id 欄位）
+        k: 整體取件數
+        per_category: 每個分類至少取件數
+        index: 預先載入的 (item_ids, matrix)，None 時從資料庫讀取
+
+    返回:
+        wardrobe_df 的子集，依相關度排序，並加上 score 欄位
+    """
+    if wardrobe_df.empty:
+        return wardrobe_df
+    item_ids, matrix = index if index is not None else load_embedding_matrix(db)
+    ranked = top_k(query, item_ids, matrix, len(item_ids))
+    if not ranked:
+        return wardrobe_df.head(k)
+
+    scores = pd.Series(dict(ranked), name="score")
+    candidates = wardrobe_df[wardrobe_df["id"].isin(scores.index)].copy()
+    candidates["score"] = candidates["id"].map(scores)
+    candidates = candidates.sort_values("score", ascending=False, kind="stable")
+
+    in_category_rank = candidates.groupby("category", sort=False).cumcount()
+    overall_rank = np.arange(len(candidates))
+    return candidates[(overall_rank < k) | (in_category_rank < per_category)]
@@ -0,0 +1,148 @@
+"""
+共用 HTTP 連線模組 - 所有對外請求（爬蟲、圖片下載、圖床上傳）都透過這裡
+功能：
+1. 每個主機的連線池 + keep-alive，重複請求不需重新 TCP/TLS 握手
+2. 可設定的連線池大小
+3. 預設逾時（避免請求無限期卡住）
+4. 連線錯誤與 5xx 的自動重試（urllib3 Retry）
+   爬蟲使用另一個只重試連線錯誤的 Session：狀態碼重試由 crawl 模組處理，才會經過每個主機的限速
+5. gzip / brotli 壓縮協商（有安裝 brotli 套件時才宣告 br）
+"""
+
+import os
+import threading
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 連線池大小：每個主機最多保留的連線數（需 >= 批次爬蟲的執行緒數）
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+# 預設逾時 (連線秒數, 讀取秒數)
+HTTP_DEFAULT_TIMEOUT = (5, 30)
+# 自動重試次數（只針對連線錯誤與 502/503/504）
+HTTP_MAX_RETRIES = 2
+HTTP_RETRY_STATUS_CODES = (502, 503, 504)
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+)
+
+
+def _accept_encoding() -> str:
+    """只在能解碼 brotli 時才宣告 br，否則伺服器回傳 br 會無法解壓"""
+    try:
+        import brotli  # noqa: F401
+        return "gzip, deflate, br"
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            return "gzip, deflate, br"
+        except ImportError:
+            return "gzip, deflate"
+
+
+class PooledSession(requests.Session):
+    """自動套用預設逾時的 Session（呼叫端仍可用 timeout= 覆寫）"""
+
+    def __init__(self, timeout: Union[float, Tuple[float, float]] = HTTP_DEFAULT_TIMEOUT):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    max_retries: int = HTTP_MAX_RETRIES,
+    timeout: Union[float, Tuple[float, float]] = HTTP_DEFAULT_TIMEOUT,
+    status_forcelist: Tuple[int, ...] = HTTP_RETRY_STATUS_CODES
+) -> PooledSession:
+    """
+    建立一個帶連線池、重試與預設逾時的 Session
+
+    參數:
+        pool_size: 每個主機的連線池大小
+        max_retries: 連線錯誤 / 502 / 503 / 504 的重試次數
+        timeout: 預設逾時（秒，或 (連線, 讀取) tuple）
+        status_forcelist: 要自動重試的狀態碼，() 表示只重試連線錯誤
+
+    返回:
+        PooledSession 物件
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=0.5,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        raise_on_status=False,  # 重試用完時返回最後的回應，由呼叫端判斷狀態碼
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = PooledSession(timeout=timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": DEFAULT_USER_AGENT,
+        "Accept-Encoding": _accept_encoding(),
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+_session: Optional[PooledSession] = None
+_crawler_session: Optional[PooledSession] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> PooledSession:
+    """取得全域共用 Session（第一次呼叫時建立）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def get_crawler_session() -> PooledSession:
+    """
+    取得爬蟲專用 Session：只重試連線錯誤，不重試狀態碼
+
+    429 / 5xx 由 crawl._scrape_with_retry 在限速器之後重試，
+    避免 urllib3 與爬蟲各自重試（同一頁多達十幾次請求）且繞過每個主機的限速
+    """
+    global _crawler_session
+    if _crawler_session is None:
+        with _session_lock:
+            if _crawler_session is None:
+                _crawler_session = create_session(status_forcelist=())
+    return _crawler_session
+
+
+def configure_session(**kwargs) -> PooledSession:
+    """
+    以新設定重建全域 Session（例如批次爬蟲前加大連線池）
+
+    參數:
+        **kwargs: 傳給 create_session 的參數（pool_size, max_retries, timeout）
+
+    返回:
+        新的 PooledSession 物件
+    """
+    global _session, _crawler_session
+    with _session_lock:
+        old = [_session, _crawler_session]
+        _session = create_session(**kwargs)
+        _crawler_session = create_session(**dict(kwargs, status_forcelist=()))
+    for session in old:
+        if session is not None:
+            session.close()
+    return _session
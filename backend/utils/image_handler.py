@@ -2,23 +2,35 @@
 圖片處理模組 - 優化 GRL 商品圖片處理
 功能：
 1. 將小像素圖片 URL 轉換為高畫質 URL
-2. 下載圖片到本地快取
+2. 下載圖片到本地快取（並行下載、串流寫入、原子性 rename）
 3. 支援圖片備份到雲端（Cloudinary/Imgur）
 4. 為二手轉售準備高品質圖片
 """
 
 import os
-import requests
 import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional, Dict, List
 from datetime import datetime
 import hashlib
 
+from backend.utils.color_codes import get_color_code
+from backend.utils.image_store import get_cache_manager, get_image_store
+
 # 圖片快取目錄（相對於專案根目錄）
+# 實際圖片以內容定址方式存放在 IMAGE_CACHE_DIR/blobs，索引見 image_store 模組
 IMAGE_CACHE_DIR = Path("images/cache")
 IMAGE_BACKUP_DIR = Path("images/backup")
 
+# 下載設定
+DOWNLOAD_MAX_WORKERS = 8          # 並行下載的執行緒數量
+DOWNLOAD_CHUNK_SIZE = 64 * 1024   # 串流寫入的區塊大小（位元組）
+
 
 def ensure_image_directories():
     """確保圖片目錄存在"""
@@ -62,6 +74,26 @@ def upgrade_image_url_to_high_quality(img_url: str) -> str:
     return high_quality_url
 
 
+def downgrade_image_url_to_thumbnail(img_url: str) -> str:
+    """
+    將 GRL 高畫質圖片 URL 轉為 CDN 縮圖 URL（upgrade_image_url_to_high_quality 的反向操作）
+    用於衣櫥格狀列表：本地沒有縮圖時，至少不要載入原圖
+    
+    範例:
+        >>> downgrade_image_url_to_thumbnail("https://cdn.grail.bz/images/goods/d/dk988/dk988_v1.jpg")
+        'https://cdn.grail.bz/images/goods/t/dk988/dk988_v1.jpg'
+        >>> downgrade_image_url_to_thumbnail("https://img.grail.bz/item/GRL-S3225/col_01.jpg")
+        'https://img.grail.bz/item/GRL-S3225/col_01_300x300.jpg'
+    """
+    if not img_url:
+        return img_url
+    if '/images/goods/d/' in img_url:
+        return img_url.replace('/images/goods/d/', '/images/goods/t/')
+    if 'img.grail.bz/item/' in img_url and not re.search(r'_\d+x\d+\.\w+$', img_url):
+        return re.sub(r'(\.\w+)$', r'_300x300\1', img_url)
+    return img_url
+
+
 def construct_image_url_from_product_code(
     product_code: str, 
     color_code: str = "01",
@@ -111,6 +143,18 @@ def extract_color_code_from_url(img_url: str) -> Optional[str]:
     return match.group(1) if match else None
 
 
+def image_quality_from_url(img_url: str) -> str:
+    """
+    判斷圖片 URL 的畫質等級
+    
+    返回:
+        "t"（縮圖：/t/ 路徑或 _150x150 等尺寸後綴）或 "d"（高畫質）
+    """
+    if '/images/goods/t/' in img_url or re.search(r'_\d+x\d+\.\w+$', img_url):
+        return "t"
+    return "d"
+
+
 def generate_image_filename(product_code: str, color: str, index: int = 1, extension: str = "jpg") -> str:
     """
     生成標準化的圖片檔名
@@ -133,18 +177,21 @@ def generate_image_filename(product_code: str, color: str, index: int = 1, exten
 def download_image(
     img_url: str,
     save_path: Path,
-    force_download: bool = False
+    force_download: bool = False,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE
 ) -> Dict[str, any]:
     """
-    下載圖片到本地
+    下載圖片到本地（串流分塊寫入暫存檔，完成後原子性 rename，中斷不會留下半張圖）
     
     參數:
         img_url: 圖片 URL
         save_path: 儲存路徑
         force_download: 是否強制重新下載（覆蓋已存在的檔案）
+        chunk_size: 每次寫入的位元組數
     
     返回:
-        下載結果字典 {'success': bool, 'path': str, 'size': int, 'message': str}
+        下載結果字典 {'success': bool, 'path': str, 'size': int, 'skipped': bool,
+                     'sha256': str（下載時同步計算，跳過下載時為 None）, 'message': str}
     """
     # 如果檔案已存在且不強制下載，跳過
     if save_path.exists() and not force_download:
@@ -153,155 +200,327 @@ def download_image(
             "success": True,
             "path": str(save_path),
             "size": file_size,
+            "skipped": True,
+            "sha256": None,
             "message": f"圖片已存在，跳過下載 ({file_size / 1024:.1f} KB)"
         }
     
+    # 延遲匯入：只用到 URL 轉換與本地快取查詢時（例如衣櫥列表）不必載入 requests
+    import requests
+    from backend.utils.http_client import get_session
+
+    tmp_path = None
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
         }
         
-        response = requests.get(img_url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
         # 確保父目錄存在
         save_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # 寫入檔案
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
+        with get_session().get(img_url, headers=headers, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            # 暫存檔放在同一目錄，os.replace 才能保證原子性
+            fd, tmp_name = tempfile.mkstemp(dir=save_path.parent, prefix=f".{save_path.name}.", suffix=".part")
+            tmp_path = Path(tmp_name)
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
         
+        os.replace(tmp_path, save_path)
+        tmp_path = None
         file_size = save_path.stat().st_size
         
         return {
             "success": True,
             "path": str(save_path),
             "size": file_size,
+            "skipped": False,
+            "sha256": digest.hexdigest(),
             "message": f"✅ 下載成功 ({file_size / 1024:.1f} KB)"
         }
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, OSError) as e:
         return {
             "success": False,
             "path": str(save_path),
             "size": 0,
+            "skipped": False,
+            "sha256": None,
             "message": f"❌ 下載失敗: {str(e)}"
         }
+    finally:
+        if tmp_path is not None and tmp_path.exists():
+            tmp_path.unlink()
+
+
+def link_or_copy(src: Path, dst: Path) -> Path:
+    """
+    以硬連結建立檔案副本（同一檔案系統不需複製位元組），不支援時退回一般複製
+    
+    參數:
+        src: 來源檔案
+        dst: 目標路徑（已存在則不處理）
+    
+    返回:
+        目標路徑
+    """
+    if dst.exists():
+        return dst
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def _download_color_job(product_code: str, idx: int, color_data: Dict, save_to_backup: bool) -> Dict:
+    """下載單一顏色圖片（執行緒池工作單位），存入內容定址儲存，返回明細字典"""
+    color_name = color_data.get("color", f"color_{idx}")
+    img_url = color_data.get("image_url", "")
+    
+    # 升級為高畫質 URL
+    hq_url = upgrade_image_url_to_high_quality(img_url)
+    color_code = extract_color_code_from_url(hq_url) or get_color_code(color_name) or f"idx{idx:02d}"
+    quality = image_quality_from_url(hq_url)
+    
+    # 生成檔名（備份目錄使用易讀的檔名）
+    filename = generate_image_filename(product_code, color_name, idx)
+    
+    store = get_image_store()
+    entry = store.lookup(product_code, color_code, quality)
+    if entry is not None and entry["path"].exists():
+        result_cache = {
+            "success": True,
+            "path": str(entry["path"]),
+            "size": entry["size"],
+            "skipped": True,
+            "message": f"圖片已存在，跳過下載 ({entry['size'] / 1024:.1f} KB)"
+        }
+    else:
+        # 下載到暫存區，完成後依 SHA-256 移入儲存區（相同內容只存一份）
+        incoming = store.incoming_path(f"{product_code}_{color_code}_{quality}_{threading.get_ident()}.jpg")
+        result_cache = download_image(hq_url, incoming, force_download=True)
+        if result_cache["success"]:
+            entry = store.add_file(
+                incoming, product_code, color_code, quality,
+                color_name=color_name, source_url=hq_url, digest=result_cache["sha256"]
+            )
+            result_cache["path"] = str(entry["path"])
+    
+    # 可選：備份到 backup 目錄（硬連結，不重複下載或複製）
+    if save_to_backup and result_cache["success"]:
+        try:
+            link_or_copy(Path(result_cache["path"]), IMAGE_BACKUP_DIR / product_code / filename)
+        except OSError as e:
+            print(f"⚠️ 備份失敗: {e}")
+    
+    return {
+        "product_code": product_code,
+        "color": color_name,
+        "color_code": color_code,
+        "original_url": img_url,
+        "high_quality_url": hq_url,
+        "local_path": result_cache.get("path"),
+        "success": result_cache["success"],
+        "skipped": result_cache["skipped"],
+        "size": result_cache["size"],
+        "message": result_cache["message"]
+    }
+
+
+def _run_download_jobs(jobs: List[tuple], max_workers: int, save_to_backup: bool) -> Dict[str, any]:
+    """
+    以執行緒池執行下載工作，並統計吞吐量
+    
+    參數:
+        jobs: [(product_code, idx, color_data), ...]
+        max_workers: 執行緒數量上限
+        save_to_backup: 是否備份到 backup 目錄
+    
+    返回:
+        {'details': [...]（與 jobs 順序相同）, 'stats': {...}}
+    """
+    start = time.perf_counter()
+    details = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(_download_color_job, product_code, idx, color_data, save_to_backup): position
+            for position, (product_code, idx, color_data) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            detail = future.result()
+            details[futures[future]] = detail
+            print(detail["message"])
+    elapsed = time.perf_counter() - start
+    
+    downloaded = [d for d in details if d["success"] and not d["skipped"]]
+    if downloaded:
+        # 新圖片寫入後檢查容量上限（每次最多淘汰數批，避免阻塞太久）
+        get_cache_manager().evict(max_steps=10)
+    bytes_downloaded = sum(d["size"] for d in downloaded)
+    stats = {
+        "files": len(downloaded),
+        "skipped": sum(1 for d in details if d["skipped"]),
+        "failed": sum(1 for d in details if not d["success"]),
+        "bytes": bytes_downloaded,
+        "elapsed": elapsed,
+        "files_per_sec": len(downloaded) / elapsed if elapsed > 0 else 0.0,
+        "bytes_per_sec": bytes_downloaded / elapsed if elapsed > 0 else 0.0,
+    }
+    return {"details": details, "stats": stats}
+
+
+def _generate_thumbnails_for(run: Dict, max_workers: Optional[int] = None) -> None:
+    """為這次新下載的圖片產生衣櫥列表用縮圖，數量記錄在 run["stats"]["thumbnails"]"""
+    new_paths = [Path(d["local_path"]) for d in run["details"] if d["success"] and not d["skipped"]]
+    if new_paths:
+        from backend.utils.thumbnails import generate_thumbnails
+        run["stats"]["thumbnails"] = generate_thumbnails(new_paths, max_workers=max_workers)["generated"]
 
 
 def download_product_images(
     product_code: str,
     color_images: List[Dict],
-    save_to_backup: bool = True
+    save_to_backup: bool = True,
+    max_workers: int = DOWNLOAD_MAX_WORKERS
 ) -> Dict[str, any]:
     """
-    下載商品的所有顏色圖片（高畫質版本）
+    下載商品的所有顏色圖片（高畫質版本，各顏色並行下載）
     
     參數:
         product_code: 商品代碼
         color_images: 顏色圖片列表 [{"color": "黑色", "image_url": "..."}]
         save_to_backup: 是否同時備份到 backup 目錄
+        max_workers: 並行下載的執行緒數量
     
     返回:
-        下載結果字典
+        下載結果字典（含 stats: bytes_per_sec / files_per_sec）
     """
     ensure_image_directories()
     
-    results = {
+    jobs = [(product_code, idx, color_data) for idx, color_data in enumerate(color_images, 1)]
+    run = _run_download_jobs(jobs, max_workers, save_to_backup)
+    # 單一商品的顏色不多，在本程序產生縮圖即可（不啟動子程序）
+    _generate_thumbnails_for(run, max_workers=1)
+    
+    return {
         "product_code": product_code,
         "total_colors": len(color_images),
-        "downloaded": 0,
-        "failed": 0,
-        "details": []
+        "downloaded": sum(1 for d in run["details"] if d["success"]),
+        "failed": run["stats"]["failed"],
+        "details": run["details"],
+        "stats": run["stats"]
     }
+
+
+def download_many_products(
+    products: List[Dict],
+    save_to_backup: bool = True,
+    max_workers: int = DOWNLOAD_MAX_WORKERS
+) -> Dict[str, any]:
+    """
+    批次下載多個商品的顏色圖片（所有商品、所有顏色共用同一個執行緒池，用於回補整個衣櫥）
     
-    for idx, color_data in enumerate(color_images, 1):
-        color_name = color_data.get("color", f"color_{idx}")
-        img_url = color_data.get("image_url", "")
-        
-        # 升級為高畫質 URL
-        hq_url = upgrade_image_url_to_high_quality(img_url)
-        
-        # 生成檔名
-        filename = generate_image_filename(product_code, color_name, idx)
-        
-        # 下載到快取目錄
-        cache_path = IMAGE_CACHE_DIR / product_code / filename
-        result_cache = download_image(hq_url, cache_path)
-        
-        # 可選：備份到 backup 目錄
-        if save_to_backup and result_cache["success"]:
-            backup_path = IMAGE_BACKUP_DIR / product_code / filename
-            result_backup = download_image(hq_url, backup_path, force_download=False)
-        
-        # 記錄結果
-        results["details"].append({
-            "color": color_name,
-            "original_url": img_url,
-            "high_quality_url": hq_url,
-            "local_path": result_cache.get("path"),
-            "success": result_cache["success"],
-            "message": result_cache["message"]
-        })
-        
-        if result_cache["success"]:
-            results["downloaded"] += 1
-        else:
-            results["failed"] += 1
-        
-        print(result_cache["message"])
+    參數:
+        products: [{"product_code": "dk988", "colors": [{"color": ..., "image_url": ...}]}, ...]
+                  （格式與 scrape_product_page 的結果相容）
+        save_to_backup: 是否同時備份到 backup 目錄
+        max_workers: 並行下載的執行緒數量
     
-    return results
+    返回:
+        {'products': int, 'details': [...], 'stats': {files, skipped, failed, bytes, elapsed,
+         files_per_sec, bytes_per_sec}}
+    """
+    ensure_image_directories()
+    
+    jobs = [
+        (product["product_code"], idx, color_data)
+        for product in products
+        for idx, color_data in enumerate(product.get("colors", []), 1)
+    ]
+    run = _run_download_jobs(jobs, max_workers, save_to_backup)
+    stats = run["stats"]
+    
+    # 為新下載的圖片產生衣櫥列表用縮圖（多程序）
+    _generate_thumbnails_for(run)
+    print(
+        f"📥 批次下載完成: {stats['files']} 張新圖片, {stats['skipped']} 張已存在, {stats['failed']} 張失敗, "
+        f"{stats['files_per_sec']:.1f} 張/秒, {stats['bytes_per_sec'] / 1024 / 1024:.2f} MB/秒"
+    )
+    return {"products": len(products), "details": run["details"], "stats": stats}
 
 
-def get_local_image_path(product_code: str, color: str, index: int = 1) -> Optional[Path]:
+def lookup_local_image(product_code: str, color: str, index: int = 1, quality: str = "d") -> Optional[Dict]:
     """
-    獲取本地快取圖片路徑（如果存在）
+    查詢本地快取圖片的 manifest 紀錄（不記錄存取，批次掃描用，不影響 LRU / LFU 淘汰順序）
     
     參數:
         product_code: 商品代碼
-        color: 顏色名稱
-        index: 圖片序號
+        color: 顏色名稱（例如：黑色的（ブラック））或顏色代碼（例如："11"）
+        index: 圖片序號（無法解析顏色代碼時使用）
+        quality: "d"（高畫質）或 "t"（縮圖）
+    
+    返回:
+        ImageStore.lookup 的紀錄（含 'path'、'digest'）或 None
+    """
+    store = get_image_store()
+    color_code = color if color.isdigit() else get_color_code(color)
+    entry = store.lookup(product_code, color_code, quality) if color_code else None
+    if entry is None:
+        entry = store.lookup_by_color_name(product_code, color, quality)
+    if entry is None:
+        entry = store.lookup(product_code, f"idx{index:02d}", quality)
+    return entry
+
+
+def get_local_image_path(product_code: str, color: str, index: int = 1, quality: str = "d") -> Optional[Path]:
+    """
+    獲取本地快取圖片路徑（如果存在），由 manifest 索引查詢，不需探測檔案系統
+    
+    參數:
+        product_code: 商品代碼
+        color: 顏色名稱（例如：黑色的（ブラック））或顏色代碼（例如："11"）
+        index: 圖片序號（無法解析顏色代碼時使用）
+        quality: "d"（高畫質）或 "t"（縮圖）
     
     返回:
         本地圖片路徑（Path 物件）或 None
     """
-    filename = generate_image_filename(product_code, color, index)
-    cache_path = IMAGE_CACHE_DIR / product_code / filename
+    entry = lookup_local_image(product_code, color, index, quality)
+    if entry is None:
+        return None
     
-    return cache_path if cache_path.exists() else None
+    # 記錄存取時間與次數，供容量淘汰（LRU / LFU）使用
+    get_image_store().touch(entry["product_code"], entry["color_code"], entry["quality"])
+    return entry["path"]
 
 
 def cleanup_old_cache(days: int = 30) -> Dict[str, int]:
     """
-    清理舊的快取圖片（可選功能）
+    清理舊的快取圖片（可選功能），以 manifest 的 mtime 索引查詢，不掃描目錄
     
     參數:
         days: 保留最近 N 天的圖片
     
     返回:
-        清理統計 {'deleted_files': int, 'freed_space': int}
+        清理統計 {'deleted_files': int, 'deleted_entries': int, 'freed_space': int}
     """
-    if not IMAGE_CACHE_DIR.exists():
-        return {"deleted_files": 0, "freed_space": 0}
-    
     now = datetime.now().timestamp()
     cutoff_time = now - (days * 24 * 60 * 60)
     
-    deleted_count = 0
-    freed_space = 0
-    
-    for img_file in IMAGE_CACHE_DIR.rglob("*.jpg"):
-        if img_file.stat().st_mtime < cutoff_time:
-            file_size = img_file.stat().st_size
-            img_file.unlink()
-            deleted_count += 1
-            freed_space += file_size
-            print(f"🗑️ 刪除舊快取: {img_file.name}")
+    result = get_image_store().delete_older_than(cutoff_time)
+    if result["deleted_entries"]:
+        print(f"🗑️ 刪除舊快取: {result['deleted_entries']} 筆索引, {result['deleted_blobs']} 個檔案")
     
     return {
-        "deleted_files": deleted_count,
-        "freed_space": freed_space
+        "deleted_files": result["deleted_blobs"],
+        "deleted_entries": result["deleted_entries"],
+        "freed_space": result["freed_space"]
     }
 
 
@@ -357,9 +576,11 @@ def upload_to_imgur(image_path: Path) -> Optional[str]:
         print("⚠️ 未設定 IMGUR_CLIENT_ID，跳過 Imgur 上傳")
         return None
     
+    from backend.utils.http_client import get_session
+
     try:
         with open(image_path, 'rb') as f:
-            response = requests.post(
+            response = get_session().post(
                 "https://api.imgur.com/3/image",
                 headers={"Authorization": f"Client-ID {IMGUR_CLIENT_ID}"},
                 files={"image": f}
@@ -0,0 +1,456 @@
+"""
+內容定址圖片儲存 - 以 SHA-256 儲存圖片，SQLite manifest 建立索引
+功能：
+1. 相同位元組只存一份（blobs/<前兩碼>/<sha256>.<副檔名>）
+2. manifest 以 (product_code, color_code, quality) 對應到 digest / size / mtime
+3. 查詢、清理都走索引，不需要掃描整個目錄
+4. 容量上限管理：依存取時間（LRU）或次數（LFU）逐步淘汰，可在背景執行
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from backend.utils.thumbnails import remove_thumbnails
+
+# 圖片儲存目錄（相對於專案根目錄，與 image_handler.IMAGE_CACHE_DIR 一致）
+IMAGE_STORE_DIR = Path("images/cache")
+HASH_CHUNK_SIZE = 64 * 1024
+
+# 快取容量上限（位元組，可用環境變數覆寫，預設 2 GB）與淘汰策略
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+IMAGE_CACHE_POLICY = os.getenv("IMAGE_CACHE_POLICY", "lru")
+# 存取紀錄先暫存在記憶體，累積到這個數量才寫入 manifest（避免每次讀取都寫入磁碟）
+TOUCH_FLUSH_THRESHOLD = 64
+
+
+def hash_file(path: Path) -> str:
+    """計算檔案的 SHA-256（分塊讀取）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageStore:
+    """
+    內容定址圖片儲存
+
+    範例:
+        >>> store = ImageStore()
+        >>> entry = store.add_file(tmp_path, "dk988", "11", "d", color_name="黑色的（ブラック）")
+        >>> store.lookup("dk988", "11", "d")["path"]
+        PosixPath('images/cache/blobs/3f/3fa9....jpg')
+    """
+
+    def __init__(self, root: Path = IMAGE_STORE_DIR):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.incoming_dir = self.root / "incoming"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.incoming_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / "manifest.db"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                ext TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS manifest (
+                product_code TEXT NOT NULL,
+                color_code TEXT NOT NULL,
+                quality TEXT NOT NULL,
+                digest TEXT NOT NULL REFERENCES blobs(digest),
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                color_name TEXT,
+                source_url TEXT,
+                PRIMARY KEY (product_code, color_code, quality)
+            );
+            CREATE INDEX IF NOT EXISTS idx_manifest_digest ON manifest(digest);
+            CREATE INDEX IF NOT EXISTS idx_manifest_mtime ON manifest(mtime);
+            CREATE INDEX IF NOT EXISTS idx_manifest_color_name ON manifest(product_code, color_name);
+        """)
+        # 舊版 manifest 沒有存取紀錄欄位，補上後建立淘汰用索引
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(manifest)")}
+        if "atime" not in columns:
+            self._conn.execute("ALTER TABLE manifest ADD COLUMN atime REAL")
+            self._conn.execute("UPDATE manifest SET atime = mtime")
+        if "hits" not in columns:
+            self._conn.execute("ALTER TABLE manifest ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+        self._conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_manifest_atime ON manifest(atime);
+            CREATE INDEX IF NOT EXISTS idx_manifest_hits ON manifest(hits, atime);
+        """)
+        self._conn.commit()
+        self._pending_touches: Dict[tuple, list] = {}
+
+    # ---------- 路徑 ----------
+
+    def blob_path(self, digest: str, ext: str = "jpg") -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}.{ext}"
+
+    def incoming_path(self, name: str) -> Path:
+        """下載暫存路徑（與 blobs 在同一檔案系統，rename 為原子操作）"""
+        return self.incoming_dir / name
+
+    # ---------- 寫入 ----------
+
+    def add_file(
+        self,
+        path: Path,
+        product_code: str,
+        color_code: str,
+        quality: str = "d",
+        color_name: Optional[str] = None,
+        source_url: Optional[str] = None,
+        digest: Optional[str] = None
+    ) -> Dict:
+        """
+        將檔案移入儲存區並寫入 manifest（相同內容只保留一份，原檔案會被移走或刪除）
+
+        參數:
+            path: 剛下載完成的檔案
+            product_code: 商品代碼
+            color_code: 顏色代碼（例如 "11"）
+            quality: "d"（高畫質）或 "t"（縮圖）
+            color_name: 顏色名稱（供以名稱查詢）
+            source_url: 原始圖片 URL
+            digest: 已在下載時算好的 SHA-256（省去再讀一次檔案）
+
+        返回:
+            manifest 項目字典（見 lookup）
+        """
+        path = Path(path)
+        digest = digest or hash_file(path)
+        ext = path.suffix.lstrip(".").lower() or "jpg"
+        if ext == "part":
+            ext = "jpg"
+        size = path.stat().st_size
+        blob = self.blob_path(digest, ext)
+        now = time.time()
+
+        with self._lock:
+            known = self._conn.execute("SELECT ext FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if known is not None:
+                blob = self.blob_path(digest, known["ext"])
+            if blob.exists():
+                path.unlink()  # 重複內容：丟棄新檔案
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, blob)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (digest, size, ext, created_at) VALUES (?, ?, ?, ?)",
+                (digest, size, blob.suffix.lstrip("."), now)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifest "
+                "(product_code, color_code, quality, digest, size, mtime, color_name, source_url, atime, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (product_code, color_code, quality, digest, size, now, color_name, source_url, now)
+            )
+            self._conn.commit()
+        return self.lookup(product_code, color_code, quality)
+
+    # ---------- 查詢 ----------
+
+    def _entry(self, row) -> Optional[Dict]:
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["path"] = self.blob_path(entry["digest"], entry.pop("ext"))
+        return entry
+
+    _SELECT = (
+        "SELECT m.product_code, m.color_code, m.quality, m.digest, m.size, m.mtime, "
+        "m.color_name, m.source_url, m.atime, m.hits, b.ext FROM manifest m JOIN blobs b ON b.digest = m.digest "
+    )
+
+    # ---------- 存取紀錄 ----------
+
+    def touch(self, product_code: str, color_code: str, quality: str = "d") -> None:
+        """記錄一次讀取（更新 atime、hits），累積到 TOUCH_FLUSH_THRESHOLD 筆才寫入"""
+        key = (product_code, color_code, quality)
+        with self._lock:
+            pending = self._pending_touches.setdefault(key, [0.0, 0])
+            pending[0] = time.time()
+            pending[1] += 1
+            if len(self._pending_touches) >= TOUCH_FLUSH_THRESHOLD:
+                self._flush_touches()
+
+    def _flush_touches(self) -> None:
+        """將暫存的存取紀錄寫入 manifest（呼叫前需持有鎖）"""
+        if not self._pending_touches:
+            return
+        self._conn.executemany(
+            "UPDATE manifest SET atime = ?, hits = hits + ? "
+            "WHERE product_code = ? AND color_code = ? AND quality = ?",
+            [(atime, hits, *key) for key, (atime, hits) in self._pending_touches.items()]
+        )
+        self._conn.commit()
+        self._pending_touches.clear()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_touches()
+
+    def lookup(self, product_code: str, color_code: str, quality: str = "d") -> Optional[Dict]:
+        """
+        以索引查詢圖片
+
+        返回:
+            {'product_code', 'color_code', 'quality', 'digest', 'size', 'mtime',
+             'color_name', 'source_url', 'path'} 或 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                self._SELECT + "WHERE m.product_code = ? AND m.color_code = ? AND m.quality = ?",
+                (product_code, color_code, quality)
+            ).fetchone()
+        return self._entry(row)
+
+    def lookup_by_color_name(self, product_code: str, color_name: str, quality: str = "d") -> Optional[Dict]:
+        """以顏色名稱查詢（無法解析顏色代碼時使用）"""
+        with self._lock:
+            row = self._conn.execute(
+                self._SELECT + "WHERE m.product_code = ? AND m.color_name = ? AND m.quality = ? "
+                "ORDER BY m.mtime DESC LIMIT 1",
+                (product_code, color_name, quality)
+            ).fetchone()
+        return self._entry(row)
+
+    def list_product(self, product_code: str) -> List[Dict]:
+        """列出一個商品的所有圖片"""
+        with self._lock:
+            rows = self._conn.execute(
+                self._SELECT + "WHERE m.product_code = ? ORDER BY m.color_code, m.quality",
+                (product_code,)
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def list_blobs(self) -> List[Path]:
+        """列出所有 blob 路徑（供縮圖等衍生檔案批次產生）"""
+        with self._lock:
+            rows = self._conn.execute("SELECT digest, ext FROM blobs").fetchall()
+        return [self.blob_path(row["digest"], row["ext"]) for row in rows]
+
+    # ---------- 刪除 ----------
+
+    def _delete_orphan_blobs(self) -> Dict[str, int]:
+        """刪除沒有任何 manifest 參照的 blob 及其縮圖（呼叫前需持有鎖）"""
+        orphans = self._conn.execute(
+            "SELECT b.digest, b.size, b.ext FROM blobs b "
+            "WHERE NOT EXISTS (SELECT 1 FROM manifest m WHERE m.digest = b.digest)"
+        ).fetchall()
+        freed = 0
+        for row in orphans:
+            blob = self.blob_path(row["digest"], row["ext"])
+            try:
+                blob.unlink()
+            except FileNotFoundError:
+                pass
+            # 縮圖以同一個 SHA-256 命名，原圖不在了縮圖也不會再被使用
+            freed += row["size"] + remove_thumbnails(row["digest"])
+        self._conn.executemany("DELETE FROM blobs WHERE digest = ?", [(row["digest"],) for row in orphans])
+        return {"deleted_blobs": len(orphans), "freed_space": freed}
+
+    def delete_older_than(self, cutoff: float) -> Dict[str, int]:
+        """
+        刪除 mtime 早於 cutoff 的項目（走 mtime 索引），並移除不再被參照的 blob
+
+        返回:
+            {'deleted_entries': int, 'deleted_blobs': int, 'freed_space': int}
+        """
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM manifest WHERE mtime < ?", (cutoff,)).rowcount
+            result = self._delete_orphan_blobs()
+            self._conn.commit()
+        result["deleted_entries"] = deleted
+        return result
+
+    def remove(self, product_code: str, color_code: str, quality: str = "d") -> Dict[str, int]:
+        """刪除單一項目"""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM manifest WHERE product_code = ? AND color_code = ? AND quality = ?",
+                (product_code, color_code, quality)
+            ).rowcount
+            result = self._delete_orphan_blobs()
+            self._conn.commit()
+        result["deleted_entries"] = deleted
+        return result
+
+    def evict_batch(self, policy: str = "lru", limit: int = 100) -> Dict[str, int]:
+        """
+        依策略淘汰最多 limit 筆項目（LRU：最久未讀取；LFU：讀取次數最少，同分再比時間）
+
+        返回:
+            {'deleted_entries': int, 'deleted_blobs': int, 'freed_space': int}
+        """
+        order = "hits ASC, atime ASC" if policy == "lfu" else "atime ASC"
+        with self._lock:
+            self._flush_touches()
+            deleted = self._conn.execute(
+                "DELETE FROM manifest WHERE rowid IN "
+                f"(SELECT rowid FROM manifest ORDER BY {order} LIMIT ?)",
+                (limit,)
+            ).rowcount
+            result = self._delete_orphan_blobs()
+            self._conn.commit()
+        result["deleted_entries"] = deleted
+        return result
+
+    def total_bytes(self) -> int:
+        """目前實際占用的位元組數（去重後）"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """{'entries', 'blobs', 'bytes', 'logical_bytes'}（logical_bytes 為未去重前的總大小）"""
+        with self._lock:
+            entries, logical = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM manifest"
+            ).fetchone()
+            blobs, physical = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+        return {"entries": entries, "blobs": blobs, "bytes": physical, "logical_bytes": logical}
+
+
+_default_store: Optional[ImageStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """取得全域圖片儲存（第一次呼叫時建立目錄與 manifest）"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ImageStore()
+    return _default_store
+
+
+class ImageCacheManager:
+    """
+    圖片快取容量管理：超過上限時依 LRU / LFU 逐批淘汰，直到低於低水位
+
+    範例:
+        >>> manager = ImageCacheManager(get_image_store(), max_bytes=500 * 1024 ** 2)
+        >>> manager.evict()                    # 立即淘汰到低水位以下
+        >>> manager.start_background(60)       # 每 60 秒在背景檢查一次
+        >>> manager.usage()["utilization"]
+    """
+
+    def __init__(self, store: ImageStore, max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 policy: str = IMAGE_CACHE_POLICY, low_watermark: float = 0.9, batch_size: int = 100):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"未知的淘汰策略: {policy}（可用: lru, lfu）")
+        self.store = store
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.low_watermark = low_watermark
+        self.batch_size = batch_size
+        self.evicted_entries = 0
+        self.freed_space = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def usage(self) -> Dict:
+        """目前用量 {'entries', 'blobs', 'bytes', 'logical_bytes', 'max_bytes', 'utilization', 'policy', 'evicted_entries', 'freed_space'}"""
+        self.store.flush()
+        stats = self.store.stats()
+        stats.update({
+            "max_bytes": self.max_bytes,
+            "utilization": stats["bytes"] / self.max_bytes if self.max_bytes else 0.0,
+            "policy": self.policy,
+            "evicted_entries": self.evicted_entries,
+            "freed_space": self.freed_space,
+        })
+        return stats
+
+    def evict_step(self) -> Dict[str, int]:
+        """
+        淘汰一批（最多 batch_size 筆），只在超過上限或尚未降到低水位時動作
+
+        返回:
+            本批統計 {'deleted_entries', 'deleted_blobs', 'freed_space'}，不需淘汰時皆為 0
+        """
+        target = self.max_bytes * self.low_watermark
+        if self.store.total_bytes() <= target:
+            return {"deleted_entries": 0, "deleted_blobs": 0, "freed_space": 0}
+        result = self.store.evict_batch(self.policy, self.batch_size)
+        self.evicted_entries += result["deleted_entries"]
+        self.freed_space += result["freed_space"]
+        return result
+
+    def evict(self, max_steps: Optional[int] = None) -> Dict[str, int]:
+        """
+        超過上限時逐批淘汰到低水位以下（max_steps 可限制單次呼叫的工作量）
+
+        返回:
+            累計統計 {'deleted_entries', 'deleted_blobs', 'freed_space'}
+        """
+        total = {"deleted_entries": 0, "deleted_blobs": 0, "freed_space": 0}
+        if self.store.total_bytes() <= self.max_bytes:
+            return total
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            result = self.evict_step()
+            if not result["deleted_entries"]:
+                break
+            for key in total:
+                total[key] += result[key]
+            steps += 1
+        if total["deleted_entries"]:
+            print(f"🗑️ 快取淘汰 ({self.policy}): {total['deleted_entries']} 筆, "
+                  f"釋放 {total['freed_space'] / 1024 / 1024:.1f} MB")
+        return total
+
+    def _run(self, interval: float, max_steps: int) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.evict(max_steps=max_steps)
+            except Exception as e:
+                print(f"⚠️ 背景快取淘汰失敗: {e}")
+
+    def start_background(self, interval: float = 60.0, max_steps: int = 10) -> None:
+        """啟動背景淘汰執行緒（每 interval 秒最多淘汰 max_steps 批，避免長時間占用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval, max_steps), name="image-cache-evictor", daemon=True
+        )
+        self._thread.start()
+
+    def stop_background(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_default_manager: Optional[ImageCacheManager] = None
+_default_manager_lock = threading.Lock()
+
+
+def get_cache_manager() -> ImageCacheManager:
+    """取得全域快取容量管理器（使用 IMAGE_CACHE_MAX_BYTES / IMAGE_CACHE_POLICY 設定）"""
+    global _default_manager
+    if _default_manager is None:
+        # 使用獨立的鎖：get_image_store() 可能需要取得 _default_store_lock（非重入鎖）
+        with _default_manager_lock:
+            if _default_manager is None:
+                _default_manager = ImageCacheManager(get_image_store())
+    return _default_manager
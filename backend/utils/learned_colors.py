@@ -0,0 +1,173 @@
+"""
+從爬到的商品頁學習顏色編號 - 顏色名稱 → CDN col_ 編號
+功能：
+1. 爬蟲每解析一頁就記錄 (顏色名稱, col_ 編號)（來源是顏色圖片的 URL，不需額外請求）
+2. SQLite 持久化，記錄每組對應出現的次數、商品數與最後出現時間
+3. 同一顏色出現多個編號時保留全部並可查詢（conflicts），查詢時取出現次數最多的編號
+4. color_codes.get_color_code / get_color_image_url 在靜態對照表查不到時使用這裡的結果
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.utils.color_registry import normalize_color_name, split_color_name
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 學習結果檔案位置（可用環境變數覆寫）
+LEARNED_COLORS_PATH = Path(os.getenv("LEARNED_COLORS_PATH", PROJECT_ROOT / "cache" / "learned_colors.db"))
+
+
+def color_key(color_name: str) -> str:
+    """
+    學習表的查詢鍵：商品頁上的顏色是日文，衣櫥裡是「中文（日文）」，兩者都以日文部分為鍵
+    """
+    zh, ja = split_color_name(color_name)
+    return normalize_color_name(ja or zh)
+
+
+class LearnedColorStore:
+    """顏色名稱 → 編號的學習表（SQLite）"""
+
+    def __init__(self, db_path: Path = LEARNED_COLORS_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS color_codes (
+                color_key TEXT NOT NULL,
+                code TEXT NOT NULL,
+                color_name TEXT NOT NULL,
+                seen_count INTEGER NOT NULL DEFAULT 0,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (color_key, code)
+            );
+            CREATE TABLE IF NOT EXISTS color_code_products (
+                color_key TEXT NOT NULL,
+                code TEXT NOT NULL,
+                product_code TEXT NOT NULL,
+                PRIMARY KEY (color_key, code, product_code)
+            );
+        """)
+        self._conn.commit()
+        self._snapshot: Optional[Dict[str, Tuple[str, ...]]] = None
+
+    def record(self, product_code: str, pairs: Iterable[Tuple[str, str]]) -> int:
+        """
+        記錄一個商品頁上的 (顏色名稱, 編號)
+
+        同一商品重複爬取不會重複計數（seen_count 是出現過的商品數）
+
+        返回:
+            新增的 (顏色, 編號, 商品) 組合數
+        """
+        now = time.time()
+        rows: Dict[Tuple[str, str], str] = {}
+        for name, code in pairs:
+            if name and code and color_key(name):
+                rows.setdefault((color_key(name), str(code)), name)
+        if not rows:
+            return 0
+        added = 0
+        with self._lock:
+            with self._conn:
+                for (key, code), name in rows.items():
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO color_code_products (color_key, code, product_code) VALUES (?, ?, ?)",
+                        (key, code, product_code or "")
+                    )
+                    is_new = cursor.rowcount
+                    added += is_new
+                    self._conn.execute(
+                        "INSERT INTO color_codes (color_key, code, color_name, seen_count, first_seen, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (color_key, code) DO UPDATE SET "
+                        "seen_count = seen_count + excluded.seen_count, last_seen = excluded.last_seen",
+                        (key, code, name, is_new, now, now)
+                    )
+            if added:
+                self._snapshot = None
+        return added
+
+    def _load_snapshot(self) -> Dict[str, Tuple[str, ...]]:
+        """所有學到的對應（依出現次數、最後出現時間排序），寫入後才重新讀取"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT color_key, code FROM color_codes ORDER BY color_key, seen_count DESC, last_seen DESC"
+                ).fetchall()
+                snapshot = {}
+                for key, code in rows:
+                    snapshot.setdefault(key, []).append(code)
+                snapshot = {key: tuple(codes) for key, codes in snapshot.items()}
+                self._snapshot = snapshot
+        return snapshot
+
+    def codes(self, color_name: str) -> Tuple[str, ...]:
+        """顏色的所有學到的編號（最常見的在前）"""
+        return self._load_snapshot().get(color_key(color_name), ())
+
+    def code(self, color_name: str, index: int = 0) -> Optional[str]:
+        """顏色的編號（依出現次數排序取第 index 個，超出範圍取最常見的；沒學過返回 None）"""
+        codes = self.codes(color_name)
+        if not codes:
+            return None
+        return codes[index] if 0 <= index < len(codes) else codes[0]
+
+    def conflicts(self) -> List[Dict]:
+        """
+        對應到多個編號的顏色
+
+        返回:
+            [{"color_name": str, "codes": [{"code", "seen_count", "last_seen"}, ...]}, ...]
+        """
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT color_key, color_name, code, seen_count, last_seen FROM color_codes
+                WHERE color_key IN (SELECT color_key FROM color_codes GROUP BY color_key HAVING COUNT(*) > 1)
+                ORDER BY color_key, seen_count DESC, last_seen DESC
+            """).fetchall()
+        conflicts: Dict[str, Dict] = {}
+        for key, name, code, seen_count, last_seen in rows:
+            entry = conflicts.setdefault(key, {"color_name": name, "codes": []})
+            entry["codes"].append({"code": code, "seen_count": seen_count, "last_seen": last_seen})
+        return list(conflicts.values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            colors, pairs = self._conn.execute(
+                "SELECT COUNT(DISTINCT color_key), COUNT(*) FROM color_codes"
+            ).fetchone()
+        return {"colors": colors, "pairs": pairs, "conflicts": len(self.conflicts())}
+
+
+_default_store: Optional[LearnedColorStore] = None
+_default_store_failed = False
+_default_store_lock = threading.Lock()
+
+
+def get_learned_color_store() -> Optional[LearnedColorStore]:
+    """
+    取得全域學習表（無法開啟檔案時返回 None，只使用靜態對照表）
+
+    開啟失敗只嘗試一次，之後的查詢直接返回 None，不會每次都重試、印出警告
+    """
+    global _default_store, _default_store_failed
+    if _default_store is None and not _default_store_failed:
+        with _default_store_lock:
+            if _default_store is None and not _default_store_failed:
+                try:
+                    _default_store = LearnedColorStore()
+                except (sqlite3.Error, OSError) as e:
+                    _default_store_failed = True
+                    print(f"⚠️ 無法開啟顏色編號學習表: {e}")
+    return _default_store
@@ -0,0 +1,140 @@
+"""
+衣櫥資料庫結構遷移
+功能：
+1. 以 PRAGMA user_version 記錄目前結構版本，只執行尚未套用的遷移
+2. 每個遷移在獨立交易中執行，失敗時整個遷移回滾、版本不變
+3. 遷移列表：
+   v1 wardrobe 加上整數代理鍵 id（INTEGER PRIMARY KEY，沿用原本的 rowid），key 改為 UNIQUE
+   v2 建立 (category, subcategory)、product_code、color_name 索引
+   v3 建立 FTS5 trigram 全文搜尋索引（以 wardrobe.id 對應）
+   v4 建立 wardrobe_embeddings 商品向量表（AI 造型師檢索用）
+   v5 建立 wardrobe_palettes 商品色票表（主色分析，見 color_palette）
+
+用法:
+    python -m backend.utils.migrations              # 遷移 database/wardrobe.db 到最新版本
+    python -m backend.utils.migrations --status     # 只顯示目前版本
+    python -m backend.utils.migrations --db path/to/other.db
+"""
+
+import argparse
+import sqlite3
+from typing import Callable, List, Tuple
+
+from backend.utils.db import WARDROBE_DB_PATH, WardrobeDB
+from backend.utils.schema import EMBEDDING_SCHEMA, PALETTE_SCHEMA
+from backend.utils.wardrobe_search import create_search_index, drop_search_index
+
+
+def _add_wardrobe_surrogate_id(conn):
+    # 重建資料表前先移除引用 wardrobe 的全文搜尋 trigger（v3 會重新建立）
+    drop_search_index(conn)
+    conn.execute("""
+        CREATE TABLE wardrobe_new (
+            id INTEGER PRIMARY KEY,
+            "key" VARCHAR NOT NULL UNIQUE,
+            product_code VARCHAR NOT NULL,
+            product_url VARCHAR NOT NULL,
+            color_name VARCHAR NOT NULL,
+            size VARCHAR NOT NULL,
+            image_url VARCHAR NOT NULL,
+            price_twd INTEGER,
+            category VARCHAR NOT NULL,
+            subcategory VARCHAR,
+            quantity INTEGER,
+            arrival_date DATETIME,
+            FOREIGN KEY(product_code) REFERENCES products (product_code)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO wardrobe_new (id, "key", product_code, product_url, color_name, size, image_url,
+                                  price_twd, category, subcategory, quantity, arrival_date)
+        SELECT rowid, "key", product_code, product_url, color_name, size, image_url,
+               price_twd, category, subcategory, quantity, arrival_date
+        FROM wardrobe
+    """)
+    conn.execute("DROP TABLE wardrobe")
+    conn.execute("ALTER TABLE wardrobe_new RENAME TO wardrobe")
+
+
+def _add_wardrobe_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_wardrobe_category ON wardrobe (category, subcategory)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_wardrobe_product_code ON wardrobe (product_code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_wardrobe_color_name ON wardrobe (color_name)")
+
+
+def _add_search_index(conn):
+    drop_search_index(conn)
+    try:
+        create_search_index(conn)
+    except sqlite3.OperationalError as e:
+        # 舊版 SQLite 沒有 FTS5 或 trigram 分詞器：記錄版本但不建立索引，搜尋改用 LIKE
+        print(f"⚠️ 無法建立全文搜尋索引，改用 LIKE 搜尋: {e}")
+
+
+def _add_embedding_table(conn):
+    conn.execute(EMBEDDING_SCHEMA)
+
+
+def _add_palette_table(conn):
+    conn.execute(PALETTE_SCHEMA)
+
+
+# (版本, 說明, 遷移函數)，版本必須遞增；已發布的遷移不可修改，只能新增
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "wardrobe 加上整數代理鍵 id", _add_wardrobe_surrogate_id),
+    (2, "wardrobe 建立分類 / 商品代碼 / 顏色索引", _add_wardrobe_indexes),
+    (3, "建立 FTS5 trigram 全文搜尋索引", _add_search_index),
+    (4, "建立商品向量表", _add_embedding_table),
+    (5, "建立商品色票表", _add_palette_table),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db: WardrobeDB) -> int:
+    return db.fetchone("PRAGMA user_version")[0]
+
+
+def migrate(db: WardrobeDB, target: int = LATEST_VERSION) -> List[int]:
+    """
+    套用所有尚未執行的遷移
+
+    參數:
+        db: WardrobeDB 連線池
+        target: 遷移到的版本（預設最新）
+
+    返回:
+        本次套用的版本列表
+    """
+    applied = []
+    if get_schema_version(db) >= target:
+        return applied
+    for version, description, apply in MIGRATIONS:
+        if version > target:
+            break
+        with db.transaction() as conn:
+            # 在寫入鎖內重新讀取版本，避免多個程序 / session 重複執行同一個遷移
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        print(f"🛠️ 資料庫遷移 v{version}: {description}")
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="衣櫥資料庫結構遷移")
+    parser.add_argument("--db", default=str(WARDROBE_DB_PATH))
+    parser.add_argument("--status", action="store_true", help="只顯示目前版本")
+    parser.add_argument("--target", type=int, default=LATEST_VERSION)
+    args = parser.parse_args()
+
+    database = WardrobeDB(args.db)
+    current = get_schema_version(database)
+    if args.status:
+        print(f"📦 {args.db}: v{current}（最新 v{LATEST_VERSION}）")
+    else:
+        applied = migrate(database, args.target)
+        print(f"✅ 目前版本 v{get_schema_version(database)}" + ("" if applied else "（已是最新）"))
+    database.close()
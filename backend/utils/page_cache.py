@@ -0,0 +1,139 @@
+"""
+商品頁快取模組 - 重新爬取時使用 HTTP 條件請求
+功能：
+1. 在磁碟保存原始 HTML（zlib 壓縮）與 ETag / Last-Modified
+2. 保存上一次的解析結果與解析器版本，伺服器回 304 時直接沿用，不需重新下載與解析
+   （解析器版本不同時由呼叫端以快取的 HTML 重新解析）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 商品頁快取檔案位置（可用環境變數覆寫）
+PAGE_CACHE_PATH = Path(os.getenv("PAGE_CACHE_PATH", PROJECT_ROOT / "cache" / "page_cache.db"))
+
+
+class PageCache:
+    """以 URL 為鍵的原始回應 + 解析結果快取（SQLite）"""
+
+    def __init__(self, db_path: Path = PAGE_CACHE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                parsed TEXT,
+                fetched_at REAL NOT NULL,
+                validated_at REAL NOT NULL
+            )
+        """)
+        # 舊版快取沒有解析器版本欄位：補上後舊的解析結果視為過期
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        if "parse_version" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN parse_version TEXT")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        查詢快取項目
+
+        返回:
+            {'etag', 'last_modified', 'html', 'parsed', 'parse_version', 'fetched_at', 'validated_at'} 或 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body, parsed, parse_version, fetched_at, validated_at "
+                "FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body, parsed, parse_version, fetched_at, validated_at = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "html": zlib.decompress(body).decode("utf-8"),
+            "parsed": json.loads(parsed) if parsed else None,
+            "parse_version": parse_version,
+            "fetched_at": fetched_at,
+            "validated_at": validated_at,
+        }
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        """依快取項目產生 If-None-Match / If-Modified-Since 標頭"""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, html: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, parsed: Optional[Dict] = None,
+            parse_version: Optional[str] = None) -> None:
+        """寫入（或覆蓋）一頁的原始 HTML 與解析結果（parse_version 為產生解析結果的解析器版本）"""
+        now = time.time()
+        body = zlib.compress(html.encode("utf-8"))
+        parsed_json = json.dumps(parsed, ensure_ascii=False) if parsed is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, etag, last_modified, body, parsed, parse_version, fetched_at, validated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, parsed_json, parse_version, now, now)
+            )
+            self._conn.commit()
+
+    def update_parsed(self, url: str, parsed: Dict, parse_version: Optional[str] = None) -> None:
+        """只更新解析結果（例如快取中只有 HTML，或解析器版本已更新時重新解析）"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET parsed = ?, parse_version = ? WHERE url = ?",
+                (json.dumps(parsed, ensure_ascii=False), parse_version, url)
+            )
+            self._conn.commit()
+
+    def mark_validated(self, url: str) -> None:
+        """收到 304 時更新最後驗證時間"""
+        with self._lock:
+            self._conn.execute("UPDATE pages SET validated_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def delete(self, url: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._conn.commit()
+
+
+_default_cache: Optional[PageCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """取得全域商品頁快取（無法開啟檔案時返回 None，爬蟲會改為不使用快取）"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                try:
+                    _default_cache = PageCache()
+                except (sqlite3.Error, OSError) as e:
+                    print(f"⚠️ 無法開啟商品頁快取: {e}")
+                    return None
+    return _default_cache
@@ -0,0 +1,272 @@
+"""
+商品照片存在性檢測 - 以 HEAD 請求確認哪些模特照 / 顏色圖實際存在
+功能：
+1. 併發送出 HEAD 請求（共用 http_client 連線池），不下載圖片本體
+2. 結果存到 SQLite 可用性索引，存在的照片長期有效、不存在的照片較短 TTL 後重新檢測
+3. probe_model_photos（color_codes.get_available_model_photos）只返回確實存在的 URL，前端不必再逐張嘗試 v1 ~ v11
+
+用法:
+    python -m backend.utils.photo_probe dk909 tw1122      # 檢測並顯示存在的模特照
+    python -m backend.utils.photo_probe --refresh dk909   # 忽略索引重新檢測
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from backend.utils.color_codes import get_model_photo_url
+from backend.utils.http_client import get_session
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 可用性索引檔案位置與 TTL（可用環境變數覆寫）
+PHOTO_AVAILABILITY_PATH = Path(
+    os.getenv("PHOTO_AVAILABILITY_PATH", PROJECT_ROOT / "cache" / "photo_availability.db")
+)
+PHOTO_FOUND_TTL = float(os.getenv("PHOTO_FOUND_TTL", str(30 * 24 * 3600)))     # 存在：30 天
+PHOTO_MISSING_TTL = float(os.getenv("PHOTO_MISSING_TTL", str(3 * 24 * 3600)))  # 不存在：3 天（商品可能補上照片）
+PROBE_MAX_WORKERS = 16
+PROBE_TIMEOUT = (3, 5)
+
+MODEL_PHOTO_V_RANGE = (1, 11)
+
+
+def color_photo_url(product_code: str, color_code: str, quality: str = "d") -> str:
+    return f"https://cdn.grail.bz/images/goods/{quality}/{product_code}/{product_code}_col_{color_code}.jpg"
+
+
+class PhotoAvailabilityIndex:
+    """照片 URL 是否存在的持久索引（SQLite）"""
+
+    def __init__(self, db_path: Path = PHOTO_AVAILABILITY_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS photo_availability (
+                url TEXT PRIMARY KEY,
+                product_code TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                found INTEGER NOT NULL,
+                status INTEGER,
+                checked_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_photo_product ON photo_availability (product_code, kind)"
+        )
+        self._conn.commit()
+
+    def get_many(self, urls: List[str], now: Optional[float] = None) -> Dict[str, bool]:
+        """
+        查詢仍在 TTL 內的檢測結果
+
+        返回:
+            {url: 是否存在}，過期或未檢測過的 URL 不會出現在結果中
+        """
+        now = now or time.time()
+        results = {}
+        with self._lock:
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT url, found, checked_at FROM photo_availability "
+                    f"WHERE url IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for url, found, checked_at in rows:
+                    ttl = PHOTO_FOUND_TTL if found else PHOTO_MISSING_TTL
+                    if now - checked_at <= ttl:
+                        results[url] = bool(found)
+        return results
+
+    def put_many(self, records: Iterable[Tuple[str, str, str, str, bool, Optional[int]]]) -> None:
+        """records: [(url, product_code, kind, variant, found, status), ...]"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO photo_availability "
+                "(url, product_code, kind, variant, found, status, checked_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(url, code, kind, variant, int(found), status, now)
+                 for url, code, kind, variant, found, status in records]
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            total, found = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(found), 0) FROM photo_availability"
+            ).fetchone()
+        return {"total": total, "found": found, "missing": total - found}
+
+
+_default_index: Optional[PhotoAvailabilityIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_photo_index() -> Optional[PhotoAvailabilityIndex]:
+    """取得全域可用性索引（無法開啟檔案時返回 None，每次都會重新檢測）"""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                try:
+                    _default_index = PhotoAvailabilityIndex()
+                except (sqlite3.Error, OSError) as e:
+                    print(f"⚠️ 無法開啟照片可用性索引: {e}")
+                    return None
+    return _default_index
+
+
+def head_exists(url: str, session: Optional[requests.Session] = None) -> Tuple[Optional[bool], Optional[int]]:
+    """
+    以 HEAD 請求檢查 URL 是否存在
+
+    返回:
+        (是否存在, HTTP 狀態碼)；網路錯誤時為 (None, None)，表示無法判斷、不寫入索引
+    """
+    session = session or get_session()
+    try:
+        response = session.head(url, allow_redirects=True, timeout=PROBE_TIMEOUT)
+    except requests.RequestException:
+        return None, None
+    if response.status_code in (200, 304):
+        return True, response.status_code
+    if response.status_code in (403, 404, 410):
+        return False, response.status_code
+    # 5xx / 429 等暫時性錯誤無法判斷
+    return None, response.status_code
+
+
+def probe_candidates(
+    candidates: List[Tuple[str, str, str, str]],
+    max_workers: int = PROBE_MAX_WORKERS,
+    refresh: bool = False,
+    index: Optional[PhotoAvailabilityIndex] = None
+) -> Dict[str, bool]:
+    """
+    檢測候選照片是否存在（先查索引，只對過期 / 未檢測的 URL 送 HEAD 請求）
+
+    參數:
+        candidates: [(url, product_code, kind, variant), ...]，kind 為 "model" 或 "color"
+        max_workers: 併發請求數
+        refresh: True 表示忽略索引全部重新檢測
+        index: 可用性索引，None 表示使用全域索引
+
+    返回:
+        {url: 是否存在}（無法判斷的 URL 不會出現在結果中）
+    """
+    index = index if index is not None else get_photo_index()
+    urls = [c[0] for c in candidates]
+    known = {} if refresh or index is None else index.get_many(urls)
+    pending = [c for c in candidates if c[0] not in known]
+    if not pending:
+        return known
+
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+        outcomes = list(executor.map(lambda c: head_exists(c[0], session), pending))
+
+    records = []
+    for (url, product_code, kind, variant), (found, status) in zip(pending, outcomes):
+        if found is None:
+            continue
+        known[url] = found
+        records.append((url, product_code, kind, variant, found, status))
+    if index is not None and records:
+        index.put_many(records)
+    return known
+
+
+def probe_model_photos(
+    product_code: str,
+    v_min: int = MODEL_PHOTO_V_RANGE[0],
+    v_max: int = MODEL_PHOTO_V_RANGE[1],
+    quality: str = "d",
+    refresh: bool = False
+) -> List[Dict]:
+    """
+    只返回確實存在的模特試穿照片
+
+    參數:
+        product_code: 產品代碼（例如："dk909"）
+        v_min / v_max: v 編號範圍（預設 v1 ~ v11）
+        quality: 圖片品質 "d" (高畫質) 或 "t" (低畫質)
+        refresh: 忽略索引重新檢測
+
+    返回:
+        [{"v_number": int, "url": str}, ...]，格式與 color_codes.get_all_model_photo_urls 相同
+
+    範例:
+        >>> probe_model_photos("dk909")
+        [{'v_number': 1, 'url': '...dk909_v1.jpg'}, {'v_number': 6, 'url': '...dk909_v6.jpg'}]
+    """
+    product_code = product_code.lower()
+    photos = [
+        {"v_number": v, "url": get_model_photo_url(product_code, v, quality)}
+        for v in range(v_min, v_max + 1)
+    ]
+    found = probe_candidates(
+        [(p["url"], product_code, "model", f"v{p['v_number']}") for p in photos],
+        refresh=refresh
+    )
+    return [p for p in photos if found.get(p["url"])]
+
+
+def get_available_color_photos(product_code: str, color_codes: Iterable[str], quality: str = "d",
+                               refresh: bool = False) -> Dict[str, str]:
+    """
+    只返回確實存在的顏色圖
+
+    返回:
+        {顏色編號: URL}
+    """
+    product_code = product_code.lower()
+    urls = {code: color_photo_url(product_code, code, quality) for code in color_codes}
+    found = probe_candidates(
+        [(url, product_code, "color", f"col_{code}") for code, url in urls.items()],
+        refresh=refresh
+    )
+    return {code: url for code, url in urls.items() if found.get(url)}
+
+
+def probe_many_products(product_codes: Iterable[str], quality: str = "d", refresh: bool = False,
+                        max_workers: int = PROBE_MAX_WORKERS) -> Dict[str, List[Dict]]:
+    """批次檢測多個商品的模特照（所有候選 URL 共用同一個併發池，用於預先建立索引）"""
+    codes = [code.lower() for code in product_codes]
+    v_min, v_max = MODEL_PHOTO_V_RANGE
+    photos = {
+        code: [{"v_number": v, "url": get_model_photo_url(code, v, quality)} for v in range(v_min, v_max + 1)]
+        for code in codes
+    }
+    found = probe_candidates(
+        [(p["url"], code, "model", f"v{p['v_number']}") for code in codes for p in photos[code]],
+        max_workers=max_workers,
+        refresh=refresh
+    )
+    return {code: [p for p in photos[code] if found.get(p["url"])] for code in codes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="檢測商品模特照是否存在並更新可用性索引")
+    parser.add_argument("product_codes", nargs="+")
+    parser.add_argument("--refresh", action="store_true", help="忽略索引重新檢測")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = probe_many_products(args.product_codes, refresh=args.refresh)
+    for code, available in results.items():
+        numbers = ", ".join(f"v{p['v_number']}" for p in available) or "無"
+        print(f"📸 {code}: {len(available)} 張 ({numbers})")
+    print(f"⏱️ {time.perf_counter() - start:.2f} 秒")
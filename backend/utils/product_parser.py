@@ -0,0 +1,262 @@
+"""
+商品頁 HTML 解析引擎
+功能：
+1. 從 GRL 商品頁只擷取爬蟲需要的欄位（名稱、貨號、圖片、詳細、尺寸、價格、分類）
+2. 可切換解析引擎：
+   - "html.parser": BeautifulSoup + 純 Python 解析器（預設，原本的行為）
+   - "lxml": lxml（C 實作）+ 預先編譯的 XPath，只走訪需要的節點
+     （HTML5 解析器會把 CRLF 正規化為 LF，材質字串在後續處理時本來就會移除換行）
+   - "selectolax": selectolax（C 實作，需另外安裝；未安裝時自動改用 lxml）
+所有引擎輸出相同結構，後續的翻譯與整理由 crawl.parse_product_page 負責
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# 預設解析引擎（可用環境變數 CRAWL_PARSER_ENGINE 覆寫）
+DEFAULT_PARSER_ENGINE = os.getenv("CRAWL_PARSER_ENGINE", "html.parser")
+
+DETAIL_HEADER = "商品詳細"
+MATERIAL_HEADER = "サイズ・素材"
+
+
+def _empty_fields() -> Dict:
+    return {
+        "title": None,             # h1.ttl-name 全部文字（已 strip）
+        "code_text": None,         # h1.ttl-name span.txt-code 文字（未處理）
+        "images": [],              # [(src, alt)]，div.modal-detaillist img
+        "product_detail": "",      # 「商品詳細」區塊文字（strip=True）
+        "material_text": None,     # 「サイズ・素材」區塊原始文字，找不到區塊時為 None
+        "size_options": [],        # select.size-select option 文字
+        "price_text": None,        # 第一個 p.txt-price 文字
+        "breadcrumbs": [],         # .list-breadcrumb li a 文字
+    }
+
+
+# ========================================
+# BeautifulSoup（html.parser）
+# ========================================
+
+def _extract_bs4(html: str) -> Dict:
+    from bs4 import BeautifulSoup
+
+    fields = _empty_fields()
+    soup = BeautifulSoup(html, "html.parser")
+
+    title_section = soup.find("h1", class_="ttl-name")
+    if not title_section:
+        return fields
+    fields["title"] = title_section.text.strip()
+    code_tag = title_section.find("span", class_="txt-code")
+    fields["code_text"] = code_tag.text if code_tag else None
+
+    fields["images"] = [
+        (img.get("src", "").strip(), img.get("alt", "").strip())
+        for img in soup.select("div.modal-detaillist img")
+    ]
+
+    for section in soup.find_all("div", class_="tab-content"):
+        header = section.find("h2", class_="contents-ttl only-pc")
+        if header:
+            header_text = header.get_text(strip=True)
+            if DETAIL_HEADER in header_text:
+                fields["product_detail"] = section.get_text(strip=True)
+            elif MATERIAL_HEADER in header_text:
+                fields["material_text"] = section.get_text(strip=False)
+
+    fields["size_options"] = [option.text for option in soup.select("select.size-select option")]
+
+    price_section = soup.find("p", class_="txt-price")
+    fields["price_text"] = price_section.text.strip() if price_section else None
+
+    fields["breadcrumbs"] = [a.text.strip() for a in soup.select(".list-breadcrumb li a")]
+    return fields
+
+
+# ========================================
+# lxml + 預先編譯 XPath
+# ========================================
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_XPATHS = None
+
+
+def _compiled_xpaths():
+    """第一次使用時編譯 XPath（避免未安裝 lxml 時在 import 階段失敗）"""
+    global _XPATHS
+    if _XPATHS is None:
+        from lxml import etree
+        _XPATHS = {
+            "title": etree.XPath(f"//h1[{_has_class('ttl-name')}]"),
+            "code": etree.XPath(f".//span[{_has_class('txt-code')}]"),
+            "images": etree.XPath(f"//div[{_has_class('modal-detaillist')}]//img"),
+            "sections": etree.XPath(f"//div[{_has_class('tab-content')}]"),
+            "header": etree.XPath(".//h2[@class='contents-ttl only-pc']"),
+            "sizes": etree.XPath(f"//select[{_has_class('size-select')}]//option"),
+            "price": etree.XPath(f"//p[{_has_class('txt-price')}]"),
+            "breadcrumbs": etree.XPath(f"//*[{_has_class('list-breadcrumb')}]//li//a"),
+            "text": etree.XPath(".//text()[not(ancestor::script) and not(ancestor::style)]"),
+        }
+    return _XPATHS
+
+
+def _lxml_text(element, strip: bool = False) -> str:
+    """等同 BeautifulSoup 的 get_text(strip=...)：只取文字節點，略過 script / style"""
+    texts = _compiled_xpaths()["text"](element)
+    if strip:
+        return "".join(t.strip() for t in texts if t.strip())
+    return "".join(texts)
+
+
+def _extract_lxml(html: str) -> Dict:
+    import lxml.html
+
+    fields = _empty_fields()
+    xp = _compiled_xpaths()
+    root = lxml.html.fromstring(html)
+
+    titles = xp["title"](root)
+    if not titles:
+        return fields
+    title_section = titles[0]
+    fields["title"] = _lxml_text(title_section).strip()
+    codes = xp["code"](title_section)
+    fields["code_text"] = _lxml_text(codes[0]) if codes else None
+
+    fields["images"] = [
+        ((img.get("src") or "").strip(), (img.get("alt") or "").strip())
+        for img in xp["images"](root)
+    ]
+
+    for section in xp["sections"](root):
+        headers = xp["header"](section)
+        if headers:
+            header_text = _lxml_text(headers[0], strip=True)
+            if DETAIL_HEADER in header_text:
+                fields["product_detail"] = _lxml_text(section, strip=True)
+            elif MATERIAL_HEADER in header_text:
+                fields["material_text"] = _lxml_text(section)
+
+    fields["size_options"] = [_lxml_text(option) for option in xp["sizes"](root)]
+
+    prices = xp["price"](root)
+    fields["price_text"] = _lxml_text(prices[0]).strip() if prices else None
+
+    fields["breadcrumbs"] = [_lxml_text(a).strip() for a in xp["breadcrumbs"](root)]
+    return fields
+
+
+# ========================================
+# selectolax（選用）
+# ========================================
+
+def _selectolax_parser():
+    """selectolax 1.0 起改用 lexbor 後端，舊版只有 modest 後端（selectolax.parser）"""
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser
+        return HTMLParser
+
+
+def _extract_selectolax(html: str) -> Dict:
+    fields = _empty_fields()
+    tree = _selectolax_parser()(html)
+
+    title_section = tree.css_first("h1.ttl-name")
+    if title_section is None:
+        return fields
+    fields["title"] = title_section.text().strip()
+    code_tag = title_section.css_first("span.txt-code")
+    fields["code_text"] = code_tag.text() if code_tag is not None else None
+
+    fields["images"] = [
+        ((img.attributes.get("src") or "").strip(), (img.attributes.get("alt") or "").strip())
+        for img in tree.css("div.modal-detaillist img")
+    ]
+
+    for section in tree.css("div.tab-content"):
+        header = next(
+            (h for h in section.css("h2") if h.attributes.get("class") == "contents-ttl only-pc"),
+            None
+        )
+        if header is not None:
+            header_text = header.text(strip=True)
+            if DETAIL_HEADER in header_text:
+                fields["product_detail"] = section.text(strip=True)
+            elif MATERIAL_HEADER in header_text:
+                fields["material_text"] = section.text()
+
+    fields["size_options"] = [option.text() for option in tree.css("select.size-select option")]
+
+    price_section = tree.css_first("p.txt-price")
+    fields["price_text"] = price_section.text().strip() if price_section is not None else None
+
+    fields["breadcrumbs"] = [a.text().strip() for a in tree.css(".list-breadcrumb li a")]
+    return fields
+
+
+PARSER_ENGINES = {
+    "html.parser": _extract_bs4,
+    "lxml": _extract_lxml,
+    "selectolax": _extract_selectolax,
+}
+
+
+@lru_cache(maxsize=1)
+def _installed_engines() -> Tuple[str, ...]:
+    engines = ["html.parser"]
+    try:
+        import lxml.html  # noqa: F401
+        engines.append("lxml")
+    except ImportError:
+        pass
+    try:
+        _selectolax_parser()
+        engines.append("selectolax")
+    except ImportError:
+        pass
+    return tuple(engines)
+
+
+def available_engines() -> List[str]:
+    """列出目前環境可用的解析引擎"""
+    return list(_installed_engines())
+
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """
+    決定實際使用的引擎：未安裝 selectolax 時退回 lxml，未安裝 lxml 時退回 html.parser
+
+    參數:
+        engine: 引擎名稱，None 表示使用 DEFAULT_PARSER_ENGINE
+    """
+    engine = engine or DEFAULT_PARSER_ENGINE
+    if engine not in PARSER_ENGINES:
+        raise ValueError(f"未知的解析引擎: {engine}（可用: {', '.join(PARSER_ENGINES)}）")
+    available = _installed_engines()
+    if engine == "selectolax" and engine not in available:
+        engine = "lxml"
+    if engine == "lxml" and engine not in available:
+        engine = "html.parser"
+    return engine
+
+
+def extract_product_fields(html: str, engine: Optional[str] = None) -> Tuple[Dict, str]:
+    """
+    從商品頁 HTML 擷取原始欄位
+
+    參數:
+        html: 商品頁 HTML
+        engine: "html.parser" / "lxml" / "selectolax"，None 表示使用預設引擎
+
+    返回:
+        (欄位字典, 實際使用的引擎名稱)
+    """
+    used = resolve_engine(engine)
+    return PARSER_ENGINES[used](html), used
@@ -0,0 +1,26 @@
+"""
+衍生資料表的結構定義（只有 SQL 字串，不匯入 NumPy / pandas）
+功能：
+1. 遷移（migrations）與使用資料表的模組共用同一份 CREATE TABLE，
+   執行遷移不必載入向量 / 影像運算用的套件
+2. wardrobe_embeddings：商品檢索向量（見 embeddings，遷移 v4）
+3. wardrobe_palettes：商品色票（見 color_palette，遷移 v5）
+"""
+
+EMBEDDING_TABLE = "wardrobe_embeddings"
+EMBEDDING_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {EMBEDDING_TABLE} (
+        item_id INTEGER PRIMARY KEY,
+        digest TEXT NOT NULL,
+        vector BLOB NOT NULL
+    )
+"""
+
+PALETTE_TABLE = "wardrobe_palettes"
+PALETTE_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {PALETTE_TABLE} (
+        item_id INTEGER PRIMARY KEY,
+        image_digest TEXT NOT NULL,
+        palette BLOB NOT NULL
+    )
+"""
@@ -0,0 +1,336 @@
+"""
+商品分類（主分類 / 子分類）對照與關鍵字分類器
+功能：
+1. GRL 的主分類 -> 子分類列表、子分類 -> 商品名稱關鍵字（模組載入時建立一次）
+2. 每個主分類預先編譯一個多關鍵字 regex，一次掃描商品名稱即可找出所有命中的關鍵字
+3. 分類規則與原本逐一檢查子分類相同：命中多個子分類時，以對照表中排在前面的子分類為準
+4. classify_many 批次分類（重新分類整個商品目錄用）
+"""
+
+import re
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+TOPS_SUBCATEGORIES = [
+#   "すべて", # 全部
+    "ニット", # 針織
+    "シャツ・ブラウス", # 襯衫 & 襯衣
+    "カットソー", # 縫製 T 恤
+    "スウェット", # 運動衫
+    "プリントTシャツ", # 印花 T 恤
+    "Tシャツ[無地]", # 素色 T 恤
+    "パーカー", # 帽 T
+    "タンクトップ・キャミソール", # 背心和吊帶背心
+    "ベスト", # 背心
+    "トップスセット", # 上衣套裝
+    "ベアトップ・チューブトップ", # 抹胸 & 管狀上衣
+    "トップス_その他", # 其他
+#   "[セール}トップス" # 特價上衣
+]
+OUTERWEAR_SUBCATEGORIES = [ # 外套
+#   "すべて", # 全部
+    "ジャケット", # 夾克
+    "カーディガン", # 羊毛衫
+    "コート", # 大衣
+    "アウターセット", # 外套套裝
+    "アウター_その他", # 其他
+#   "[セール}アウター" # 特價外套
+]
+DRESSES_SUBCATEGORIES = [ # 連衣裙
+#   "すべて", # 全部
+    "柄", # 圖案
+    "無地", # 素色
+    "ニットワンピース", # 針織連衣裙
+    "ロングワンピース", # 長款連衣裙
+    "シャツワンピース", # 襯衫式連衣裙
+    "キャミワンピース", # 吊帶連衣裙
+    "オールインワン・サロペット", # 連身褲 & 背帶褲
+    "ジャンパースカート", # 套頭背心裙
+    "浴衣",
+    "ワンピース_その他", # 其他
+#   "[セール}ワンピース" # 特價連衣裙
+]
+BOTTOMS_SUBCATEGORIES = [ # 下
+#   "すべて", # 全部
+    "パンツ・デニム", # 褲子 & 牛仔褲
+    "ショートパンツ", # 短褲
+    "マーメイドスカート", #新增人魚裙分類
+    "フレアスカート", #新增喇叭裙分類
+    "ミニスカート", #新增迷你裙分類
+    "スカート", # 裙子
+    "ボトムスセット", # 下裝套裝
+    "ボトムス_その他", # 其他
+#   "[セール}ボトムス" # 特價下裝
+]
+SHOES_SUBCATEGORIES = [ # 鞋子
+#   "すべて", # 全部
+    "パンプス", # 高跟鞋
+    "サンダル", # 涼鞋
+    "ショートブーツ・ブーティ", # 短靴
+    "ロングブーツ", # 長靴
+    "スニーカー", # 運動鞋
+    "ローファー", # 樂福鞋
+    "シューズ_その他", # 其他
+#   "[セール}シューズ" # 特價鞋子
+]
+BAGS_SUBCATEGORIES = [ # 包包
+#   "すべて", # 全部
+    "ショルダーバッグ", # 肩背包
+    "ハンドバッグ", # 手提包
+    "リュック", # 背包
+    "トートバッグ", # 托特包
+    "クラッチバッグ", # 手拿包
+    "かごバッグ", # 編織包
+    "ポシェット", # 小肩包
+    "バッグ・カバン_その他", # 其他
+#   "[セール}バッグ" # 特價包包
+]
+ACCESSORIES_SUBCATEGORIES = [ # 配件
+#   "すべて", # 全部
+    "ピアス・リング", # 耳環 & 戒指
+    "ネックレス", # 項鍊
+    "ベルト", # 腰帶
+    "ブレス", # 手鐲
+    "帽子", # 帽子
+    "ヘッドアクセ", # 頭部配件
+    "スカーフ", # 圍巾
+    "ストール・マフラー", # 披肩 & 圍脖
+    "レッグウェア", # 襪子
+    "インナー", # 內搭
+    "メガネ・サングラス", # 眼鏡 & 太陽鏡
+    "時計", # 手錶
+    "アクセサリー_その他", # 其他
+#   "[セール}アクセサリー" # 特價配件
+]
+SETS_SUBCATEGORIES = [ # 套裝
+#   "すべて", # 全部
+    "セットアップ", # 套裝
+    "その他セット", # 其他套裝
+    "セットアイテム_その他", # 居家服
+#   "[セール}セットアイテム" # 特價套裝
+]
+
+CATEGORY_SUBCATEGORIES = {
+    "トップス": TOPS_SUBCATEGORIES,
+    "アウター": OUTERWEAR_SUBCATEGORIES,
+    "ワンピース": DRESSES_SUBCATEGORIES,
+    "ボトムス": BOTTOMS_SUBCATEGORIES,
+    "シューズ": SHOES_SUBCATEGORIES,
+    "バッグ・カバン": BAGS_SUBCATEGORIES,
+    "アクセサリー": ACCESSORIES_SUBCATEGORIES,
+    "セットアイテム": SETS_SUBCATEGORIES,
+}
+_VALID_SUBCATEGORIES = {category: frozenset(subcats) for category, subcats in CATEGORY_SUBCATEGORIES.items()}
+
+SUBCATEGORY_KEYWORDS = {
+    "トップス": {  # 上衣
+        "ニット": ["ニット"],
+        "シャツ・ブラウス": ["シャツ", "ブラウス"],
+        "カットソー": ["カットソー"],
+        "スウェット": ["スウェット"],
+        "プリントTシャツ": ["プリントTシャツ", "プリント"],
+        "Tシャツ[無地]": ["無地Tシャツ", "無地 Tシャツ"],
+        "パーカー": ["パーカー"],
+        "タンクトップ・キャミソール": ["タンクトップ", "キャミソール"],
+        "ベスト": ["ベスト"],
+        "トップスセット": ["セット"],
+        "ベアトップ・チューブトップ": ["ベアトップ", "チューブトップ"]
+    },
+    "アウター": {  # 外套
+        "ジャケット": ["ジャケット"],
+        "カーディガン": ["カーディガン"],
+        "コート": ["コート"],
+        "アウターセット": ["セット"]
+    },
+    "ワンピース": {  # 連衣裙
+        "柄": ["柄"],
+        "無地": ["無地"],
+        "ニットワンピース": ["ニットワンピース", "ニット ドレス"],
+        "ロングワンピース": ["ロングワンピース", "ロングドレス"],
+        "シャツワンピース": ["シャツワンピース", "シャツ ドレス"],
+        "キャミワンピース": ["キャミワンピース", "キャミソール ドレス"],
+        "オールインワン・サロペット": ["オールインワン", "サロペット"],
+        "ジャンパースカート": ["ジャンパースカート"],
+        "浴衣": ["浴衣"]
+    },
+    "ボトムス": {  # 下裝
+        "マーメイドスカート": ["マーメイドスカート"],
+        "フレアスカート": ["フレアスカート"],
+        "ミニスカート": ["ミニスカート"],
+        "パンツ・デニム": ["パンツ", "デニム"],
+        "ショートパンツ": ["ショートパンツ"],
+        "スカート": ["スカート"],
+        "ボトムスセット": ["セット"]
+    },
+    "シューズ": {  # 鞋子
+        "パンプス": ["パンプス"],
+        "サンダル": ["サンダル"],
+        "ショートブーツ・ブーティ": ["ショートブーツ", "ブーティ"],
+        "ロングブーツ": ["ロングブーツ"],
+        "スニーカー": ["スニーカー"],
+        "ローファー": ["ローファー"]
+    },
+    "バッグ・カバン": {  # 包包
+        "ショルダーバッグ": ["ショルダーバッグ"],
+        "ハンドバッグ": ["ハンドバッグ"],
+        "リュック": ["リュック"],
+        "トートバッグ": ["トートバッグ"],
+        "クラッチバッグ": ["クラッチバッグ"],
+        "かごバッグ": ["かごバッグ"],
+        "ポシェット": ["ポシェット"]
+    },
+    "アクセサリー": {  # 配件
+        "ピアス・リング": ["ピアス", "リング"],
+        "ネックレス": ["ネックレス"],
+        "ベルト": ["ベルト"],
+        "ブレス": ["ブレスレット"],
+        "帽子": ["帽子"],
+        "ヘッドアクセ": ["ヘッドアクセ"],
+        "スカーフ": ["スカーフ"],
+        "ストール・マフラー": ["ストール", "マフラー"],
+        "レッグウェア": ["レッグウェア", "靴下"],
+        "インナー": ["インナー"],
+        "メガネ・サングラス": ["メガネ", "サングラス"],
+        "時計": ["時計"]
+    },
+    "セットアイテム": {  # 套裝
+        "セットアップ": ["セットアップ"],
+        "その他セット": ["その他セット"],
+        "セットアイテム_その他": ["ルームウェア", "パジャマ"]
+    },
+}
+
+
+OTHER_SUBCATEGORY = "その他"
+SALE_PREFIX = "[セール}"
+
+
+class _CategoryMatcher:
+    """
+    單一主分類的關鍵字比對器
+
+    regex 為 (?=(kw1|kw2|...)) 形式：lookahead 不消耗字元，所以在每個位置都會嘗試比對，
+    重疊的關鍵字（例如「プリントTシャツ」裡的「シャツ」）也不會漏掉；
+    alternation 依子分類優先順序排列，同一位置命中多個關鍵字時取優先的那個
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]]):
+        self.subcategories = list(keywords)
+        ordered = []
+        self.priority = {}
+        for rank, (subcat, words) in enumerate(keywords.items()):
+            for word in words:
+                if word not in self.priority:
+                    self.priority[word] = rank
+                    ordered.append(word)
+        self.pattern = re.compile("(?=(" + "|".join(re.escape(word) for word in ordered) + "))")
+
+    def classify(self, title: str) -> Optional[str]:
+        best = None
+        for match in self.pattern.finditer(title):
+            rank = self.priority[match.group(1)]
+            if best is None or rank < best:
+                best = rank
+                if rank == 0:
+                    break
+        return None if best is None else self.subcategories[best]
+
+    def classify_joined(self, titles: List[str]) -> List[Optional[str]]:
+        """
+        批次分類：把所有名稱以換行串成一個字串，只呼叫一次 regex 掃描
+        （關鍵字不含換行，不會跨商品比對），再依位置把命中的關鍵字分回各商品
+        """
+        starts = [0, *accumulate(len(title) + 1 for title in titles)]
+        best: List[Optional[int]] = [None] * len(titles)
+        item = 0
+        for match in self.pattern.finditer("\n".join(titles)):
+            position = match.start()
+            while starts[item + 1] <= position:
+                item += 1
+            rank = self.priority[match.group(1)]
+            if best[item] is None or rank < best[item]:
+                best[item] = rank
+        return [None if rank is None else self.subcategories[rank] for rank in best]
+
+
+_MATCHERS = {category: _CategoryMatcher(keywords) for category, keywords in SUBCATEGORY_KEYWORDS.items()}
+
+
+def fallback_subcategory(category: str) -> str:
+    """找不到關鍵字時的子分類：已知主分類為「<主分類>_その他」，其餘為「その他」"""
+    if category in CATEGORY_SUBCATEGORIES:
+        return f"{category}_{OTHER_SUBCATEGORY}"
+    return OTHER_SUBCATEGORY
+
+
+def classify_subcategory(category: str, subcategory: Optional[str], title: str) -> str:
+    """
+    修正麵包屑取得的子分類
+
+    1. 子分類已在該主分類的列表中直接沿用（ボトムス 的「スカート」除外，會再依名稱細分）
+    2. 否則依商品名稱關鍵字分類
+    3. 都找不到時歸到「<主分類>_その他」
+
+    範例:
+        >>> classify_subcategory("ボトムス", "スカート", "チュールミニスカート")
+        'ミニスカート'
+    """
+    if subcategory is not None and category in _VALID_SUBCATEGORIES:
+        if not (category == "ボトムス" and subcategory == "スカート"):
+            if subcategory in _VALID_SUBCATEGORIES[category]:
+                return subcategory
+
+    matcher = _MATCHERS.get(category)
+    if matcher is not None and title:
+        matched = matcher.classify(title)
+        if matched is not None:
+            return matched
+    return fallback_subcategory(category)
+
+
+def classify_many(
+    titles: Iterable[str],
+    categories: Union[str, Sequence[str]],
+    subcategories: Optional[Sequence[Optional[str]]] = None
+) -> List[str]:
+    """
+    批次分類
+
+    參數:
+        titles: 商品名稱（日文）
+        categories: 每個商品的主分類，或所有商品共用的單一主分類
+        subcategories: 麵包屑取得的子分類；None 表示全部只依名稱重新分類
+
+    返回:
+        子分類列表（順序與 titles 相同）
+
+    範例:
+        >>> classify_many(["リブニット", "デニムパンツ"], ["トップス", "ボトムス"])
+        ['ニット', 'パンツ・デニム']
+    """
+    titles = [title or "" for title in titles]
+    if isinstance(categories, str):
+        categories = [categories] * len(titles)
+    if subcategories is None:
+        subcategories = [None] * len(titles)
+
+    results: List[Optional[str]] = [None] * len(titles)
+    pending: Dict[str, List[int]] = {}
+    for i, (category, subcategory) in enumerate(zip(categories, subcategories)):
+        valid = _VALID_SUBCATEGORIES.get(category)
+        if (subcategory is not None and valid is not None and subcategory in valid
+                and not (category == "ボトムス" and subcategory == "スカート")):
+            results[i] = subcategory
+        elif category in _MATCHERS:
+            pending.setdefault(category, []).append(i)
+
+    # 每個主分類只掃描一次
+    for category, indexes in pending.items():
+        matched = _MATCHERS[category].classify_joined([titles[i] for i in indexes])
+        for i, subcat in zip(indexes, matched):
+            results[i] = subcat
+
+    return [
+        result if result is not None else fallback_subcategory(category)
+        for result, category in zip(results, categories)
+    ]
@@ -0,0 +1,212 @@
+"""
+縮圖產生模組 - 衣櫥格狀列表使用小尺寸縮圖，原圖只在需要時載入
+功能：
+1. 從本地圖片快取（內容定址 blob）產生固定寬度的 WebP / JPEG 縮圖
+2. 縮圖以來源 SHA-256 命名，內容不變就不會重新產生
+3. 使用 ProcessPoolExecutor 平行處理大量圖片（影像解碼與縮放是 CPU 密集工作）
+
+用法:
+    python -m backend.utils.thumbnails          # 為所有已快取圖片補產生縮圖
+    python -m backend.utils.thumbnails --size 200 --workers 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 縮圖目錄（相對於專案根目錄）與預設規格
+THUMBNAIL_DIR = Path("images/thumbs")
+THUMBNAIL_SIZE = 300          # 最長邊像素
+THUMBNAIL_FORMAT = "WEBP"     # Pillow 不支援 WebP 時自動改用 JPEG
+THUMBNAIL_QUALITY = 80
+
+
+def _resolve_format(fmt: str) -> str:
+    if fmt.upper() == "WEBP":
+        from PIL import features
+        if not features.check("webp"):
+            return "JPEG"
+    return fmt.upper()
+
+
+def thumbnail_path(source: Path, size: int = THUMBNAIL_SIZE, fmt: str = THUMBNAIL_FORMAT) -> Path:
+    """
+    縮圖存放路徑：以來源檔名（blob 的 SHA-256）+ 尺寸命名
+
+    範例:
+        >>> thumbnail_path(Path("images/cache/blobs/3f/3fa9.jpg"), 300, "WEBP")
+        PosixPath('images/thumbs/300/3f/3fa9.webp')
+    """
+    ext = "jpg" if _resolve_format(fmt) == "JPEG" else _resolve_format(fmt).lower()
+    stem = Path(source).stem
+    return THUMBNAIL_DIR / str(size) / stem[:2] / f"{stem}.{ext}"
+
+
+def remove_thumbnails(digest: str) -> int:
+    """
+    刪除某張原圖（blob SHA-256）的所有尺寸 / 格式縮圖（原圖被淘汰時呼叫）
+
+    返回:
+        釋放的位元組數
+    """
+    freed = 0
+    for path in THUMBNAIL_DIR.glob(f"*/{digest[:2]}/{digest}.*"):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            freed += size
+        except FileNotFoundError:
+            pass
+    return freed
+
+
+def render_thumbnail(source: str, destination: str, size: int = THUMBNAIL_SIZE,
+                     fmt: str = THUMBNAIL_FORMAT, quality: int = THUMBNAIL_QUALITY) -> int:
+    """
+    產生單張縮圖（模組層級函數，可在子程序中執行）
+
+    參數:
+        source: 原圖路徑
+        destination: 縮圖路徑（寫入暫存檔後原子性 rename）
+        size: 最長邊像素
+        fmt: "WEBP" 或 "JPEG"
+        quality: 壓縮品質
+
+    返回:
+        縮圖檔案大小（位元組）
+    """
+    from PIL import Image
+
+    fmt = _resolve_format(fmt)
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as img:
+        # JPEG 可在解碼時直接縮小（DCT scaling），比完整解碼再縮放快很多
+        img.draft("RGB", (size, size))
+        img = img.convert("RGB")
+        img.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+        fd, tmp_name = tempfile.mkstemp(dir=destination.parent, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, format=fmt, quality=quality, optimize=fmt == "JPEG")
+            os.replace(tmp_name, destination)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+    return destination.stat().st_size
+
+
+def _render_job(args):
+    source, destination, size, fmt = args
+    try:
+        return source, render_thumbnail(source, destination, size, fmt), None
+    except Exception as e:
+        return source, 0, str(e)
+
+
+def generate_thumbnails(
+    sources: List[Path],
+    size: int = THUMBNAIL_SIZE,
+    fmt: str = THUMBNAIL_FORMAT,
+    max_workers: Optional[int] = None
+) -> Dict[str, float]:
+    """
+    批次產生縮圖（已存在的會跳過），使用多程序平行處理
+
+    參數:
+        sources: 原圖路徑列表
+        size: 最長邊像素
+        fmt: "WEBP" 或 "JPEG"
+        max_workers: 程序數量（預設為 CPU 核心數）
+
+    返回:
+        統計 {'generated', 'skipped', 'failed', 'bytes', 'elapsed', 'files_per_sec'}
+    """
+    start = time.perf_counter()
+    jobs = []
+    skipped = 0
+    for source in sources:
+        destination = thumbnail_path(source, size, fmt)
+        if destination.exists():
+            skipped += 1
+        elif Path(source).exists():
+            jobs.append((str(source), str(destination), size, fmt))
+
+    # 數量很少時不值得啟動子程序
+    if len(jobs) <= 2 or max_workers == 1:
+        results = [_render_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_render_job, jobs, chunksize=8))
+
+    generated = failed = total_bytes = 0
+    for source, nbytes, error in results:
+        if error:
+            failed += 1
+            print(f"❌ 縮圖失敗 {Path(source).name}: {error}")
+        else:
+            generated += 1
+            total_bytes += nbytes
+
+    elapsed = time.perf_counter() - start
+    return {
+        "generated": generated,
+        "skipped": skipped,
+        "failed": failed,
+        "bytes": total_bytes,
+        "elapsed": elapsed,
+        "files_per_sec": generated / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def get_thumbnail(source: Optional[Path], size: int = THUMBNAIL_SIZE, fmt: str = THUMBNAIL_FORMAT,
+                  create: bool = False) -> Optional[Path]:
+    """
+    取得原圖對應的縮圖路徑
+
+    參數:
+        source: 原圖路徑（通常來自 image_handler.get_local_image_path）
+        size: 最長邊像素
+        fmt: "WEBP" 或 "JPEG"
+        create: 縮圖不存在時是否立即在目前程序產生
+
+    返回:
+        縮圖路徑，不存在（且未要求產生）時返回 None
+    """
+    if source is None:
+        return None
+    destination = thumbnail_path(source, size, fmt)
+    if destination.exists():
+        return destination
+    if create and Path(source).exists():
+        try:
+            render_thumbnail(str(source), str(destination), size, fmt)
+            return destination
+        except Exception as e:
+            print(f"❌ 縮圖失敗 {Path(source).name}: {e}")
+    return None
+
+
+def generate_missing_thumbnails(size: int = THUMBNAIL_SIZE, fmt: str = THUMBNAIL_FORMAT,
+                                max_workers: Optional[int] = None) -> Dict[str, float]:
+    """為圖片快取中所有圖片補產生縮圖"""
+    from backend.utils.image_store import get_image_store
+
+    return generate_thumbnails(get_image_store().list_blobs(), size, fmt, max_workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="為圖片快取產生縮圖")
+    parser.add_argument("--size", type=int, default=THUMBNAIL_SIZE)
+    parser.add_argument("--format", default=THUMBNAIL_FORMAT, choices=["WEBP", "JPEG"])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    stats = generate_missing_thumbnails(args.size, args.format, args.workers)
+    print(f"🖼️ 縮圖完成: 新增 {stats['generated']} 張, 跳過 {stats['skipped']} 張, 失敗 {stats['failed']} 張, "
+          f"{stats['files_per_sec']:.1f} 張/秒")
@@ -0,0 +1,249 @@
+"""
+翻譯快取模組 - 避免重複呼叫翻譯 API
+功能：
+1. 以 (src, dest, text) 為鍵的內容定址快取（SHA-256）
+2. 記憶體 LRU 層 + 磁碟持久層（預設 SQLite，重啟後仍有效）
+3. 命中 / 未命中統計
+4. 可替換的儲存後端（實作 TranslationCacheBackend 即可）
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 翻譯快取檔案位置（可用環境變數覆寫）
+TRANSLATION_CACHE_PATH = Path(
+    os.getenv("TRANSLATION_CACHE_PATH", PROJECT_ROOT / "cache" / "translation_cache.db")
+)
+# 記憶體 LRU 層最多保留的筆數
+TRANSLATION_CACHE_MEMORY_ITEMS = 2048
+
+
+def make_cache_key(text: str, src: str, dest: str) -> str:
+    """
+    產生翻譯快取鍵（內容定址）
+
+    參數:
+        text: 原文
+        src: 來源語言
+        dest: 目標語言
+
+    返回:
+        SHA-256 十六進位字串
+    """
+    raw = f"{src}\x1f{dest}\x1f{text}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class TranslationCacheBackend(ABC):
+    """持久層介面：子類別實作 get_many / set_many 即可接入 TranslationCache"""
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """返回 keys 中有快取的 {key: 譯文}"""
+
+    @abstractmethod
+    def set_many(self, items: List[Tuple[str, str, str, str, str]]) -> None:
+        """items: [(key, src, dest, text, translated), ...]"""
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryTranslationBackend(TranslationCacheBackend):
+    """純記憶體後端（測試或不想寫入磁碟時使用）"""
+
+    def __init__(self):
+        self._data: Dict[str, str] = {}
+
+    def get_many(self, keys):
+        return {k: self._data[k] for k in keys if k in self._data}
+
+    def set_many(self, items):
+        for key, _src, _dest, _text, translated in items:
+            self._data[key] = translated
+
+
+class SQLiteTranslationBackend(TranslationCacheBackend):
+    """SQLite 後端：單一檔案，跨程序重啟保留翻譯結果"""
+
+    def __init__(self, db_path: Path = TRANSLATION_CACHE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                src TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                text TEXT NOT NULL,
+                translated TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            # SQLite 參數上限保守取 500 筆一批
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, translated FROM translations WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def set_many(self, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, src, dest, text, translated, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, src, dest, text, translated, now) for key, src, dest, text, translated in items]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TranslationCache:
+    """
+    兩層翻譯快取：記憶體 LRU → 持久後端
+
+    範例:
+        >>> cache = TranslationCache(MemoryTranslationBackend())
+        >>> cache.set("ブラック", "黑色", "ja", "zh-TW")
+        >>> cache.get("ブラック", "ja", "zh-TW")
+        '黑色'
+    """
+
+    def __init__(self, backend: Optional[TranslationCacheBackend] = None,
+                 max_memory_items: int = TRANSLATION_CACHE_MEMORY_ITEMS):
+        self.backend = backend
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, translated: str) -> None:
+        self._memory[key] = translated
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str, src: str = "ja", dest: str = "zh-TW") -> Optional[str]:
+        """查詢單筆翻譯，未命中返回 None"""
+        return self.get_many([text], src, dest).get(text)
+
+    def get_many(self, texts: Iterable[str], src: str = "ja", dest: str = "zh-TW") -> Dict[str, str]:
+        """
+        批次查詢翻譯
+
+        返回:
+            {原文: 譯文}，只包含命中的項目
+        """
+        keys = {text: make_cache_key(text, src, dest) for text in texts}
+        result = {}
+        pending = []
+
+        with self._lock:
+            for text, key in keys.items():
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    result[text] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    pending.append(text)
+
+        if pending and self.backend is not None:
+            stored = self.backend.get_many([keys[text] for text in pending])
+            with self._lock:
+                for text in pending:
+                    translated = stored.get(keys[text])
+                    if translated is not None:
+                        result[text] = translated
+                        self._remember(keys[text], translated)
+                        self.disk_hits += 1
+
+        with self._lock:
+            self.misses += len(pending) - sum(1 for text in pending if text in result)
+        return result
+
+    def set(self, text: str, translated: str, src: str = "ja", dest: str = "zh-TW") -> None:
+        """寫入單筆翻譯"""
+        self.set_many({text: translated}, src, dest)
+
+    def set_many(self, translations: Dict[str, str], src: str = "ja", dest: str = "zh-TW") -> None:
+        """批次寫入翻譯 {原文: 譯文}"""
+        items = [
+            (make_cache_key(text, src, dest), src, dest, text, translated)
+            for text, translated in translations.items()
+            if translated is not None
+        ]
+        with self._lock:
+            for key, _src, _dest, _text, translated in items:
+                self._remember(key, translated)
+        if items and self.backend is not None:
+            self.backend.set_many(items)
+
+    def stats(self) -> Dict[str, float]:
+        """命中統計 {'memory_hits', 'disk_hits', 'misses', 'hit_rate', 'memory_items'}"""
+        with self._lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+    def clear_memory(self) -> None:
+        """清空記憶體層（持久層保留）"""
+        with self._lock:
+            self._memory.clear()
+
+
+_default_cache: Optional[TranslationCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_translation_cache() -> TranslationCache:
+    """取得全域翻譯快取（第一次呼叫時建立 SQLite 後端）"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                try:
+                    backend = SQLiteTranslationBackend()
+                except (sqlite3.Error, OSError) as e:
+                    print(f"⚠️ 無法開啟翻譯快取檔案，僅使用記憶體快取: {e}")
+                    backend = MemoryTranslationBackend()
+                _default_cache = TranslationCache(backend)
+    return _default_cache
+
+
+def set_translation_cache(cache: Optional[TranslationCache]) -> None:
+    """替換全域翻譯快取（例如改用其他後端），傳入 None 則下次重新建立預設快取"""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
@@ -0,0 +1,203 @@
+"""
+衣櫥全文搜尋模組 - SQLite FTS5 + trigram 分詞
+功能：
+1. wardrobe_fts 虛擬表索引 標題 / 顏色 / 分類 / 子分類 / 商品詳細 / 材質
+   （商品名稱混合中文與日文，沒有空白分詞，trigram 可做任意子字串比對）
+2. 以 trigger 與 wardrobe、products 兩張表同步，新增 / 修改 / 刪除後索引自動更新
+3. 以 BM25 排序並支援分頁（LIMIT / OFFSET）
+4. 少於 3 個字的關鍵字 trigram 無法比對，改用 LIKE（仍限定在同樣的欄位）
+索引的建立由 backend.utils.migrations 負責（FTS rowid = wardrobe.id）
+"""
+
+from typing import List, Optional, Tuple
+
+SEARCH_TABLE = "wardrobe_fts"
+TRIGRAM_MIN_CHARS = 3
+
+# BM25 欄位權重（順序同 FTS 欄位）：標題與顏色命中比詳細說明重要
+BM25_WEIGHTS = (10.0, 6.0, 3.0, 3.0, 1.0, 1.0)
+
+# wardrobe 單列對應的索引內容（title 沒有商品資料時退回 key，與列表顯示一致）
+_INDEX_SELECT = """
+    SELECT w.id, COALESCE(p.title, w.key), w.color_name, w.category, w.subcategory,
+           COALESCE(p.product_detail, ''), COALESCE(p.material, '')
+    FROM wardrobe w
+    LEFT JOIN products p ON w.product_code = p.product_code
+"""
+
+SEARCH_TRIGGERS = (
+    "wardrobe_fts_ai", "wardrobe_fts_ad", "wardrobe_fts_au",
+    "products_fts_ai", "products_fts_au", "products_fts_ad",
+)
+
+SEARCH_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, color_name, category, subcategory, product_detail, material,
+        tokenize = 'trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS wardrobe_fts_ai AFTER INSERT ON wardrobe BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, title, color_name, category, subcategory, product_detail, material)
+        {_INDEX_SELECT} WHERE w.id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS wardrobe_fts_ad AFTER DELETE ON wardrobe BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS wardrobe_fts_au AFTER UPDATE ON wardrobe BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+        INSERT INTO {SEARCH_TABLE} (rowid, title, color_name, category, subcategory, product_detail, material)
+        {_INDEX_SELECT} WHERE w.id = new.id;
+    END
+    """,
+    # 商品資料（標題 / 詳細 / 材質）變更時重建引用它的衣櫥列
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM wardrobe WHERE product_code = new.product_code);
+        INSERT INTO {SEARCH_TABLE} (rowid, title, color_name, category, subcategory, product_detail, material)
+        {_INDEX_SELECT} WHERE w.product_code = new.product_code;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, product_detail, material ON products BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM wardrobe WHERE product_code = old.product_code);
+        INSERT INTO {SEARCH_TABLE} (rowid, title, color_name, category, subcategory, product_detail, material)
+        {_INDEX_SELECT} WHERE w.product_code = new.product_code;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM wardrobe WHERE product_code = old.product_code);
+        INSERT INTO {SEARCH_TABLE} (rowid, title, color_name, category, subcategory, product_detail, material)
+        {_INDEX_SELECT} WHERE w.product_code = old.product_code;
+    END
+    """,
+]
+
+
+def create_search_index(conn):
+    """建立 FTS 表與同步 trigger，並以目前資料重建索引（請在交易內呼叫）"""
+    for statement in SEARCH_SCHEMA:
+        conn.execute(statement)
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn):
+    """清空並重建整個搜尋索引"""
+    conn.execute(f"DELETE FROM {SEARCH_TABLE}")
+    conn.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, color_name, category, subcategory, product_detail, material) "
+        f"{_INDEX_SELECT}"
+    )
+
+
+def drop_search_index(conn):
+    """移除 FTS 表與所有同步 trigger（重建 wardrobe 資料表前使用）"""
+    for trigger in SEARCH_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def has_search_index(conn) -> bool:
+    """資料庫是否已有全文搜尋索引（沒有時 build_search_query 應使用 use_fts=False）"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def _match_expression(search_query: str) -> Optional[str]:
+    """
+    把使用者輸入轉成 FTS MATCH 運算式：以空白分隔的每個詞都要出現（AND）
+    任何一個詞少於 3 個字時 trigram 無法比對，返回 None
+    """
+    terms = search_query.split()
+    if not terms or any(len(term) < TRIGRAM_MIN_CHARS for term in terms):
+        return None
+    # 每個詞加上雙引號當作片語，避免使用者輸入被解讀成 FTS 語法
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+WARDROBE_COLUMNS = """
+    w.id, w.key, w.product_code,
+    COALESCE(p.title, SUBSTR(w.key, 1, LENGTH(w.key) - LENGTH(w.color_name) - LENGTH(w.size) - 2)) as title,
+    w.color_name, w.category, w.subcategory,
+    w.size, w.image_url, w.price_twd, w.quantity, w.arrival_date
+"""
+
+
+def build_search_query(search_query: str, category_filter: Optional[str] = None,
+                       limit: Optional[int] = None, offset: int = 0,
+                       use_fts: bool = True) -> Tuple[str, List]:
+    """
+    產生衣櫥搜尋 SQL
+
+    參數:
+        search_query: 使用者輸入的關鍵字（空白分隔多個詞）
+        category_filter: 分類篩選，None 表示全部
+        limit / offset: 分頁，limit=None 表示不分頁
+        use_fts: 是否可使用 FTS 索引
+
+    返回:
+        (sql, params)，有 FTS 時結果依 BM25 相關度排序
+    """
+    match = _match_expression(search_query) if use_fts else None
+    params: List = []
+    if match:
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        sql = f"""
+        SELECT {WARDROBE_COLUMNS}
+        FROM {SEARCH_TABLE} f
+        JOIN wardrobe w ON w.id = f.rowid
+        LEFT JOIN products p ON w.product_code = p.product_code
+        WHERE {SEARCH_TABLE} MATCH ?
+        """
+        params.append(match)
+        order_by = f" ORDER BY bm25({SEARCH_TABLE}, {weights})"
+    else:
+        sql = f"""
+        SELECT {WARDROBE_COLUMNS}
+        FROM wardrobe w
+        LEFT JOIN products p ON w.product_code = p.product_code
+        WHERE 1=1
+        """
+        order_by = ""
+        for term in search_query.split():
+            like = f"%{term}%"
+            sql += (" AND (COALESCE(p.title, w.key) LIKE ? OR w.color_name LIKE ? OR w.category LIKE ?"
+                    " OR w.subcategory LIKE ? OR p.product_detail LIKE ? OR p.material LIKE ?)")
+            params.extend([like] * 6)
+
+    if category_filter:
+        sql += " AND w.category = ?"
+        params.append(category_filter)
+    sql += order_by
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+    return sql, params
+
+
+def search_wardrobe(db, search_query: str, category_filter: Optional[str] = None,
+                    limit: Optional[int] = None, offset: int = 0, use_fts: bool = True):
+    """
+    搜尋衣櫥（BM25 排序 + 分頁）
+
+    範例:
+        >>> search_wardrobe(db, "分層裙", limit=20, offset=0)
+    """
+    sql, params = build_search_query(search_query, category_filter, limit, offset, use_fts)
+    return db.read_df(sql, params)
+
+
+def count_search_results(db, search_query: str, category_filter: Optional[str] = None,
+                         use_fts: bool = True) -> int:
+    """搜尋結果總筆數（分頁用）"""
+    sql, params = build_search_query(search_query, category_filter, use_fts=use_fts)
+    row = db.fetchone(f"SELECT COUNT(*) FROM ({sql})", params)
+    return row[0] if row else 0
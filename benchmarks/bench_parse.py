@@ -0,0 +1,127 @@
+"""
+商品頁解析效能測試：比較 html.parser / lxml / selectolax 三種引擎
+
+用法:
+    python benchmarks/bench_parse.py                 # 使用 benchmarks/fixtures/*.html
+    python benchmarks/bench_parse.py --fetch tw1122  # 先下載商品頁存成 fixture
+    python benchmarks/bench_parse.py -n 50 pages/*.html
+
+沒有任何 fixture 時會產生一份合成頁面（結構與 GRL 商品頁相同）作為示範。
+每個引擎的擷取結果都會和 html.parser 比對（換行先正規化），不一致時會列出差異欄位。
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.utils.product_parser import PARSER_ENGINES, available_engines  # noqa: E402
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def fetch_fixture(code):
+    """下載商品頁原始 HTML 存到 fixtures/<code>.html"""
+    from backend.utils.crawl import fetch_product_page, normalize_product_url
+
+    response = fetch_product_page(normalize_product_url(code))
+    response.raise_for_status()
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    path = FIXTURE_DIR / f"{code.lower()}.html"
+    path.write_text(response.text, encoding="utf-8")
+    print(f"✅ 已儲存 {path} ({len(response.text) / 1024:.1f} KB)")
+
+
+def synthetic_page():
+    """產生一份合成商品頁（含大量與爬蟲無關的導覽/推薦區塊，模擬真實頁面大小）"""
+    nav = "".join(f'<li><a href="/disp/list/{i}/">カテゴリー{i}</a></li>' for i in range(400))
+    recommend = "".join(
+        f'<div class="item"><a href="/item/xx{i}/"><img src="https://cdn.grail.bz/images/goods/t/xx{i}/xx{i}_v1.jpg" alt="おすすめ{i}"></a>'
+        f'<p class="name">おすすめ商品{i}</p><p class="price">¥{1000 + i:,}</p></div>'
+        for i in range(300)
+    )
+    colors = "".join(
+        f'<li><img src="https://cdn.grail.bz/images/goods/t/tw1122/tw1122_col_{code}.jpg" alt="{name}"></li>'
+        for code, name in (("11", "ブラック"), ("28", "アイボリー"), ("17", "ピンク"), ("40", "ベージュ"))
+    )
+    views = "".join(
+        f'<li><img src="https://cdn.grail.bz/images/goods/t/tw1122/tw1122_v{i}.jpg" alt=""></li>' for i in range(1, 9)
+    )
+    return f"""<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8"><title>GRL</title>
+<script>var dataLayer = [{{"page": "item"}}];</script><style>.ttl-name{{font-size:14px}}</style></head>
+<body><header><ul class="gnav">{nav}</ul></header>
+<ul class="list-breadcrumb"><li><a href="/">TOP</a></li><li><a href="/disp/list/1/">ボトムス</a></li><li><a href="/disp/list/2/">スカート</a></li></ul>
+<h1 class="ttl-name">チュールレイヤードミニスカート<span class="txt-code">[TW1122]</span></h1>
+<p class="txt-price">¥2,599<span>(税込)</span></p>
+<select class="size-select"><option>S/在庫あり</option><option>M/在庫あり</option><option>L/残りわずか</option></select>
+<div class="modal-detaillist"><ul>{colors}{views}</ul></div>
+<div class="tab-content"><h2 class="contents-ttl only-pc">商品詳細</h2>
+<p>ふんわりとしたチュールを重ねた\n ミニスカート。<!-- comment --></p><p>ウエストゴムで楽ちん。</p></div>
+<div class="tab-content"><h2 class="contents-ttl only-pc">サイズ・素材</h2>
+<table><tr><td>S</td><td>ウエスト60</td></tr></table><p>☆素材は【ポリエステル100%】\r\nです。</p></div>
+<section class="recommend">{recommend}</section></body></html>"""
+
+
+def load_pages(paths):
+    pages = []
+    for path in paths:
+        pages.append((Path(path).name, Path(path).read_text(encoding="utf-8")))
+    if not pages and FIXTURE_DIR.exists():
+        pages = [(p.name, p.read_text(encoding="utf-8")) for p in sorted(FIXTURE_DIR.glob("*.html"))]
+    if not pages:
+        print("ℹ️ 找不到 fixture，使用合成頁面（可用 --fetch <商品代碼> 下載真實頁面）")
+        pages = [("synthetic.html", synthetic_page())]
+    return pages
+
+
+def normalized(fields):
+    """C 解析器依 HTML5 規範把 CRLF 轉成 LF，比對前先統一換行"""
+    return {
+        key: value.replace("\r\n", "\n") if isinstance(value, str) else value
+        for key, value in fields.items()
+    }
+
+
+def bench(engine, html, iterations):
+    extract = PARSER_ENGINES[engine]
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        extract(html)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="*", help="要測試的 HTML 檔案（預設 benchmarks/fixtures/*.html）")
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    parser.add_argument("--fetch", nargs="+", metavar="CODE", help="下載商品頁存成 fixture")
+    args = parser.parse_args()
+
+    if args.fetch:
+        for code in args.fetch:
+            fetch_fixture(code)
+
+    engines = available_engines()
+    print(f"可用引擎: {', '.join(engines)}")
+
+    for name, html in load_pages(args.pages):
+        print(f"\n📄 {name} ({len(html) / 1024:.1f} KB)")
+        reference = normalized(PARSER_ENGINES["html.parser"](html))
+        baseline = None
+        for engine in engines:
+            result = normalized(PARSER_ENGINES[engine](html))
+            diffs = [key for key in reference if reference[key] != result[key]]
+            median, best = bench(engine, html, args.iterations)
+            baseline = baseline or median
+            status = "✅ 結果一致" if not diffs else f"⚠️ 差異欄位: {', '.join(diffs)}"
+            print(f"  {engine:<12} median {median * 1000:8.2f} ms  best {best * 1000:8.2f} ms  "
+                  f"x{baseline / median:5.1f}  {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+App 冷啟動匯入時間測試：以 python -X importtime 量測 streamlit_app/app.py 頂層匯入的模組
+
+用法:
+    python benchmarks/bench_startup.py                  # 量測 5 次取中位數
+    python benchmarks/bench_startup.py --budget 1500    # 超過預算（毫秒）時結束碼為 1
+    python benchmarks/bench_startup.py --top 20         # 列出自身耗時最多的 20 個模組
+
+app.py 的頂層匯入以 ast 解析（包含頂層 try 區塊內的匯入），新增匯入會自動納入量測；
+未安裝的套件（例如測試環境沒有 streamlit）會略過並列出。
+應延遲載入的模組（google.genai、deep_translator、requests 等）若由 app.py 或 backend 模組在啟動時載入，
+同樣視為失敗（streamlit 等第三方套件自己載入的不計）。
+"""
+
+import argparse
+import ast
+import importlib.util
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+APP_PATH = PROJECT_ROOT / "streamlit_app" / "app.py"
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 匯入時間預算（毫秒，所有頂層匯入的累計時間）
+STARTUP_IMPORT_BUDGET_MS = 2000
+# 只應在第一次使用時才載入的模組
+DEFERRED_MODULES = ("google.genai", "deep_translator", "requests", "bs4", "lxml", "selectolax", "PIL")
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def app_top_level_imports(path: Path = APP_PATH):
+    """app.py 模組層級（含頂層 try）匯入的模組名稱，依出現順序"""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    statements = []
+    for node in tree.body:
+        if isinstance(node, ast.Try):
+            statements.extend(node.body)
+        else:
+            statements.append(node)
+
+    modules = []
+    for node in statements:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def _available(module: str) -> bool:
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def measure_once(modules):
+    """
+    在全新的子程序中匯入模組並解析 -X importtime 輸出
+
+    返回:
+        (頂層模組累計時間 {name: us}, 自身時間 {name: us}, {頂層模組: 因它而載入的模組})
+    """
+    code = f"import sys; sys.path.insert(0, {str(PROJECT_ROOT)!r})\n" + "\n".join(f"import {m}" for m in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=PROJECT_ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative, self_times, loaded_by = {}, {}, {}
+    pending = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        self_times[name] = self_us
+        pending.append(name)
+        # 縮排只有一格的是 -c 直接匯入的模組，子模組的紀錄都出現在它之前
+        if len(indent) == 1:
+            cumulative[name] = cumulative_us
+            loaded_by[name] = pending
+            pending = []
+    return cumulative, self_times, loaded_by
+
+
+def main():
+    parser = argparse.ArgumentParser(description="App 冷啟動匯入時間測試")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="列出自身耗時最多的模組數")
+    parser.add_argument("--budget", type=float, default=STARTUP_IMPORT_BUDGET_MS, help="匯入時間預算（毫秒）")
+    args = parser.parse_args()
+
+    declared = app_top_level_imports()
+    modules = [m for m in declared if _available(m)]
+    missing = [m for m in declared if m not in modules]
+
+    runs_total, runs_cumulative, runs_self = [], defaultdict(list), defaultdict(list)
+    loaded_by = {}
+    for _ in range(args.repeat):
+        cumulative, self_times, loaded_by = measure_once(modules)
+        runs_total.append(sum(cumulative.values()) / 1000)
+        for name, us in cumulative.items():
+            runs_cumulative[name].append(us / 1000)
+        for name, us in self_times.items():
+            runs_self[name].append(us / 1000)
+
+    total = statistics.median(runs_total)
+    print(f"📦 app.py 頂層匯入 {len(modules)} 個模組（{args.repeat} 次中位數）")
+    if missing:
+        print(f"   略過未安裝: {', '.join(missing)}")
+    for name in modules:
+        if name in runs_cumulative:
+            print(f"   {statistics.median(runs_cumulative[name]):8.1f} ms  {name}")
+
+    print(f"\n🐢 自身耗時前 {args.top} 名:")
+    slowest = sorted(runs_self.items(), key=lambda kv: statistics.median(kv[1]), reverse=True)[:args.top]
+    for name, values in slowest:
+        print(f"   {statistics.median(values):8.1f} ms  {name}")
+
+    # app.py 直接匯入的，以及 backend 模組間接載入的
+    ours = list(declared)
+    for top, names in loaded_by.items():
+        if top.split(".")[0] == "backend":
+            ours.extend(names)
+    eager_roots = sorted({
+        deferred for name in ours for deferred in DEFERRED_MODULES
+        if name == deferred or name.startswith(deferred + ".") or deferred.startswith(name + ".")
+    })
+
+    print(f"\n⏱️ 匯入總時間 {total:.1f} ms（預算 {args.budget:.0f} ms）")
+    failed = False
+    if eager_roots:
+        print(f"❌ 啟動時載入了應延遲的模組: {', '.join(eager_roots)}")
+        failed = True
+    if total > args.budget:
+        print("❌ 超過匯入時間預算")
+        failed = True
+    if not failed:
+        print("✅ 符合預算，且沒有提前載入延遲模組")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
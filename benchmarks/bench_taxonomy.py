@@ -0,0 +1,88 @@
+"""
+子分類關鍵字分類器效能測試：逐一檢查子分類（原本的做法）vs 預先編譯的多關鍵字 regex
+
+用法:
+    python benchmarks/bench_taxonomy.py              # 合成 20,000 筆商品名稱
+    python benchmarks/bench_taxonomy.py -n 100000
+
+兩種做法的結果會逐筆比對，不一致時列出前幾筆差異。
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.utils.taxonomy import (  # noqa: E402
+    CATEGORY_SUBCATEGORIES,
+    SUBCATEGORY_KEYWORDS,
+    classify_many,
+    fallback_subcategory,
+)
+
+FILLER = ["レース", "リボン", "フリル", "ショート丈", "オーバーサイズ", "ハイウエスト", "配色", "2WAY",
+          "パール", "ツイード", "チュール", "ボリューム袖", "ラメ", "チェック柄", "花柄", "バックリボン"]
+
+
+def naive_classify(category, subcategory, title):
+    """原本的做法：每次呼叫都逐一檢查每個子分類的每個關鍵字"""
+    if category in CATEGORY_SUBCATEGORIES:
+        if not (category == "ボトムス" and subcategory == "スカート"):
+            if subcategory in CATEGORY_SUBCATEGORIES[category]:
+                return subcategory
+    if category in SUBCATEGORY_KEYWORDS:
+        for subcat, keywords in SUBCATEGORY_KEYWORDS[category].items():
+            if any(keyword in title for keyword in keywords):
+                return subcat
+    return fallback_subcategory(category)
+
+
+def synthetic_catalogue(n, seed=0):
+    """依分類關鍵字隨機組出商品名稱（含無關鍵字、多個關鍵字重疊的情況）"""
+    rng = random.Random(seed)
+    categories = list(SUBCATEGORY_KEYWORDS)
+    titles, cats, subcats = [], [], []
+    for _ in range(n):
+        category = rng.choice(categories)
+        keywords = [kw for words in SUBCATEGORY_KEYWORDS[category].values() for kw in words]
+        parts = rng.sample(FILLER, 2) + rng.sample(keywords, min(len(keywords), rng.randint(0, 2)))
+        rng.shuffle(parts)
+        titles.append("".join(parts) + f"[{rng.choice('abcdefgh')}{rng.randint(100, 9999)}]")
+        cats.append(category)
+        # 大部分商品的麵包屑子分類是「其他」或「スカート」，需要依名稱分類
+        subcats.append(rng.choice([category, "スカート", rng.choice(CATEGORY_SUBCATEGORIES[category])]))
+    return titles, cats, subcats
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--count", type=int, default=20000, help="商品數量")
+    args = parser.parse_args()
+
+    titles, cats, subcats = synthetic_catalogue(args.count)
+    print(f"📦 {len(titles):,} 筆商品名稱")
+
+    for label, use_subcats in (("麵包屑子分類 + 名稱", subcats), ("只依名稱重新分類", None)):
+        given = use_subcats or [None] * len(titles)
+        naive, naive_time = timed(lambda: [naive_classify(c, s, t) for t, c, s in zip(titles, cats, given)])
+        compiled, compiled_time = timed(lambda: classify_many(titles, cats, use_subcats))
+        diffs = [(t, a, b) for t, a, b in zip(titles, naive, compiled) if a != b]
+        status = "✅ 結果一致" if not diffs else f"⚠️ {len(diffs)} 筆不一致"
+        print(f"\n{label}")
+        print(f"  逐一檢查   {naive_time * 1000:8.1f} ms")
+        print(f"  預先編譯   {compiled_time * 1000:8.1f} ms  x{naive_time / compiled_time:4.1f}  {status}")
+        for title, a, b in diffs[:5]:
+            print(f"    {title}: {a} != {b}")
+
+
+if __name__ == "__main__":
+    main()
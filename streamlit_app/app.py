@@ -1,14 +1,27 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import os
+import queue
 import sys
-from google import genai
+import threading
+import time
 from datetime import datetime
 
 # 添加父目錄到 path 以導入 backend 模組
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from backend.utils.advice_cache import get_advice_cache, make_advice_key, wardrobe_digest
+from backend.utils.advice_context import build_inventory_context, estimate_tokens, match_related_items
+from backend.utils.color_palette import filter_candidates_by_palette, load_palettes
+from backend.utils.db import WardrobeDB
+from backend.utils.embeddings import embed_item, load_embedding_matrix, retrieve_items, sync_embeddings
+from backend.utils.migrations import migrate
+from backend.utils.wardrobe_search import (
+    WARDROBE_COLUMNS,
+    count_search_results,
+    has_search_index,
+    search_wardrobe
+)
 
 try:
     from backend.utils.category_translations import (
@@ -22,6 +35,20 @@ except ImportError:
     def get_subcategory_display_name(subcat):
         return subcat
 
+try:
+    from backend.utils.image_handler import (
+        IMAGE_CACHE_DIR,
+        downgrade_image_url_to_thumbnail,
+        get_local_image_path
+    )
+    from backend.utils.thumbnails import get_thumbnail
+    # 本地圖片快取存在時才查詢（避免在沒有快取的環境建立空目錄）
+    LOCAL_IMAGE_CACHE = (IMAGE_CACHE_DIR / "manifest.db").exists()
+except ImportError:
+    LOCAL_IMAGE_CACHE = False
+    def downgrade_image_url_to_thumbnail(url):
+        return url
+
 # --- Page Config ---
 st.set_page_config(page_title="Wardrobe AI Stylist", page_icon="👗", layout="wide")
 
@@ -223,164 +250,197 @@ CATEGORY_ORDER = [
     "シューズ", "バッグ・カバン", "アクセサリー", "セットアイテム"
 ]
 
+# AI 造型師使用的模型
+GEMINI_MODEL = "gemini-1.5-flash"
+# 單次 HTTP 請求逾時（毫秒）與串流生成的總時間上限（秒）
+GEMINI_HTTP_TIMEOUT_MS = 30_000
+ADVICE_STREAM_TIMEOUT = 60.0
+
+# 搜尋結果每頁筆數
+SEARCH_PAGE_SIZE = 48
+
+# 衣櫥列表每個分類一次顯示的件數（可在側邊欄調整）
+GRID_PAGE_SIZES = [12, 24, 48, 96]
+
 # --- Database Functions ---
-def get_db_connection():
-    """獲取資料庫連接"""
-    return sqlite3.connect(DB_PATH)
+@st.cache_resource
+def get_db():
+    """獲取全程序共用的資料庫連線池（WAL + 連線重用，所有 session 共用）"""
+    db = WardrobeDB(DB_PATH)
+    db.fts_enabled = False
+    if os.path.exists(DB_PATH):
+        # 套用尚未執行的結構遷移（代理鍵 id、索引、全文搜尋）
+        migrate(db)
+        with db.connection() as conn:
+            db.fts_enabled = has_search_index(conn)
+    return db
 
-def load_wardrobe_data(search_query="", category_filter=None):
-    """從 SQLite 讀取衣櫥資料（支援搜尋和篩選）"""
+def load_wardrobe_data(search_query="", category_filter=None, page=0):
+    """
+    讀取衣櫥資料（支援搜尋和篩選）
+    有搜尋字時使用全文索引，依相關度排序並以 SEARCH_PAGE_SIZE 分頁
+    結果依 (search_query, category_filter, page) 快取，任何寫入後資料版本改變才會重新查詢；
+    返回的 DataFrame 為共用物件，請勿原地修改
+    """
     if not os.path.exists(DB_PATH):
         st.error(f"找不到資料庫：{DB_PATH}")
         return pd.DataFrame()
     
-    conn = get_db_connection()
-    query = """
-    SELECT w.key, 
-           COALESCE(p.title, SUBSTR(w.key, 1, INSTR(w.key, '_') - 1)) as title,
-           w.color_name, w.category, w.subcategory, 
-           w.size, w.image_url, w.price_twd, w.quantity, w.arrival_date
+    if category_filter == "全部":
+        category_filter = None
+    db = get_db()
+    try:
+        return db.query_cache.get_or_load(
+            ("wardrobe", search_query or "", category_filter, page),
+            lambda: _query_wardrobe_data(db, search_query, category_filter, page)
+        )
+    except Exception as e:
+        st.error(f"讀取資料庫失敗: {e}")
+        return pd.DataFrame()
+
+def _query_wardrobe_data(db, search_query, category_filter, page):
+    """實際執行衣櫥查詢（由 load_wardrobe_data 在快取失效時呼叫）"""
+    if search_query:
+        return search_wardrobe(
+            db, search_query, category_filter,
+            limit=SEARCH_PAGE_SIZE, offset=page * SEARCH_PAGE_SIZE, use_fts=db.fts_enabled
+        )
+    
+    query = f"""
+    SELECT {WARDROBE_COLUMNS}
     FROM wardrobe w
     LEFT JOIN products p ON w.product_code = p.product_code
     WHERE 1=1
     """
     
     params = []
-    if search_query:
-        query += " AND (p.title LIKE ? OR w.color_name LIKE ?)"
-        params.extend([f"%{search_query}%", f"%{search_query}%"])
-    
-    if category_filter and category_filter != "全部":
+    if category_filter:
         query += " AND w.category = ?"
         params.append(category_filter)
     
-    try:
-        df = pd.read_sql(query, conn, params=params)
-        conn.close()
-        return df
-    except Exception as e:
-        conn.close()
-        st.error(f"讀取資料庫失敗: {e}")
-        return pd.DataFrame()
+    return db.read_df(query, params)
 
 def add_item_to_wardrobe(product_code, title, color_name, size, image_url, 
                          category, subcategory, quantity=1):
     """新增商品到衣櫥"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
         # 生成 key
         key = f"{title}_{color_name}_{size}"
         
-        # 檢查 product 是否存在
-        cursor.execute("SELECT product_code FROM products WHERE product_code = ?", (product_code,))
-        if not cursor.fetchone():
-            # 新增到 products 表
-            cursor.execute("""
-                INSERT INTO products (product_code, title, product_url, category, subcategory)
-                VALUES (?, ?, ?, ?, ?)
-            """, (product_code, title, '', category, subcategory))
-        
-        # 新增到 wardrobe 表
-        cursor.execute("""
-            INSERT INTO wardrobe (key, product_code, product_url, color_name, size, 
-                                 image_url, category, subcategory, quantity, arrival_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (key, product_code, '', color_name, size, image_url, 
-              category, subcategory, quantity, datetime.now()))
+        with get_db().transaction() as conn:
+            # 檢查 product 是否存在
+            if not conn.execute("SELECT product_code FROM products WHERE product_code = ?", (product_code,)).fetchone():
+                # 新增到 products 表
+                conn.execute("""
+                    INSERT INTO products (product_code, title, product_url, category, subcategory)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (product_code, title, '', category, subcategory))
+            
+            # 新增到 wardrobe 表
+            cursor = conn.execute("""
+                INSERT INTO wardrobe (key, product_code, product_url, color_name, size, 
+                                     image_url, category, subcategory, quantity, arrival_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, product_code, '', color_name, size, image_url, 
+                  category, subcategory, quantity, datetime.now()))
+            # 只計算新商品的檢索向量（同一個交易，不必重新掃描整個衣櫥）
+            embed_item(conn, cursor.lastrowid)
         
-        conn.commit()
-        conn.close()
         return True, "✅ 成功新增商品！"
     except Exception as e:
-        conn.close()
         return False, f"❌ 新增失敗：{str(e)}"
 
-def delete_item_from_wardrobe(key):
+def delete_item_from_wardrobe(item_id):
     """從衣櫥刪除商品"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("DELETE FROM wardrobe WHERE key = ?", (key,))
-        conn.commit()
-        conn.close()
+        with get_db().transaction() as conn:
+            conn.execute("DELETE FROM wardrobe WHERE id = ?", (int(item_id),))
         return True
     except Exception as e:
-        conn.close()
         st.error(f"刪除失敗：{str(e)}")
         return False
 
-def update_wardrobe_item(old_key, color_name, size, quantity, category, subcategory):
-    """更新衣櫥商品資訊"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # 從舊的 key 提取 title
-        title = old_key.split('_')[0] if '_' in old_key else old_key
-        
-        # 生成新的 key
-        new_key = f"{title}_{color_name}_{size}"
-        
-        # 更新商品資訊
-        cursor.execute("""
-            UPDATE wardrobe 
-            SET key = ?, color_name = ?, size = ?, quantity = ?, category = ?, subcategory = ?
-            WHERE key = ?
-        """, (new_key, color_name, size, quantity, category, subcategory, old_key))
-        
-        conn.commit()
-        conn.close()
-        return True, new_key
-    except Exception as e:
-        conn.close()
-        st.error(f"更新失敗：{str(e)}")
-        return False, None
-
-def update_wardrobe_item(old_key, color_name, size, quantity, category, subcategory):
-    """更新衣櫥商品資訊"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def update_wardrobe_item(item_id, color_name, size, quantity, category, subcategory):
+    """更新衣櫥商品資訊（以 id 定位，key 依新的顏色 / 尺寸重新產生）"""
     try:
-        # 從舊的 key 提取 title
-        title = old_key.split('_')[0] if '_' in old_key else old_key
-        
-        # 生成新的 key
-        new_key = f"{title}_{color_name}_{size}"
-        
-        # 更新商品資訊
-        cursor.execute("""
-            UPDATE wardrobe 
-            SET key = ?, color_name = ?, size = ?, quantity = ?, category = ?, subcategory = ?
-            WHERE key = ?
-        """, (new_key, color_name, size, quantity, category, subcategory, old_key))
+        with get_db().transaction() as conn:
+            row = conn.execute(
+                "SELECT key, color_name, size FROM wardrobe WHERE id = ?", (int(item_id),)
+            ).fetchone()
+            if row is None:
+                raise ValueError("找不到商品")
+            old_key, old_color, old_size = row
+            
+            # key = f"{title}_{color_name}_{size}"，去掉舊的顏色 / 尺寸後綴取得 title（title 本身可能含底線）
+            suffix = f"_{old_color}_{old_size}"
+            title = old_key[:-len(suffix)] if old_key.endswith(suffix) else old_key.rsplit('_', 2)[0]
+            new_key = f"{title}_{color_name}_{size}"
+            
+            conn.execute("""
+                UPDATE wardrobe 
+                SET key = ?, color_name = ?, size = ?, quantity = ?, category = ?, subcategory = ?
+                WHERE id = ?
+            """, (new_key, color_name, size, quantity, category, subcategory, int(item_id)))
         
-        conn.commit()
-        conn.close()
         return True, new_key
     except Exception as e:
-        conn.close()
         st.error(f"更新失敗：{str(e)}")
         return False, None
 
-def update_item_quantity(key, new_quantity):
+def update_item_quantity(item_id, new_quantity):
     """更新商品數量"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("UPDATE wardrobe SET quantity = ? WHERE key = ?", (new_quantity, key))
-        conn.commit()
-        conn.close()
+        with get_db().transaction() as conn:
+            conn.execute("UPDATE wardrobe SET quantity = ? WHERE id = ?", (new_quantity, int(item_id)))
         return True
     except Exception as e:
-        conn.close()
         st.error(f"更新失敗：{str(e)}")
         return False
 
+def group_wardrobe_items(df):
+    """
+    一次走訪把衣櫥資料分成 {分類: [(子分類, [商品 dict, ...]), ...]}
+    （取代每個分類 / 子分類都重新做一次布林遮罩篩選）
+    """
+    grouped = {}
+    for (category, subcategory), items in df.groupby(['category', 'subcategory'], sort=False, dropna=False):
+        grouped.setdefault(category, []).append((subcategory, items.to_dict('records')))
+    return grouped
+
+def get_grid_image(item):
+    """衣櫥列表使用的圖片：本地縮圖 > CDN 縮圖 URL（原圖只在點選放大時載入）"""
+    if LOCAL_IMAGE_CACHE and pd.notna(item.get('product_code')):
+        thumb = get_thumbnail(get_local_image_path(item['product_code'], item['color_name']))
+        if thumb is not None:
+            return str(thumb)
+    return downgrade_image_url_to_thumbnail(item['image_url'])
+
+@st.cache_resource
+def get_genai_client(api_key):
+    """Gemini client 依 API Key 快取，所有 rerun 共用（不再每次呼叫都重新建立）"""
+    # 延遲匯入：google-genai 載入很慢，只在第一次使用 AI 造型師時載入
+    from google import genai
+    from google.genai import types
+    return genai.Client(api_key=api_key, http_options=types.HttpOptions(timeout=GEMINI_HTTP_TIMEOUT_MS))
+
+def get_embedding_index():
+    """
+    所有商品的檢索向量（資料版本不變時直接使用記憶體中的矩陣）
+    app 內新增的商品已在新增時計算；這裡的 sync 只補算在 app 以外新增 / 修改過的商品
+    """
+    db = get_db()
+    
+    def load():
+        sync_embeddings(db)
+        return load_embedding_matrix(db)
+    
+    return db.query_cache.get_or_load(("embedding_index",), load)
+
+def get_palette_index():
+    """所有商品的色票（由 python -m backend.utils.color_palette 離線計算），資料版本不變時直接使用記憶體中的結果"""
+    db = get_db()
+    return db.query_cache.get_or_load(("palette_index",), lambda: load_palettes(db))
+
 def get_demo_advice(prompt_text, wardrobe_df):
     """Demo 模式：生成範例穿搭建議"""
     # 簡單的關鍵字匹配
@@ -446,42 +506,155 @@ def get_demo_advice(prompt_text, wardrobe_df):
     
     return advice
 
-def get_ai_advice(prompt_text, wardrobe_df, api_key):
-    """呼叫 Gemini API（支援 Demo 模式）"""
+def render_advice_box(container, advice, streaming=False):
+    """在 container（st.empty）中顯示建議框，串流中在結尾顯示游標"""
+    cursor = " ▌" if streaming else ""
+    container.markdown(f"""
+    <div class="ai-advice-box">
+        <h3>💡 AI 穿搭建議</h3>
+        <p style="font-size: 14px; line-height: 1.6; color: #111111;">{advice}{cursor}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+def _stream_worker(stream, chunks, stop):
+    """背景執行緒：逐段讀取串流放入 chunks 佇列，結束時放入 ("done", None) 或 ("error", 例外)"""
+    try:
+        for chunk in stream:
+            if stop.is_set():
+                break
+            if chunk.text:
+                chunks.put(("text", chunk.text))
+        chunks.put(("done", None))
+    except Exception as e:
+        chunks.put(("error", e))
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+def stream_advice(client, full_prompt, on_update):
+    """
+    以串流方式生成建議，每收到一段文字就呼叫 on_update(目前全文)
+
+    返回:
+        (全文, 是否完整生成, 首字延遲秒數)
+    串流在背景執行緒讀取，主執行緒以剩餘時間等待下一段，伺服器卡住不送資料時
+    也會在 ADVICE_STREAM_TIMEOUT 準時返回已收到的部分內容；逾時或使用者在生成中點擊其他元件
+    （Streamlit 中斷 script）時通知背景執行緒停止並關閉串流。
+    等待第一段文字時顯示 spinner，開始輸出後就移除
+    """
+    start = time.perf_counter()
+    deadline = start + ADVICE_STREAM_TIMEOUT
+    first_token = None
+    texts = []
+    chunks = queue.Queue()
+    stop = threading.Event()
+    stream = client.models.generate_content_stream(model=GEMINI_MODEL, contents=full_prompt)
+    threading.Thread(target=_stream_worker, args=(stream, chunks, stop), daemon=True).start()
+
+    def next_chunk():
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None
+        try:
+            return chunks.get(timeout=remaining)
+        except queue.Empty:
+            return None
+
+    try:
+        with st.spinner("AI 造型師正在翻箱倒櫃..."):
+            item = next_chunk()
+        while item is not None:
+            kind, value = item
+            if kind == "error":
+                raise value
+            if kind == "done":
+                return "".join(texts), True, first_token
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            texts.append(value)
+            on_update("".join(texts))
+            item = next_chunk()
+        return "".join(texts), False, first_token
+    finally:
+        stop.set()
+
+def get_ai_advice(prompt_text, wardrobe_df, api_key, on_update=None):
+    """
+    呼叫 Gemini API（支援 Demo 模式）
+    傳入 on_update 時使用串流輸出，每收到一段文字就以目前全文呼叫 on_update
+    """
     if not api_key or len(api_key.strip()) < 20:
         return get_demo_advice(prompt_text, wardrobe_df)
     
-    # 構建 Context (RAG)
-    inventory_context = "我的衣櫥清單如下:\n"
-    for idx, row in wardrobe_df.iterrows():
-        inventory_context += f"- ID: {idx}, 名稱: {row['title']}, 顏色: {row['color_name']}, 類別: {row['category']}\n"
+    # 相同需求 + 相同模型 + 相同衣櫥內容時直接使用快取的建議
+    advice_cache = get_advice_cache()
+    digest = wardrobe_digest(wardrobe_df)
+    cache_key = make_advice_key(prompt_text, GEMINI_MODEL, digest)
+    if advice_cache is not None:
+        cached = advice_cache.get(cache_key)
+        if cached is not None:
+            st.caption("⚡ 使用快取的建議（相同需求與衣櫥內容）")
+            return cached
+    
+    # 構建 Context (RAG)：先以向量檢索挑出最相關的單品，再精簡編碼 + token 預算
+    try:
+        candidates = retrieve_items(get_db(), prompt_text, wardrobe_df, index=get_embedding_index())
+    except Exception as e:
+        print(f"⚠️ 向量檢索失敗，改用整個衣櫥: {e}")
+        candidates = wardrobe_df
+    # 以最相關的單品為基準，先移除顏色不相容的候選（沒有色票的商品保留）
+    try:
+        candidates = filter_candidates_by_palette(candidates, *get_palette_index())
+    except Exception as e:
+        print(f"⚠️ 色票篩選失敗，略過: {e}")
+    inventory_context, context_stats = build_inventory_context(candidates, category_order=CATEGORY_ORDER)
     
     full_prompt = f"""
     你是一位專業的個人穿搭造型師。
+    我的衣櫥清單如下（[分類] 之下每行一件：ID 名稱/顏色/子分類）:
     {inventory_context}
     
     使用者的需求是："{prompt_text}"
     
     請從上述「我的衣櫥清單」中，挑選適合的單品組合成一套穿搭。
-    請明確指出你要我穿哪一件（講出名稱和顏色），並說明為什麼這樣搭配適合這個場合。
+    請明確指出你要我穿哪一件（講出 ID、名稱和顏色，例如「I12 墊肩襯衫洋裝（炭灰）」），並說明為什麼這樣搭配適合這個場合。
     如果衣櫥裡沒有適合的，請直說。
     """
     
-    with st.spinner("AI 造型師正在翻箱倒櫃..."):
-        try:
-            client = genai.Client(api_key=api_key)
-            model = "gemini-1.5-flash"
-            response = client.models.generate_content(
-                model=model,
-                contents=full_prompt
-            )
-            return response.text
-        except Exception as e:
-            # API Key 錯誤時改用 Demo 模式
-            if "API key not valid" in str(e) or "INVALID_ARGUMENT" in str(e):
-                st.warning("⚠️ API Key 無效，已切換到 Demo 模式")
-                return get_demo_advice(prompt_text, wardrobe_df)
-            return f"AI 思考時發生錯誤: {e}"
+    truncated_note = "（已依預算截斷）" if context_stats['truncated'] else ""
+    st.caption(f"📏 Prompt 約 {estimate_tokens(full_prompt)} tokens，"
+               f"檢索 {len(candidates)}/{len(wardrobe_df)} 件，"
+               f"衣櫥清單 {context_stats['items_included']}/{context_stats['items_total']} 件{truncated_note}")
+    
+    try:
+        client = get_genai_client(api_key.strip())
+        if on_update is not None:
+            # 串流：spinner 只顯示到第一段文字出現（見 stream_advice）
+            start = time.perf_counter()
+            advice, completed, first_token = stream_advice(client, full_prompt, on_update)
+            if first_token is not None:
+                st.caption(f"⏱️ 首字 {first_token:.1f} 秒，完成 {time.perf_counter() - start:.1f} 秒")
+            if not completed:
+                st.warning(f"⚠️ 生成超過 {ADVICE_STREAM_TIMEOUT:.0f} 秒，已顯示目前收到的內容")
+                return advice
+        else:
+            with st.spinner("AI 造型師正在翻箱倒櫃..."):
+                response = client.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=full_prompt
+                )
+            advice = response.text
+        # 只快取完整的建議
+        if advice_cache is not None and advice:
+            advice_cache.put(cache_key, GEMINI_MODEL, prompt_text, advice)
+        return advice
+    except Exception as e:
+        # API Key 錯誤時改用 Demo 模式
+        if "API key not valid" in str(e) or "INVALID_ARGUMENT" in str(e):
+            st.warning("⚠️ API Key 無效，已切換到 Demo 模式")
+            return get_demo_advice(prompt_text, wardrobe_df)
+        return f"AI 思考時發生錯誤: {e}"
 
 # --- Main UI ---
 st.title("Wardrobe AI Stylist")
@@ -491,6 +664,7 @@ st.caption("AIOT HW4 | 基於 Wardrobe 全端系統延伸")
 with st.sidebar:
     st.header("⚙️ 設定")
     api_key = st.text_input("Gemini API Key", type="password", help="用於 AI 穿搭建議功能")
+    stream_output = st.toggle("串流顯示 AI 建議", value=True, help="邊生成邊顯示，不必等待完整回覆")
     
     st.markdown("---")
     st.subheader("🔍 搜尋與篩選")
@@ -504,6 +678,32 @@ with st.sidebar:
     else:
         category_filter = "全部"
     
+    # 搜尋結果分頁（依相關度排序）
+    search_page = 0
+    if search_query:
+        db = get_db()
+        total_results = db.query_cache.get_or_load(
+            ("search_count", search_query, None if category_filter == "全部" else category_filter),
+            lambda: count_search_results(db, search_query, None if category_filter == "全部" else category_filter,
+                                         use_fts=db.fts_enabled)
+        )
+        total_pages = max(1, -(-total_results // SEARCH_PAGE_SIZE))
+        st.caption(f"找到 {total_results} 件")
+        if total_pages > 1:
+            search_page = st.number_input("搜尋結果頁數", min_value=1, max_value=total_pages, value=1) - 1
+    
+    grid_page_size = st.selectbox("每個分類一次顯示", GRID_PAGE_SIZES, index=1, format_func=lambda n: f"{n} 件")
+    
+    with st.expander("📊 查詢快取"):
+        cache_stats = get_db().query_cache.stats()
+        st.caption(f"命中率 {cache_stats['hit_rate']:.0%}（命中 {cache_stats['hits']} / 查詢 {cache_stats['misses']}）")
+        st.caption(f"寫入後失效 {cache_stats['invalidations']} 次，快取 {cache_stats['entries']} 組")
+        advice_cache = get_advice_cache()
+        if advice_cache is not None:
+            advice_stats = advice_cache.stats()
+            st.caption(f"AI 建議快取：命中 {advice_stats['hits']} / 未命中 {advice_stats['misses']}，"
+                       f"保存 {advice_stats['entries']} 筆")
+    
     st.markdown("---")
     st.info("💡 本專題使用 RAG 技術，讀取 SQLite 資料庫並透過 LLM 生成建議。結合爬蟲功能，可自動提取商品 URL 資訊。")
     st.markdown("📦 原始專案: [Wardrobe](https://github.com/Alice-LTY/Wardrobe)")
@@ -542,7 +742,7 @@ with tab1:
             
             if submitted:
                 success, new_key = update_wardrobe_item(
-                    item['key'], new_color, new_size, new_quantity, new_category, new_subcategory
+                    item['id'], new_color, new_size, new_quantity, new_category, new_subcategory
                 )
                 if success:
                     st.success(f"✅ 更新成功！")
@@ -556,7 +756,7 @@ with tab1:
         st.markdown("---")
     
     # 載入資料
-    df = load_wardrobe_data(search_query, None if category_filter == "全部" else category_filter)
+    df = load_wardrobe_data(search_query, None if category_filter == "全部" else category_filter, search_page)
     
     if df.empty:
         st.warning("🤷‍♀️ 目前衣櫥是空的！點選「新增商品」開始建立你的衣櫥。")
@@ -569,32 +769,54 @@ with tab1:
         
         st.markdown("---")
         
-        # 分類顯示
-        all_categories = df['category'].unique()
-        categories = [cat for cat in CATEGORY_ORDER if cat in all_categories]
-        categories += [cat for cat in all_categories if cat not in CATEGORY_ORDER]
+        # 分類顯示：一次 groupby 分好（分類 → 子分類），每個分類展開後才渲染，並分批顯示
+        grouped = get_db().query_cache.get_or_load(
+            ("grouped", search_query or "", category_filter, search_page),
+            lambda: group_wardrobe_items(df)
+        )
+        categories = [cat for cat in CATEGORY_ORDER if cat in grouped]
+        categories += [cat for cat in grouped if cat not in CATEGORY_ORDER]
         
-        for category in categories:
+        for cat_idx, category in enumerate(categories):
+            subcategory_groups = grouped[category]
+            category_total = sum(len(items) for _, items in subcategory_groups)
+            
             # 分類標題（多語言顯示）
             category_display = get_category_display_name(category)
             st.markdown(f'<div class="category-badge">{category_display}</div>', unsafe_allow_html=True)
-            category_items = df[df['category'] == category]
             
-            # 按子分類分組
-            subcategories = category_items['subcategory'].unique()
-            for subcategory in subcategories:
+            # 只有展開的分類才建立圖片與按鈕（預設展開第一個分類，篩選 / 搜尋時全部展開）
+            expanded = st.toggle(
+                f"顯示 {category_total} 件",
+                value=cat_idx == 0 or category_filter != "全部" or bool(search_query),
+                key=f"open_{category}"
+            )
+            if not expanded:
+                continue
+            
+            limit_key = f"limit_{category}"
+            limit = st.session_state.get(limit_key, grid_page_size)
+            rendered = 0
+            for subcategory, subcategory_items in subcategory_groups:
+                if rendered >= limit:
+                    break
                 if subcategory and pd.notna(subcategory):
                     subcategory_display = get_subcategory_display_name(subcategory)
                     st.markdown(f'<h3 style="color: #484848; font-size: 19px; margin: 19px 0px 9px;">{subcategory_display}</h3>', unsafe_allow_html=True)
                 
-                subcategory_items = category_items[category_items['subcategory'] == subcategory]
+                page_items = subcategory_items[:limit - rendered]
+                rendered += len(page_items)
                 
                 # 每行顯示 4 件商品
                 cols = st.columns(4)
-                for idx, (_, item) in enumerate(subcategory_items.iterrows()):
+                for idx, item in enumerate(page_items):
                     with cols[idx % 4]:
-                        # 顯示商品圖片
-                        st.image(item['image_url'], use_container_width=True)
+                        # 顯示商品縮圖（點 🔍 才載入原圖）
+                        zoom_key = f"zoom_{item['key']}"
+                        if st.session_state.get(zoom_key):
+                            st.image(item['image_url'], use_container_width=True)
+                        else:
+                            st.image(get_grid_image(item), use_container_width=True)
                         
                         # 商品資訊（顯示完整名稱）
                         title = str(item['title']) if pd.notna(item['title']) else '未命名商品'
@@ -605,17 +827,27 @@ with tab1:
                             st.caption(f"📦 數量：{item['quantity']}")
                         
                         # 操作按鈕
-                        col_edit, col_delete = st.columns(2)
+                        col_zoom, col_edit, col_delete = st.columns(3)
+                        with col_zoom:
+                            if st.button("🔍", key=f"zoombtn_{item['key']}", help="檢視原圖", use_container_width=True):
+                                st.session_state[zoom_key] = not st.session_state.get(zoom_key, False)
+                                st.rerun()
                         with col_edit:
                             if st.button("✏️", key=f"edit_{item['key']}", help="編輯", use_container_width=True):
-                                st.session_state['editing_item'] = item.to_dict()
+                                st.session_state['editing_item'] = dict(item)
                                 st.rerun()
                         with col_delete:
                             if st.button("🗑️", key=f"del_{item['key']}", help="刪除", use_container_width=True):
-                                if delete_item_from_wardrobe(item['key']):
+                                if delete_item_from_wardrobe(item['id']):
                                     st.success("✅ 刪除成功！")
                                     st.rerun()
             
+            remaining = category_total - rendered
+            if remaining > 0:
+                if st.button(f"⬇️ 顯示更多（還有 {remaining} 件）", key=f"more_{category}", use_container_width=True):
+                    st.session_state[limit_key] = limit + grid_page_size
+                    st.rerun()
+            
             st.markdown("<br>", unsafe_allow_html=True)
 
 # === Tab 2: 新增商品 ===
@@ -789,24 +1021,26 @@ with tab3:
             else:
                 if not api_key:
                     st.info("ℹ️ 未輸入 API Key，將使用 Demo 模式展示範例建議")
-                advice = get_ai_advice(user_input, df_for_ai, api_key)
-                
-                st.markdown(f"""
-                <div class="ai-advice-box">
-                    <h3>💡 AI 穿搭建議</h3>
-                    <p style="font-size: 14px; line-height: 1.6; color: #111111;">{advice}</p>
-                </div>
-                """, unsafe_allow_html=True)
+                advice_box = st.empty()
+                if stream_output:
+                    # 生成中點擊「停止」會觸發 rerun，中斷串流
+                    stop_slot = st.empty()
+                    stop_slot.button("⏹️ 停止生成", key="stop_advice")
+                    advice = get_ai_advice(
+                        user_input, df_for_ai, api_key,
+                        on_update=lambda text: render_advice_box(advice_box, text, streaming=True)
+                    )
+                    stop_slot.empty()
+                else:
+                    advice = get_ai_advice(user_input, df_for_ai, api_key)
+                render_advice_box(advice_box, advice)
                 
                 # 推薦單品
                 st.markdown("#### 相關單品")
                 img_cols = st.columns(4)
-                col_idx = 0
-                for idx, row in df_for_ai.iterrows():
-                    if row['title'] and (row['title'][:5] in advice or row['color_name'] in advice):
-                        if col_idx < 4:
-                            with img_cols[col_idx]:
-                                st.image(row['image_url'], use_container_width=True)
-                                st.caption(f"**{row['title'][:30]}**")
-                                st.caption(f"🎨 {row['color_name']}")
-                            col_idx += 1
+                related = match_related_items(advice, df_for_ai, limit=4)
+                for col_idx, row in enumerate(related.to_dict('records')):
+                    with img_cols[col_idx]:
+                        st.image(get_grid_image(row), use_container_width=True)
+                        st.caption(f"**{row['title'][:30]}**")
+                        st.caption(f"🎨 {row['color_name']}")